@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+"""Compare haiker.codec with JSON and pickle for a timeline page
+
+Usage:
+
+    python3 -m benchmarks.bench_codec
+"""
+
+import json
+import pickle
+import timeit
+import haiker.codec
+import haiker.store
+import haiker.types
+from . import fixtures
+
+
+def timeline(n, users):
+    """Return n parsed statuses posted by users distinct users."""
+    parser = haiker.types.Parser(store=haiker.store.EntityStore())
+    return parser.statuses(fixtures.timeline(n, users=users))
+
+
+def json_dumps(statuses):
+    return json.dumps([s.to_dict() for s in statuses]).encode('utf-8')
+
+
+def json_loads(data):
+    return [haiker.types.Status(d) for d in json.loads(data.decode('utf-8'))]
+
+
+def pickle_dumps(statuses):
+    return pickle.dumps(statuses, pickle.HIGHEST_PROTOCOL)
+
+
+def bench(name, dumps, loads, statuses, number):
+    data = dumps(statuses)
+    encode = min(timeit.repeat(lambda: dumps(statuses), number=number,
+                               repeat=5)) / number * 1e3
+    decode = min(timeit.repeat(lambda: loads(data), number=number,
+                               repeat=5)) / number * 1e3
+    print('{0:<10} {1:9d} bytes {2:8.3f} msec/dumps {3:8.3f} msec/loads'
+          .format(name, len(data), encode, decode))
+
+
+def main():
+    statuses = timeline(200, 20)
+    print('{0} statuses by 20 users'.format(len(statuses)))
+    bench('json', json_dumps, json_loads, statuses, 20)
+    bench('pickle', pickle_dumps, pickle.loads, statuses, 20)
+    bench('codec', haiker.codec.dumps, haiker.codec.loads, statuses, 20)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+"""Compare the installed JSON decoders on timeline pages
+
+Usage:
+
+    python3 -m benchmarks.bench_decode
+
+Each decoder of haiker.decoders decodes pages of 20 and 200 statuses
+(with and without replies), alone and within a whole call of
+BaseAPIHandler on a canned response.  The speedup of decoding is
+relative to the json module.
+"""
+
+import timeit
+import haiker.api
+import haiker.decoders
+import haiker.types
+from . import fixtures
+
+
+PAGES = [
+    ('20 statuses', fixtures.timeline(20)),
+    ('200 statuses', fixtures.timeline(200)),
+    ('200 with replies', fixtures.timeline(200, replies=2)),
+]
+
+
+def best(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e3
+
+
+def call(decode, data):
+    """Return a function making a whole GET call answered with data."""
+    handler = haiker.api.BaseAPIHandler(
+        None, 'http://h.hatena.ne.jp/api', 'bench',
+        session=fixtures.CannedSession(data), single_flight=False,
+        decoder=decode)
+    parser = haiker.types.Parser()
+    return lambda: handler.get('/statuses/public_timeline.json',
+                               convert=parser.statuses)
+
+
+def main():
+    print('{0:<18} {1:<8} {2:>9} {3:>12} {4:>10} {5:>8}'.format(
+        'page', 'decoder', 'bytes', 'msec/decode', 'msec/call',
+        'speedup'))
+    for title, page in PAGES:
+        data = fixtures.payload(page)
+        number = max(1, 2000 // len(page))
+        times = [(name, best(lambda: decode(data), number),
+                  best(call(decode, data), number))
+                 for name, decode in haiker.decoders.DECODERS.items()]
+        stdlib = {name: t for name, t, _ in times}['json']
+        for name, decoding, calling in times:
+            print('{0:<18} {1:<8} {2:9d} {3:12.3f} {4:10.3f} {5:7.2f}x'
+                  .format(title, name, len(data), decoding, calling,
+                          stdlib / decoding))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+
+"""Measure the client overhead of Haiker API methods
+
+The handler is replaced by a stub which only encodes the params and
+builds the request, so that the time spent before any I/O is measured.
+
+Usage:
+
+    python3 -m benchmarks.bench_endpoints
+"""
+
+import datetime
+import timeit
+import haiker
+from .fixtures import StubHandler
+
+
+CALLS = [
+    ('public_timeline()', lambda api: api.public_timeline()),
+    ('user_timeline(name, 3 params)',
+     lambda api: api.user_timeline('me', count=20, page=2,
+                                   body_formats=['haiku', 'html'])),
+    ('keyword_timeline(word, since)',
+     lambda api: api.keyword_timeline(
+         'BOT', since=datetime.datetime(2010, 1, 2, 3, 4, 5,
+                                        tzinfo=datetime.timezone.utc))),
+    ('show_status(eid)', lambda api: api.show_status('123')),
+    ('add_star(eid)', lambda api: api.add_star('123')),
+]
+
+
+def main():
+    api = haiker.Haiker(single_flight=False)
+    api._handler = StubHandler(None, 'http://h.hatena.ne.jp/api',
+                               'bench', single_flight=False)
+    for name, call in CALLS:
+        number = 10000
+        sec = min(timeit.repeat(lambda: call(api), number=number, repeat=20))
+        print('{0:<32} {1:8.3f} usec/call'.format(name, sec / number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
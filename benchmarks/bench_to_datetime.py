@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+
+"""Compare haiker.types.to_datetime with the strptime-based parser
+
+Usage:
+
+    python3 -m benchmarks.bench_to_datetime
+"""
+
+import datetime
+import timeit
+import haiker.types
+
+
+def timestamps(n, distinct):
+    """Return n timestamps of which only distinct ones are unique,
+    as found in a timeline page.
+    """
+    base = datetime.datetime(2010, 1, 2, 3, 4, 5)
+    return [(base + datetime.timedelta(seconds=i % distinct)).strftime(
+                '%Y-%m-%dT%H:%M:%S') + suffix
+            for i, suffix in zip(range(n), ['Z', '.000+09:00'] * n)]
+
+
+def bench(name, func, data, number):
+    sec = min(timeit.repeat(lambda: [func(x) for x in data],
+                            number=number, repeat=5))
+    usec = sec / number / len(data) * 1e6
+    print('{0:<32} {1:8.3f} usec/call'.format(name, usec))
+    return usec
+
+
+def main():
+    unique = timestamps(2000, 2000)
+    repeated = timestamps(2000, 50)
+    fast = haiker.types.to_datetime
+    uncached = fast.__wrapped__
+    base = bench('strptime', haiker.types._strptime, unique, 20)
+    for name, func, data in [('fast (no cache)', uncached, unique),
+                             ('fast (unique timestamps)', fast, unique),
+                             ('fast (repeated timestamps)', fast, repeated)]:
+        fast.cache_clear()
+        usec = bench(name, func, data, 20)
+        print('{0:<32} {1:8.1f}x'.format('  speedup', base / usec))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""Realistic payloads for the benchmarks, scaled up from tests.samples
+
+Every status has all the body formats (haiku_text, html, html_touch,
+html_mobile and text) filled, as returned for
+body_formats=['haiku', 'html', 'touch', 'mobile'].
+"""
+
+import copy
+import datetime
+import json
+import requests
+import haiker.api
+from tests import samples
+
+
+_BASE = datetime.datetime(2010, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+
+# a body of a typical length in each format
+_BODY = 'Hello, Hatena Haiku! ' * 4
+_HTML = '<div class="body"><p>{0}</p></div>'.format(_BODY)
+
+
+def user(i):
+    """Return the dict of the i-th user."""
+    name = 'user{0}'.format(i)
+    return dict(samples.USER, id=name, name=name, screen_name=name,
+                url='http://h.hatena.ne.jp/{0}/'.format(name),
+                profile_image_url='http://h.hatena.ne.jp/{0}.gif'.format(name),
+                followers_count=str(i * 7))
+
+
+def status(i, *, users=20, replies=0, depth=1):
+    """Return the dict of the i-th status posted by one of users users.
+    It has replies replies on each of depth levels.
+    """
+    created_at = _BASE - datetime.timedelta(seconds=i * 37)
+    eid = 10 ** 17 + i
+    d = dict(samples.STATUS,
+             id=str(eid),
+             link='http://h.hatena.ne.jp/user{0}/{1}'.format(i % users, eid),
+             created_at=created_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+             favorited=str(i % 13),
+             keyword='keyword{0}'.format(i % 50),
+             target=dict(samples.TARGET, word='keyword{0}'.format(i % 50)),
+             haiku_text=_BODY, html=_HTML, html_touch=_HTML,
+             html_mobile=_HTML, text=_BODY,
+             user=user(i % users), replies=[])
+    if depth > 0:
+        d['replies'] = [status(i * (replies + 1) + j + 1, users=users,
+                               replies=replies, depth=depth - 1)
+                        for j in range(replies)]
+    return d
+
+
+def timeline(n, **kwargs):
+    """Return a page of n status dicts, newest first."""
+    return [status(i, **kwargs) for i in range(n)]
+
+
+def payload(dicts):
+    """Return the JSON response body of dicts."""
+    return json.dumps(dicts).encode('utf-8')
+
+
+def keywords(n):
+    """Return n keyword dicts."""
+    return [dict(copy.deepcopy(samples.KEYWORD), word='keyword{0}'.format(i),
+                 url_name='keyword{0}'.format(i)) for i in range(n)]
+
+
+class StubHandler(haiker.api.BaseAPIHandler):
+    """Handler which only encodes the params and builds the request,
+    so that the time spent by a Haiker method before any I/O is measured.
+    """
+    def _request(self, method, path, params=None, data=None, files=None,
+                 convert=None):
+        return self._build(method, path, params, data, files)
+
+    def _cached_get(self, path, params, convert):
+        return self._build('GET', path, params)
+
+    _persistent_get = _cached_get
+
+
+class CannedSession(requests.Session):
+    """Session which answers every request with content immediately."""
+    def __init__(self, content):
+        super().__init__()
+        self.content = content
+
+    def send(self, request, **kwargs):
+        res = requests.Response()
+        res.status_code = 200
+        res.headers['Content-Type'] = 'application/json; charset=utf-8'
+        res.encoding = 'utf-8'
+        res._content = self.content
+        res.request = request
+        res.url = request.url
+        return res
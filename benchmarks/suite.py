@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+
+"""Benchmark suite of the request and parse hot paths
+
+Every benchmark reports one number where lower is better: usec per
+item for the timings and bytes per object for the memory usage.
+Results can be saved as a baseline and later runs compared with it:
+
+    python3 -m benchmarks.suite --save baseline.json
+    (change something)
+    python3 -m benchmarks.suite --compare baseline.json
+
+The comparison exits with status 1 if a benchmark is slower (or
+larger) than its baseline by more than --threshold.
+
+benchmarks/baseline.json is the baseline of the current release, made
+on the machine described by its "environment".  Timings only compare
+on the same machine, so for a change of your own save a baseline from
+the unchanged tree first, or refresh the committed one with --save
+on a release.
+"""
+
+import argparse
+import collections
+import datetime
+import json
+import platform
+import sys
+import timeit
+import tracemalloc
+import haiker
+import haiker.api
+import haiker.decoders
+import haiker.frame
+import haiker.store
+import haiker.types
+import haiker.utils
+from . import fixtures
+
+
+Benchmark = collections.namedtuple('Benchmark', ['name', 'unit', 'setup'])
+
+BENCHMARKS = []
+
+
+def benchmark(name, unit='usec'):
+    """Register the decorated setup function as a benchmark.
+
+    For a timing (unit 'usec'), setup returns a function to be timed
+    and the number of items it handles per call.  For the memory usage
+    (unit 'bytes'), setup returns a function creating objects to be
+    kept and the number of them.
+    """
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, unit, setup))
+        return setup
+    return register
+
+
+def measure(b, repeat):
+    """Return the result of b: the best usec (or the bytes) per item."""
+    func, items = b.setup()
+    if b.unit == 'bytes':
+        kept = []  # the objects are alive until the end of tracing
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            kept.append(func())
+            after = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        return (after - before) / items
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    sec = min(timer.repeat(repeat=repeat, number=number))
+    return sec / number / items * 1e6
+
+
+# Parse throughput
+@benchmark('parse.json')
+def _():
+    data = fixtures.payload(fixtures.timeline(200))
+    return lambda: json.loads(data.decode('utf-8')), 200
+
+
+def _decoder(name, decode):
+    @benchmark('parse.decode.{0}'.format(name))
+    def _():
+        data = fixtures.payload(fixtures.timeline(200))
+        return lambda: decode(data), 200
+
+
+for _name, _decode in haiker.decoders.DECODERS.items():
+    _decoder(_name, _decode)
+
+
+@benchmark('parse.statuses')
+def _():
+    dicts = fixtures.timeline(200)
+    parser = haiker.types.Parser()
+    return lambda: parser.statuses(dicts), 200
+
+
+@benchmark('parse.statuses.lazy')
+def _():
+    dicts = fixtures.timeline(200)
+    parser = haiker.types.Parser(lazy=True)
+    return lambda: parser.statuses(dicts), 200
+
+
+@benchmark('parse.statuses.store')
+def _():
+    dicts = fixtures.timeline(200)
+    parser = haiker.types.Parser(store=haiker.store.EntityStore())
+    return lambda: parser.statuses(dicts), 200
+
+
+@benchmark('parse.statuses.replies')
+def _():
+    # 3 replies on 3 levels, i.e. 40 statuses per thread
+    dicts = fixtures.timeline(20, replies=3, depth=3)
+    parser = haiker.types.Parser()
+    return lambda: parser.statuses(dicts), 20 * 40
+
+
+@benchmark('parse.frame')
+def _():
+    dicts = fixtures.timeline(200)
+    return lambda: haiker.frame.StatusFrame.from_dicts(dicts), 200
+
+
+@benchmark('parse.iter_json_array')
+def _():
+    data = fixtures.payload(fixtures.timeline(200))
+    chunks = [data[i:i + 16384] for i in range(0, len(data), 16384)]
+    return lambda: list(haiker.utils.iter_json_array(chunks)), 200
+
+
+@benchmark('parse.to_datetime')
+def _():
+    # uncached, as for timestamps seen for the first time
+    values = [d['created_at'] for d in fixtures.timeline(200)]
+    to_datetime = haiker.types.to_datetime.__wrapped__
+    return lambda: [to_datetime(x) for x in values], 200
+
+
+@benchmark('parse.keywords')
+def _():
+    dicts = fixtures.keywords(200)
+    parser = haiker.types.Parser()
+    return lambda: parser.keywords(dicts), 200
+
+
+# Encode cost
+@benchmark('encode.build_params')
+def _():
+    params = {'word': 'keyword1', 'count': 200, 'page': 3, 'sort': None,
+              'since': datetime.datetime(2010, 1, 2, 3, 4, 5,
+                                         tzinfo=datetime.timezone.utc),
+              'body_formats': ['haiku', 'html', 'touch', 'mobile']}
+    return lambda: haiker.utils.build_params(params), 1
+
+
+@benchmark('encode.to_dict')
+def _():
+    statuses = haiker.types.Parser().statuses(fixtures.timeline(200))
+    return lambda: [s.to_dict() for s in statuses], 200
+
+
+# Per-call client overhead
+def _stubbed():
+    api = haiker.Haiker(single_flight=False)
+    api._handler = fixtures.StubHandler(None, 'http://h.hatena.ne.jp/api',
+                                        'bench', single_flight=False)
+    return api
+
+
+@benchmark('call.public_timeline')
+def _():
+    api = _stubbed()
+    return lambda: api.public_timeline(count=200), 1
+
+
+@benchmark('call.keyword_timeline')
+def _():
+    api = _stubbed()
+    since = datetime.datetime(2010, 1, 2, tzinfo=datetime.timezone.utc)
+    return lambda: api.keyword_timeline('keyword1', count=200, since=since,
+                                        body_formats=['haiku', 'html']), 1
+
+
+@benchmark('call.show_status')
+def _():
+    api = _stubbed()
+    return lambda: api.show_status('123'), 1
+
+
+@benchmark('call.request')
+def _():
+    # BaseAPIHandler._request on a canned response of 20 statuses: build,
+    # prepare, sign, send and decode
+    session = fixtures.CannedSession(fixtures.payload(fixtures.timeline(20)))
+    handler = haiker.api.BaseAPIHandler(
+        haiker.BasicAuth('user', 'password'), 'http://h.hatena.ne.jp/api',
+        'bench', session=session, single_flight=False)
+    params = {'word': 'keyword1', 'count': 20}
+    path = '/statuses/keyword_timeline.json'
+    return lambda: handler._request('GET', path, params), 1
+
+
+# Memory per object
+def _parsed(n, **kwargs):
+    dicts = fixtures.timeline(n)
+    return lambda: haiker.types.Parser(**kwargs).statuses(dicts), n
+
+
+@benchmark('memory.status', unit='bytes')
+def _():
+    return _parsed(1000)
+
+
+@benchmark('memory.status.lazy', unit='bytes')
+def _():
+    return _parsed(1000, lazy=True)
+
+
+@benchmark('memory.status.store', unit='bytes')
+def _():
+    return _parsed(1000, store=haiker.store.EntityStore())
+
+
+@benchmark('memory.frame', unit='bytes')
+def _():
+    dicts = fixtures.timeline(1000)
+    return lambda: haiker.frame.StatusFrame.from_dicts(dicts), 1000
+
+
+def run(pattern=None, repeat=5, out=sys.stdout):
+    """Run the benchmarks whose names contain pattern and return
+    a dict of name: {'value': ..., 'unit': ...}.
+    """
+    results = collections.OrderedDict()
+    for b in BENCHMARKS:
+        if pattern is not None and pattern not in b.name:
+            continue
+        value = measure(b, repeat)
+        results[b.name] = {'value': value, 'unit': b.unit}
+        print('{0:<28} {1:12.3f} {2}'.format(b.name, value, b.unit),
+              file=out, flush=True)
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'system': platform.system(),
+        'haiker': haiker.__version__,
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+
+
+def compare(results, baseline, threshold, out=sys.stdout):
+    """Print the ratios of results to baseline and return the names of
+    the benchmarks worse than it by more than threshold.
+    """
+    regressions = []
+    print('{0:<28} {1:>12} {2:>12} {3:>8}'.format(
+        'benchmark', 'baseline', 'current', 'ratio'), file=out)
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None or base['unit'] != result['unit']:
+            print('{0:<28} {1:>12} {2:12.3f}'.format(
+                name, '-', result['value']), file=out)
+            continue
+        ratio = result['value'] / base['value'] if base['value'] else 1.0
+        mark = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            mark = '  slower'
+        elif ratio < 1 - threshold:
+            mark = '  faster'
+        print('{0:<28} {1:12.3f} {2:12.3f} {3:8.2f}{4}'.format(
+            name, base['value'], result['value'], ratio, mark), file=out)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python3 -m benchmarks.suite')
+    parser.add_argument('-k', '--filter', metavar='PATTERN',
+                        help='run benchmarks whose names contain PATTERN')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timings per benchmark (default: %(default)s)')
+    parser.add_argument('--save', metavar='FILE',
+                        help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results with a baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='tolerated ratio of slowdown '
+                        '(default: %(default)s)')
+    args = parser.parse_args(argv)
+    results = run(args.filter, args.repeat)
+    status = 0
+    if args.compare is not None:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(file=sys.stdout)
+        print('baseline: {0}'.format(json.dumps(baseline['environment'],
+                                                sort_keys=True)))
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print('{0} regression(s): {1}'.format(len(regressions),
+                                                  ', '.join(regressions)))
+            status = 1
+    if args.save is not None:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results},
+                      f, indent=2)
+            f.write('\n')
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,16 +5,23 @@ import datetime
 import functools
 import pprint
 import readline
-import time
 import haiker
+import haiker.ratelimit
+
+
+def _to_json(obj):
+    """Return the decoded JSON form of a converted response."""
+    if isinstance(obj, list):
+        return [_to_json(x) for x in obj]
+    return obj.to_dict() if hasattr(obj, 'to_dict') else obj
 
 
 def _request(func):
     @functools.wraps(func)
     def req(self, path, *args, **kwargs):
-        time.sleep(5)
         print('[{0}]'.format(path))
-        retval = data = func(self, path, *args, **kwargs)
+        retval = func(self, path, *args, **kwargs)
+        data = _to_json(retval)
         if isinstance(data, list):
             print('Number of Elements: {0}'.format(len(retval)))
             if len(data) > 0:
@@ -30,6 +37,10 @@ haiker.api.BaseAPIHandler.get = _request(haiker.api.BaseAPIHandler.get)
 haiker.api.BaseAPIHandler.post = _request(haiker.api.BaseAPIHandler.post)
 
 
+_BUCKET = haiker.ratelimit.TokenBucket(0.2, capacity=1)  # a call per 5 sec.
+RATE_LIMITER = haiker.ratelimit.RateLimiter(read=_BUCKET, write=_BUCKET)
+
+
 class APIChecker(object):
     def __init__(self, keyword, someone):
         super().__init__()
@@ -45,7 +56,7 @@ class APIChecker(object):
 
     def check_without_auth(self):
         self._print_title('Checking APIs available without auth')
-        api = haiker.Haiker()
+        api = haiker.Haiker(rate_limiter=RATE_LIMITER)
         # Timeline APIs
         api.public_timeline()
         api.keyword_timeline(self.keyword)
@@ -62,7 +73,7 @@ class APIChecker(object):
         api.followers(self.someone)
 
     def _check_with_auth(self, auth):
-        api = haiker.Haiker(auth)
+        api = haiker.Haiker(auth, rate_limiter=RATE_LIMITER)
         url_name = api.show_user().screen_name
         user_keyword = 'id:{0}'.format(url_name)
         # Timeline APIs
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+"""Command line tools of haiker
+
+Usage:
+
+    python3 -m haiker export {user,keyword,friends} NAME -o FILE
+    python3 -m haiker serve [--port PORT] [--latency SECONDS]
+    python3 -m haiker loadtest [--concurrency N] [--duration SECONDS]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from . import (api, error, export, fakeserver, loadtest, ratelimit, retry,
+               types, utils)
+
+
+def _export(args):
+    limiter = ratelimit.RateLimiter(read=ratelimit.TokenBucket(args.rate))
+    client = api.Haiker(root=args.root, rate_limiter=limiter,
+                        retry=retry.RetryPolicy(max_retries=5))
+
+    def progress(page, written):
+        if not args.quiet:
+            print('page {0}: {1} statuses'.format(page, written),
+                  file=sys.stderr)
+    with client:
+        written = export.export(
+            client, args.kind, args.name, args.output, count=args.count,
+            since=args.since, body_formats=args.body_formats,
+            workers=args.workers, checkpoint_every=args.checkpoint_every,
+            progress=progress)
+    print('{0} statuses written to {1}'.format(written, args.output),
+          file=sys.stderr)
+    return 0
+
+
+def _serve(args):
+    dataset = fakeserver.Dataset(
+        users=args.users, keywords=args.keywords, statuses=args.statuses,
+        replies=args.replies, body_size=args.body_size, seed=args.seed)
+    server = fakeserver.FakeServer(
+        (args.host, args.port), dataset, latency=args.latency,
+        jitter=args.jitter, error_rate=args.error_rate, seed=args.seed,
+        verbose=args.verbose)
+    print('serving the API at {0}'.format(server.url), file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def _loadtest(args):
+    if args.aio:
+        report = asyncio.run(_loadtest_async(args))
+    else:
+        session = utils.make_session(pool_maxsize=args.concurrency)
+        with api.Haiker(root=args.root, session=session,
+                        single_flight=False) as client:
+            targets = loadtest.find_targets(client, args.count)
+            report = loadtest.run(
+                client, args.mix, concurrency=args.concurrency,
+                rate=args.rate, duration=args.duration,
+                requests=args.requests, targets=targets, seed=args.seed)
+    if args.json:
+        print(json.dumps(report.to_dict(), indent=2))
+    else:
+        print(report.format())
+    return 0
+
+
+async def _loadtest_async(args):
+    from . import aio  # requires aiohttp
+    session = aio.make_session(limit=args.concurrency)
+    async with session, aio.AsyncHaiker(root=args.root, session=session,
+                                        single_flight=False) as client:
+        targets = await loadtest.find_targets_async(client, args.count)
+        return await loadtest.run_async(
+            client, args.mix, concurrency=args.concurrency, rate=args.rate,
+            duration=args.duration, requests=args.requests,
+            targets=targets, seed=args.seed)
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='python3 -m haiker')
+    parser.add_argument('--root', default='http://h.hatena.ne.jp/api',
+                        help='API root URL (default: %(default)s)')
+    commands = parser.add_subparsers(dest='command', metavar='COMMAND')
+    commands.required = True
+
+    p = commands.add_parser(
+        'export', help='export a whole timeline to gzipped JSON Lines',
+        description='Export a whole timeline to gzipped JSON Lines.  '
+        'Rerun the same command to resume an interrupted export.')
+    p.add_argument('kind', choices=export.KINDS)
+    p.add_argument('name', help='user name or keyword')
+    p.add_argument('-o', '--output', required=True,
+                   help='output file, e.g. NAME.jsonl.gz')
+    p.add_argument('--since', type=types.to_datetime,
+                   help='only statuses since this time '
+                   '(e.g. 2010-01-02T03:04:05Z)')
+    p.add_argument('--body-formats', type=lambda s: s.split(','),
+                   help='comma-separated body formats, e.g. haiku,html')
+    p.add_argument('--count', type=int, default=200,
+                   help='statuses per page (default: %(default)s)')
+    p.add_argument('--workers', type=int, default=4,
+                   help='concurrent page fetches (default: %(default)s)')
+    p.add_argument('--rate', type=float, default=1.0,
+                   help='requests per second (default: %(default)s)')
+    p.add_argument('--checkpoint-every', type=int, default=10,
+                   metavar='PAGES',
+                   help='pages between checkpoints (default: %(default)s)')
+    p.add_argument('-q', '--quiet', action='store_true',
+                   help='do not report progress')
+    p.set_defaults(func=_export)
+
+    p = commands.add_parser(
+        'serve', help='serve a local stand-in of the API',
+        description='Serve a local stand-in of the API with synthetic '
+        'data.  Give the printed URL to --root or haiker.Haiker(root=...).')
+    p.add_argument('--host', default='127.0.0.1',
+                   help='address to bind (default: %(default)s)')
+    p.add_argument('--port', type=int, default=8080,
+                   help='port to bind, or 0 for any (default: %(default)s)')
+    p.add_argument('--latency', type=float, default=0.0, metavar='SECONDS',
+                   help='delay of each response (default: %(default)s)')
+    p.add_argument('--jitter', type=float, default=0.0, metavar='SECONDS',
+                   help='maximum random delay added to the latency '
+                   '(default: %(default)s)')
+    p.add_argument('--error-rate', type=float, default=0.0,
+                   help='probability of 503 responses (default: %(default)s)')
+    p.add_argument('--users', type=int, default=50,
+                   help='number of users (default: %(default)s)')
+    p.add_argument('--keywords', type=int, default=100,
+                   help='number of keywords (default: %(default)s)')
+    p.add_argument('--statuses', type=int, default=5000,
+                   help='number of statuses (default: %(default)s)')
+    p.add_argument('--replies', type=int, default=2,
+                   help='replies per status (default: %(default)s)')
+    p.add_argument('--body-size', type=int, default=80, metavar='CHARS',
+                   help='length of status bodies (default: %(default)s)')
+    p.add_argument('--seed', type=int, default=0,
+                   help='seed of the data and failures '
+                   '(default: %(default)s)')
+    p.add_argument('-v', '--verbose', action='store_true',
+                   help='log requests')
+    p.set_defaults(func=_serve)
+
+    p = commands.add_parser(
+        'loadtest', help='measure throughput and latency under load',
+        description='Call a mix of APIs concurrently and report the '
+        'throughput, latency percentiles, errors and client resources.  '
+        'Point --root at a stand-in from the serve command rather than '
+        'the real API.')
+    p.add_argument('--mix', type=loadtest.parse_mix,
+                   default=loadtest.DEFAULT_MIX, metavar='API=WEIGHT,...',
+                   help='weighted Haiker methods to call, e.g. '
+                   'show_status=3,hot_keywords=1 (default: {0})'.format(
+                       ','.join('{0}={1}'.format(k, v) for k, v in
+                                loadtest.DEFAULT_MIX.items())))
+    p.add_argument('-c', '--concurrency', type=int, default=10,
+                   help='threads or tasks (default: %(default)s)')
+    p.add_argument('--rate', type=float,
+                   help='calls started per second (default: as fast as '
+                   'the calls complete)')
+    p.add_argument('-d', '--duration', type=float, default=10.0,
+                   metavar='SECONDS', help='default: %(default)s')
+    p.add_argument('-n', '--requests', type=int,
+                   help='stop after this number of calls')
+    p.add_argument('--count', type=int,
+                   help='statuses per page of the timeline APIs')
+    p.add_argument('--aio', action='store_true',
+                   help='use AsyncHaiker and tasks instead of threads')
+    p.add_argument('--seed', type=int, default=0,
+                   help='seed of the mix and arguments '
+                   '(default: %(default)s)')
+    p.add_argument('--json', action='store_true',
+                   help='print the report in JSON')
+    p.set_defaults(func=_loadtest)
+    return parser
+
+
+def main(argv=None):
+    args = _parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except error.HaikerError as e:
+        print('error: {0}'.format(e.causal_error), file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
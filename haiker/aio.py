@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+
+"""asyncio support (requires aiohttp)
+
+Example:
+
+import asyncio
+import haiker.aio
+
+async def main():
+    async with haiker.aio.AsyncHaiker() as api:
+        timelines = await asyncio.gather(
+            api.keyword_timeline('BOT'),
+            api.keyword_timeline('Python'),
+        )
+    for statuses in timelines:
+        print(len(statuses))
+
+asyncio.run(main())
+"""
+
+import asyncio
+import codecs
+import collections
+import functools
+import time
+import aiohttp
+from . import api, auth, error, frame, metrics, retry, tracing, utils
+
+
+def make_session(*, limit=100, limit_per_host=0, keep_alive=True):
+    """Return an aiohttp.ClientSession with a tuned connection pool.
+
+    limit is the total number of simultaneous connections and
+    limit_per_host is that for each host (0 means no limit).
+    This function has to be called in a running event loop.
+    """
+    connector = aiohttp.TCPConnector(limit=limit,
+                                     limit_per_host=limit_per_host,
+                                     force_close=not keep_alive)
+    return aiohttp.ClientSession(connector=connector)
+
+
+def _native(s):
+    return s.decode('latin-1') if isinstance(s, bytes) else s
+
+
+def _client_timeout(timeout):
+    if timeout is None:
+        return None
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+    return aiohttp.ClientTimeout(total=retry.remaining(),
+                                 sock_connect=connect, sock_read=read)
+
+
+class _Attempts(object):
+    """Async context manager which enters the response context of req
+    and retries it as BaseAPIHandler._send() does.  Error responses
+    which are not retried are returned as they are.
+    """
+    def __init__(self, handler, method, req, record=None):
+        super().__init__()
+        self._handler = handler
+        self._method = method
+        self._req = req
+        self._record = record
+        self._context = None
+
+    async def __aenter__(self):
+        handler, method, record = self._handler, self._method, self._record
+        attempt = 0
+        while True:
+            if record is not None:
+                record.retries = attempt
+            timeout = handler._before_attempt()
+            try:
+                if handler.rate_limiter is not None:
+                    delay = handler.rate_limiter.reserve(method)
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                self._context = handler._open(self._req, timeout, record)
+                with tracing.start('haiker.network',
+                                   attempt=attempt) as span:
+                    res = await self._enter()
+                    span.set_attribute('status', res.status)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                delay = handler._after_failure(method, None, attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                # e.g. ClientPayloadError or CancelledError
+                handler._abort_attempt()
+                raise
+            else:
+                if res.status < 400:
+                    if handler.circuit_breaker is not None:
+                        handler.circuit_breaker.record_success()
+                    return res
+                delay = handler._after_failure(method, res.status, attempt)
+                if delay is None:
+                    return res
+                await self._context.__aexit__(None, None, None)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _enter(self):
+        record = self._record
+        if record is None:
+            return await self._context.__aenter__()
+        start = time.perf_counter()
+        try:
+            res = await self._context.__aenter__()
+        finally:
+            record.network_time += time.perf_counter() - start
+        record.status = res.status
+        return res
+
+    async def __aexit__(self, *exc_info):
+        return await self._context.__aexit__(*exc_info)
+
+
+async def _received(record, chunks):
+    """metrics.received() for an asynchronous iterator of chunks"""
+    chunks = chunks.__aiter__()
+    while True:
+        start = time.perf_counter()
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            record.network_time += time.perf_counter() - start
+        record.bytes_received += len(chunk)
+        yield chunk
+
+
+class _SingleFlight(object):
+    """utils.SingleFlight for coroutines in one event loop
+
+    A waiter raises retry.DeadlineExceeded after timeout seconds
+    unless it is None.
+    """
+    def __init__(self):
+        super().__init__()
+        self._tasks = {}
+
+    def __len__(self):
+        return len(self._tasks)
+
+    async def do(self, key, coro, timeout=None):
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(coro)
+            task.add_done_callback(functools.partial(self._finish, key))
+        else:
+            coro.close()  # never awaited
+        try:
+            # a cancelled caller does not cancel the others
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            if task.done():  # raised by the call
+                raise
+            raise retry.DeadlineExceeded('deadline exceeded') from None
+
+    def _finish(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # retrieved even if every caller has gone
+
+
+class AsyncAPIHandler(api.BaseAPIHandler):
+    """Base API handler whose get() and post() return coroutines
+
+    Requests are encoded and signed in the same way as
+    BaseAPIHandler, and sent with an aiohttp.ClientSession
+    (created by make_session() on the first call if none is given).
+    """
+    _SingleFlight = _SingleFlight
+
+    def _new_session(self):
+        return None  # make_session() requires a running event loop
+
+    async def _coalesce(self, key, get):
+        return api._own(await self.flights.do(key, get(),
+                                              retry.remaining()))
+
+    def _send(self, method, path, params=None, data=None, files=None,
+              headers=None, record=None):
+        req = self._build(method, path, params, data, files, headers)
+        return _Attempts(self, method, req, record)
+
+    def _open(self, req, timeout, record=None):
+        prepared = req.prepare()  # signed now
+        if record is not None:
+            record.bytes_sent += metrics.body_size(prepared.body)
+        if self.session is None:
+            self.session = make_session()
+        headers = {_native(key): _native(value)
+                   for key, value in prepared.headers.items()}
+        kwargs = {}
+        timeout = _client_timeout(timeout)
+        if timeout is not None:
+            kwargs['timeout'] = timeout
+        return self.session.request(prepared.method, prepared.url,
+                                    headers=headers, data=prepared.body,
+                                    **kwargs)
+
+    @staticmethod
+    async def _read(res, record):
+        with tracing.start('haiker.receive'):
+            if record is None:
+                return await res.read()
+            start = time.perf_counter()
+            try:
+                payload = await res.read()
+            finally:
+                record.network_time += time.perf_counter() - start
+            record.bytes_received += len(payload)
+            return payload
+
+    async def _request(self, method, path, params=None, data=None,
+                       files=None, convert=None):
+        with metrics.recording(self.observers, method, path) as record, \
+                self._span(method, path, params):
+            async with self._send(method, path, params, data, files,
+                                  record=record) as res:
+                res.raise_for_status()
+                payload = await self._read(res, record)
+            obj = self._decode(self.decoder, payload, record)
+            return self._convert(obj, convert, record)
+
+    async def _cached_get(self, path, params, convert):
+        with metrics.recording(self.observers, 'GET', path) as record, \
+                self._span('GET', path, params):
+            key = self.cache.key(path, params, convert,
+                                 auth.identity(self.auth))
+            entry = self.cache.lookup(key)
+            if entry is not None and self.cache.is_fresh(entry):
+                if record is not None:
+                    record.cached = True
+                return entry.value
+            headers = self.cache.validators(entry)
+            async with self._send('GET', path, params, headers=headers,
+                                  record=record) as res:
+                if res.status == 304 and entry is not None:
+                    if record is not None:
+                        record.cached = True
+                    return self.cache.refresh(key, entry)
+                res.raise_for_status()
+                payload = await self._read(res, record)
+                etag = res.headers.get('ETag')
+                last_modified = res.headers.get('Last-Modified')
+            obj = self._decode(self.decoder, payload, record)
+            value = self._convert(obj, convert, record)
+            return self.cache.store(key, etag, last_modified, value)
+
+    async def _persistent_get(self, path, params, convert):
+        with metrics.recording(self.observers, 'GET', path) as record, \
+                self._span('GET', path, params):
+            key = self.disk_cache.key(path, params)
+            payload = self.disk_cache.get(key)
+            if payload is None:
+                async with self._send('GET', path, params,
+                                      record=record) as res:
+                    res.raise_for_status()
+                    payload = await self._read(res, record)
+                obj = self._decode(self.decoder, payload, record)
+                self.disk_cache.put(key, payload)
+            else:
+                if record is not None:
+                    record.cached = True
+                obj = self._decode(self.decoder, payload, record)
+            return self._convert(obj, convert, record)
+
+    async def iter_get(self, path, params=None, *, convert=None):
+        with metrics.recording(self.observers, 'GET', path) as record:
+            # the span is not current while the consumer runs
+            span = self._span('GET', path, params)
+            attempts = self._send('GET', path, params, record=record)
+            error = None
+            try:
+                with span.activate():
+                    res = await attempts.__aenter__()
+                try:
+                    res.raise_for_status()
+                    async for obj in self._iter_array(res, record):
+                        if convert is not None:
+                            obj = metrics.timed(record, 'parse_time',
+                                                convert, obj)
+                        yield obj
+                finally:
+                    await attempts.__aexit__(None, None, None)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                span.end(error)
+
+    async def _iter_array(self, res, record):
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        parser = utils.JSONArrayParser()
+
+        def feed(chunk):
+            if chunk is None:  # the end
+                return parser.feed(decoder.decode(b'', final=True))
+            return parser.feed(decoder.decode(chunk))
+        chunks = res.content.iter_chunked(self.chunk_size)
+        if record is not None:
+            chunks = _received(record, chunks)
+        async for chunk in chunks:
+            for obj in metrics.timed(record, 'decode_time', feed, chunk):
+                yield obj
+        for obj in metrics.timed(record, 'decode_time', feed, None):
+            yield obj
+        parser.close()
+
+    async def close(self):
+        """Release the pooled connections of an owned session."""
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class AsyncHaiker(api.Haiker):
+    """Handler for the Hatena Haiku RESTful API on asyncio
+
+    Every API method of haiker.Haiker is available
+    as a coroutine function, and iter_* and stream_* methods and
+    timeline methods called with incremental=True return asynchronous
+    iterators.
+
+    Example:
+
+    >>> async with haiker.aio.AsyncHaiker(auth) as api:
+    ...     statuses = await api.public_timeline(count=3)
+    >>> len(statuses)
+    3
+    """
+    _Handler = AsyncAPIHandler
+
+    def _timeline(self, path, params, incremental, as_frame):
+        if as_frame and incremental:
+            return self._collect_frame(self._handler.iter_get(path, params))
+        return api.Haiker._timeline(self, path, params, incremental,
+                                    as_frame)
+
+    async def _collect_frame(self, dicts):
+        return frame.StatusFrame.from_dicts([d async for d in dicts])
+
+    async def _bulk(self, func, keys, max_workers):
+        keys = list(keys)
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def call(key):
+            async with semaphore:
+                try:
+                    return await func(key)
+                except error.HaikerError as e:
+                    return e
+        unique = list(collections.OrderedDict.fromkeys(keys))
+        with tracing.start('haiker.bulk', self._handler.tracer,
+                           size=len(unique)):
+            # the tasks inherit the span
+            results = await asyncio.gather(*[call(key) for key in unique])
+        results = dict(zip(unique, results))
+        return [results[key] for key in keys]
+
+    async def _paginate(self, fetch, kwargs, limit, prefetch):
+        kwargs = dict(kwargs)
+        page = kwargs.pop('page', None) or 1
+        count = kwargs.get('count')
+        task = None
+        span = tracing.start('haiker.paginate', self._handler.tracer,
+                             limit=limit)
+        error = None
+        try:
+            n = 0
+            with span.activate():
+                items = await fetch(page=page, **kwargs)
+            while items:
+                page += 1
+                if count is not None and len(items) < count:
+                    has_next = False
+                else:
+                    has_next = limit is None or n + len(items) < limit
+                if has_next and prefetch:
+                    with span.activate():  # copied to the task
+                        task = asyncio.ensure_future(fetch(page=page,
+                                                           **kwargs))
+                for item in items:
+                    if limit is not None and n >= limit:
+                        return
+                    n += 1
+                    yield item
+                if not has_next:
+                    return
+                if task is None:
+                    with span.activate():
+                        items = await fetch(page=page, **kwargs)
+                else:
+                    items = await task
+                    task = None
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if task is not None:
+                task.cancel()
+            span.end(error)
+
+    async def _stream(self, fetch, kwargs, count, min_interval,
+                      max_interval, max_pages):
+        kwargs = dict(kwargs)
+        poll = api._Poll(kwargs.pop('since'), count, min_interval,
+                         max_interval)
+        while True:
+            for page in range(poll.page, poll.page + max_pages):
+                statuses = await fetch(**kwargs, **poll.params(page))
+                if not poll.feed(statuses):
+                    break
+            else:  # older unseen statuses may be on the next page
+                poll.resume(page + 1)
+                await asyncio.sleep(min_interval)
+                continue
+            for status in poll.finish():
+                yield status
+            await asyncio.sleep(poll.interval)
+
+    def __enter__(self):
+        raise TypeError('use "async with" instead')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -1,9 +1,25 @@
 #!/usr/bin/env python3
 
+import collections
+import concurrent.futures
+import contextvars
+import datetime
 import functools
 import re
 import requests
-from . import error, types, utils
+import time
+from . import (auth, decoders, endpoints, error, frame, metrics, retry,
+               tracing, types, utils)
+
+
+_SUSPICIOUS = re.compile('[^a-zA-Z0-9./\\-_]|\\.\\.|//')
+
+
+def _own(value):
+    """Return a copy of value if it is a list, so that each caller of
+    a coalesced call can sort or pop its own list.
+    """
+    return list(value) if isinstance(value, list) else value
 
 
 class BaseAPIHandler(object):
@@ -25,30 +41,390 @@ class BaseAPIHandler(object):
     >>> statuses[0]['user']['url']
     'http://h.hatena.ne.jp/xxxxxx/'
     """
-    def __init__(self, auth, root, user_agent):
+    chunk_size = 16384  # bytes read at once by iter_get()
+    _SingleFlight = utils.SingleFlight
+
+    def __init__(self, auth, root, user_agent, *, session=None, cache=None,
+                 disk_cache=None, rate_limiter=None, timeout=None,
+                 retry=None, circuit_breaker=None, single_flight=True,
+                 observers=(), tracer=None, decoder=None):
+        """session is a requests.Session whose connection pool is used
+        for every call.  A new one is created by utils.make_session()
+        if it is None, and only such an owned session is closed
+        by close().
+
+        cache is a haiker.cache.ResponseCache used by get(), and
+        disk_cache is a haiker.cache.DiskCache used by get() called
+        with persistent=True instead.
+
+        rate_limiter is a haiker.ratelimit.RateLimiter which every
+        request waits for.
+
+        timeout is None, seconds or a (connect, read) pair for every
+        request, and is shortened by haiker.retry.deadline().  retry is
+        a haiker.retry.RetryPolicy and circuit_breaker is
+        a haiker.retry.CircuitBreaker.
+
+        If single_flight is true, concurrent get() calls with the same
+        arguments and auth share one request and its result.
+
+        observers are callables which receive a haiker.metrics.CallRecord
+        after each call.
+
+        tracer is a haiker.tracing.Tracer which makes the spans of calls.
+
+        decoder decodes the bytes of JSON responses (see
+        haiker.decoders), and is haiker.decoders.default() if None.
+        """
         super().__init__()
         self.auth = auth
         self.root = root
         self.user_agent = user_agent
-
-    def _request(self, method, path, params=None, data=None, files=None):
-        if re.search('[^a-zA-Z0-9./\\-_]|\\.\\.|//', path) is not None:
+        self.cache = cache
+        self.disk_cache = disk_cache
+        self.rate_limiter = rate_limiter
+        self.timeout = timeout
+        self.retry = retry
+        self.circuit_breaker = circuit_breaker
+        self.flights = self._SingleFlight() if single_flight else None
+        self.observers = list(observers)
+        self.tracer = tracer
+        self.decoder = decoders.default() if decoder is None else decoder
+        self._owns_session = session is None
+        self.session = self._new_session() if session is None else session
+
+    def _new_session(self):
+        return utils.make_session()
+
+    def _build(self, method, path, params=None, data=None, files=None,
+               headers=None):
+        """Return an unprepared requests.Request."""
+        if _SUSPICIOUS.search(path) is not None:
             raise ValueError('suspicious path: {0!r}'.format(path))
         url = self.root.rstrip('/') + '/' + path.lstrip('/')
-        headers = {'User-Agent': self.user_agent}
-        res = method(url, headers=headers, auth=self.auth,
-                     params=utils.build_params(params),
-                     data=utils.build_params(data),
-                     files=files)
-        res.raise_for_status()
-        return res.json()
+        headers = dict(headers or {})
+        headers['User-Agent'] = self.user_agent
+        return requests.Request(method, url, headers=headers, auth=self.auth,
+                                params=utils.build_params(params),
+                                data=utils.build_params(data),
+                                files=files)
+
+    def _send(self, method, path, params=None, data=None, files=None,
+              stream=False, headers=None, record=None):
+        req = self._build(method, path, params, data, files, headers)
+        attempt = 0
+        while True:
+            if record is not None:
+                record.retries = attempt
+            timeout = self._before_attempt()
+            try:
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire(method)
+                prepared = self.session.prepare_request(req)  # signed now
+                settings = self.session.merge_environment_settings(
+                    prepared.url, {}, stream, None, None)
+                with tracing.start('haiker.network', attempt=attempt) as span:
+                    res = self._transmit(prepared, timeout, settings, record)
+                    span.set_attribute('status', res.status_code)
+                res.raise_for_status()
+            except (requests.ConnectionError, requests.Timeout):
+                delay = self._after_failure(method, None, attempt)
+                if delay is None:
+                    raise
+            except requests.HTTPError as e:
+                res.close()
+                delay = self._after_failure(method, e.response.status_code,
+                                            attempt)
+                if delay is None:
+                    raise
+            except BaseException:
+                # e.g. ChunkedEncodingError or an error in signing
+                self._abort_attempt()
+                raise
+            else:
+                if self.circuit_breaker is not None:
+                    self.circuit_breaker.record_success()
+                return res
+            time.sleep(delay)
+            attempt += 1
+
+    def _transmit(self, prepared, timeout, settings, record):
+        if record is None:
+            return self.session.send(prepared, timeout=timeout, **settings)
+        record.bytes_sent += metrics.body_size(prepared.body)
+        start = time.perf_counter()
+        try:
+            res = self.session.send(prepared, timeout=timeout, **settings)
+        finally:
+            record.network_time += time.perf_counter() - start
+        record.status = res.status_code
+        if not settings.get('stream'):
+            record.bytes_received += len(res.content)
+        return res
+
+    def _before_attempt(self):
+        """Check the circuit breaker and the deadline, and return
+        the timeout for the next attempt.
+        """
+        timeout = retry.timeout_for(self.timeout)
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.before()
+        return timeout
+
+    def _abort_attempt(self):
+        """Release the trial call of the circuit breaker for an attempt
+        which ended without a response or a network error.
+        """
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.release()
 
-    def get(self, path, params=None):
-        return self._request(requests.get, path, params=params)
+    def _after_failure(self, method, status, attempt):
+        """Record a failed attempt (status is None for a connection error
+        or a timeout) and return the seconds to wait before retrying it,
+        or None to give up.
+        """
+        breaker = self.circuit_breaker
+        if breaker is not None:
+            if status is None or status >= 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()  # the server is up
+        if self.retry is None or not self.retry.retryable(method, status,
+                                                          attempt):
+            return None
+        delay = self.retry.delay(attempt)
+        left = retry.remaining()
+        if left is not None and left <= delay:
+            return None
+        return delay
+
+    def _request(self, method, path, params=None, data=None, files=None,
+                 convert=None):
+        with metrics.recording(self.observers, method, path) as record, \
+                self._span(method, path, params):
+            res = self._send(method, path, params, data, files,
+                             record=record)
+            obj = self._decode(self.decoder, res.content, record)
+            return self._convert(obj, convert, record)
+
+    def _span(self, method, path, params):
+        """Return the haiker.call span of a call."""
+        if not tracing.enabled(self.tracer):
+            return tracing.NOOP
+        e = endpoints.find(path)
+        page = None if params is None else dict(params).get('page')
+        return tracing.start('haiker.call', self.tracer,
+                             endpoint=None if e is None else e.name,
+                             method=method, path=path, page=page)
+
+    @staticmethod
+    def _decode(decode, payload, record):
+        with tracing.start('haiker.decode'):
+            return metrics.timed(record, 'decode_time', decode, payload)
+
+    @staticmethod
+    def _convert(obj, convert, record):
+        if convert is None:
+            return obj
+        with tracing.start('haiker.parse'):
+            return metrics.timed(record, 'parse_time', convert, obj)
+
+    def get(self, path, params=None, *, convert=None, persistent=False):
+        """Call API with GET.  The decoded JSON is passed to convert
+        unless it is None.  The result may come from the cache, or from
+        the disk cache if persistent is true, or from a concurrent call
+        with the same arguments, whose callers get lists of their own
+        but share the objects in them.
+        """
+        get = functools.partial(self._get, path, params, convert,
+                                persistent)
+        if self.flights is None:
+            return get()
+        params = utils.build_params(params)
+        key = (auth.identity(self.auth), path,
+               None if params is None else tuple(params), convert, persistent)
+        return self._coalesce(key, get)
+
+    def _coalesce(self, key, get):
+        try:
+            return _own(self.flights.do(key, get, retry.remaining()))
+        except concurrent.futures.TimeoutError:
+            left = retry.remaining()
+            if left is None or left > 0:  # raised by the call
+                raise
+            raise retry.DeadlineExceeded('deadline exceeded') from None
+
+    def _get(self, path, params, convert, persistent):
+        if persistent and self.disk_cache is not None:
+            return self._persistent_get(path, params, convert)
+        if self.cache is None:
+            return self._request('GET', path, params=params, convert=convert)
+        return self._cached_get(path, params, convert)
+
+    def _cached_get(self, path, params, convert):
+        with metrics.recording(self.observers, 'GET', path) as record, \
+                self._span('GET', path, params):
+            key = self.cache.key(path, params, convert,
+                                 auth.identity(self.auth))
+            entry = self.cache.lookup(key)
+            if entry is not None and self.cache.is_fresh(entry):
+                if record is not None:
+                    record.cached = True
+                return entry.value
+            res = self._send('GET', path, params,
+                             headers=self.cache.validators(entry),
+                             record=record)
+            if res.status_code == 304 and entry is not None:
+                if record is not None:
+                    record.cached = True
+                return self.cache.refresh(key, entry)
+            obj = self._decode(self.decoder, res.content, record)
+            value = self._convert(obj, convert, record)
+            return self.cache.store(key, res.headers.get('ETag'),
+                                    res.headers.get('Last-Modified'), value)
+
+    def _persistent_get(self, path, params, convert):
+        with metrics.recording(self.observers, 'GET', path) as record, \
+                self._span('GET', path, params):
+            key = self.disk_cache.key(path, params)
+            payload = self.disk_cache.get(key)
+            if payload is None:
+                payload = self._send('GET', path, params,
+                                     record=record).content
+                obj = self._decode(self.decoder, payload, record)
+                self.disk_cache.put(key, payload)
+            else:
+                if record is not None:
+                    record.cached = True
+                obj = self._decode(self.decoder, payload, record)
+            return self._convert(obj, convert, record)
+
+    def iter_get(self, path, params=None, *, convert=None):
+        """Call API with GET and yield the elements of the JSON array
+        response one by one as soon as each of them is received.
+        Each element is passed to convert unless it is None.
+        """
+        with metrics.recording(self.observers, 'GET', path) as record:
+            # the span is not current while the consumer runs
+            span = self._span('GET', path, params)
+            error = None
+            try:
+                with span.activate():
+                    res = self._send('GET', path, params, stream=True,
+                                     record=record)
+                try:
+                    chunks = res.iter_content(self.chunk_size)
+                    if record is None:
+                        objs = utils.iter_json_array(chunks)
+                    else:
+                        objs = metrics.decoded(record, utils.iter_json_array(
+                            metrics.received(record, chunks)))
+                    for obj in objs:
+                        if convert is not None:
+                            obj = metrics.timed(record, 'parse_time',
+                                                convert, obj)
+                        yield obj
+                finally:
+                    res.close()
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                span.end(error)
+
+    def post(self, path, params=None, data=None, files=None, *,
+             convert=None):
+        """Call API with POST.  The decoded JSON is passed to convert
+        unless it is None.
+        """
+        return self._request('POST', path, params=params, data=data,
+                             files=files, convert=convert)
 
-    def post(self, path, params=None, data=None, files=None):
-        return self._request(requests.post, path,
-                             params=params, data=data, files=files)
+    def close(self):
+        """Release the pooled connections of an owned session."""
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _Poll(object):
+    """State of a polling stream of statuses
+
+    Statuses are collected from the pages of a poll, deduplicated by id
+    against the statuses seen before, and released in chronological
+    order by finish(), which also adapts the interval to the observed
+    post rate so that a poll is expected to return half a page.  A poll
+    cut short by the page limit is resumed from the next page by the
+    following one, and its statuses are held until the backlog ends.
+    """
+    # since is requested with a margin in case the API compares
+    # exclusively, and older statuses are dropped
+    _margin = datetime.timedelta(seconds=1)
+
+    def __init__(self, since, count, min_interval, max_interval):
+        super().__init__()
+        if since is not None and since.tzinfo is None:
+            since = since.astimezone()  # local time
+        self.since = since
+        self.count = count
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self._seen = {}  # id: created_at
+        self._new = {}
+        self._polled = None
+        self.page = 1  # the first page of the next poll
+
+    def params(self, page):
+        since = None if self.since is None else self.since - self._margin
+        return {'page': page, 'count': self.count, 'since': since}
+
+    def feed(self, statuses):
+        """Add a page and return whether the next page may have
+        unseen statuses.  Without since, the first poll takes only the
+        newest page, from which the following polls start.
+        """
+        fresh = 0
+        for status in statuses:
+            if self.since is not None and status.created_at < self.since:
+                continue
+            if status.id not in self._seen and status.id not in self._new:
+                self._new[status.id] = status
+                fresh += 1
+        if self.since is None:
+            return False
+        return fresh > 0 and len(statuses) >= self.count
+
+    def resume(self, page):
+        """Hold the new statuses and start the next poll at page."""
+        self.page = page
+
+    def finish(self):
+        """Return the new statuses of this poll in chronological order."""
+        self.page = 1
+        now = time.monotonic()
+        new = sorted(self._new.values(), key=lambda s: (s.created_at, s.id))
+        self._new = {}
+        if new:
+            self.since = new[-1].created_at
+            self._seen.update((s.id, s.created_at) for s in new)
+            self._seen = {k: t for k, t in self._seen.items()
+                          if t >= self.since}
+        if self._polled is not None:
+            if new:
+                rate = len(new) / max(now - self._polled, 1e-3)
+                interval = self.count / 2 / rate
+            else:
+                interval = self.interval * 2
+            self.interval = min(self.max_interval,
+                                max(self.min_interval, interval))
+        self._polled = now
+        return new
 
 
 class Haiker(object):
@@ -68,16 +444,124 @@ class Haiker(object):
     datetime.datetime(2010, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
     >>> status.user.url
     'http://h.hatena.ne.jp/xxxxxx/'
+
+    Timeline APIs called with incremental=True return an iterator
+    which parses the response while it is being received and yields
+    each status as soon as it is complete:
+
+    >>> for status in api.public_timeline(count=200, incremental=True):
+    ...     print(status.id)
+
+    With frame=True, they return a haiker.frame.StatusFrame, a compact
+    columnar batch for bulk analytics, built without Status objects.
+
+    The methods calling a single API (e.g. public_timeline() and
+    show_status()) are defined by the table of haiker.endpoints.
+
+    stream_* methods poll a timeline and yield each new status once,
+    oldest first:
+
+    >>> for status in api.stream_keyword_timeline('BOT'):
+    ...     print(status.id)
+
+    A Haiker keeps its connections alive between calls.  Call close()
+    or use it as a context manager to release them:
+
+    >>> with haiker.Haiker(auth) as api:
+    ...     statuses = api.public_timeline()
+
+    A Haiker can be shared by threads.  Every request is built and
+    signed from a snapshot of its settings, and setting auth only
+    affects later requests.  Give it a session whose pool has
+    a connection for each thread:
+
+    >>> api = haiker.Haiker(auth, session=haiker.utils.make_session(
+    ...     pool_maxsize=32))
+    >>> with concurrent.futures.ThreadPoolExecutor(32) as executor:
+    ...     users = list(executor.map(api.show_user, url_names))
     """
+    _Handler = BaseAPIHandler
+
     @error.HaikerError.replace
     def __init__(self, auth=None, *,
                  user_agent=utils.user_agent(),
-                 root='http://h.hatena.ne.jp/api'):
+                 root='http://h.hatena.ne.jp/api',
+                 session=None, lazy=False, store=None, cache=None,
+                 disk_cache=None, rate_limiter=None, timeout=(10, 60),
+                 retry=None, circuit_breaker=None, single_flight=True,
+                 observers=(), tracer=None, decoder=None):
         """auth is used when calling API.  It is required to be
         None, a haiker.BasicAuth object or a haiker.OAuth object.
+
+        session is a requests.Session (e.g. from haiker.utils.make_session())
+        to share its connection pool with other Haiker or OAuth objects.
+
+        If lazy is true, returned objects convert each attribute
+        on its first access (see haiker.types.Parser).
+
+        store is a haiker.store.EntityStore to share User, Target and
+        Keyword objects across responses.
+
+        cache is a haiker.cache.ResponseCache to reuse the results of
+        GET APIs while they are fresh or not modified.  disk_cache is
+        a haiker.cache.DiskCache to keep the responses of show_status,
+        show_user, show_keyword and keyword_list across processes.
+
+        rate_limiter is a haiker.ratelimit.RateLimiter, which may be
+        shared by Haiker objects, to keep requests within a budget.
+
+        timeout is the (connect, read) timeout in seconds of each request
+        (None to wait forever).  retry is a haiker.retry.RetryPolicy to
+        retry failed requests with backoff, and circuit_breaker is
+        a haiker.retry.CircuitBreaker to fail fast while API is down.
+        Use haiker.retry.deadline() to limit the total time of calls.
+
+        If single_flight is true, concurrent calls of a GET API with
+        the same arguments and auth (e.g. from threads) share one
+        request.  Each caller gets a list of its own, of the same
+        Status (or other) objects.
+
+        observers are callables (e.g. a haiker.metrics.Aggregator) which
+        receive a haiker.metrics.CallRecord of each API call with its
+        status, sizes and the time spent on the network, decoding and
+        parsing.  tracer is a haiker.tracing.Tracer to trace the stages
+        of calls in nested spans.
+
+        decoder is a callable decoding the bytes of JSON responses
+        (see haiker.decoders), the fastest installed one if None.
         """
         super().__init__()
-        self._handler = BaseAPIHandler(auth, root, user_agent)
+        self._handler = self._Handler(auth, root, user_agent,
+                                      session=session, cache=cache,
+                                      disk_cache=disk_cache,
+                                      rate_limiter=rate_limiter,
+                                      timeout=timeout, retry=retry,
+                                      circuit_breaker=circuit_breaker,
+                                      single_flight=single_flight,
+                                      observers=observers, tracer=tracer,
+                                      decoder=decoder)
+        self._parser = types.Parser(lazy=lazy, store=store)
+
+    @error.HaikerError.replace
+    def close(self):
+        """Release the pooled connections."""
+        return self._handler.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @property
+    def session(self):
+        """requests.Session used for calling API"""
+        return self._handler.session
+
+    @property
+    def observers(self):
+        """List of the observers of API calls, which may be changed"""
+        return self._handler.observers
 
     @property
     @error.HaikerError.replace
@@ -89,217 +573,269 @@ class Haiker(object):
     def auth(self, value):
         self._handler.auth = value
 
-    # Timeline APIs
-    @error.HaikerError.replace
-    def public_timeline(self, *, body_formats=None, count=None, page=None,
-                        since=None):
-        """statuses/public_timeline"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/statuses/public_timeline.json'
-        res = self._handler.get(path, params)
-        return types.list_of(types.Status)(res)
-
-    @error.HaikerError.replace
-    def keyword_timeline(self, word, *, count=None, page=None, since=None,
-                         body_formats=None, sort=None):
-        """statuses/keyword_timeline"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/statuses/keyword_timeline.json'
-        res = self._handler.get(path, params)
-        return types.list_of(types.Status)(res)
-
-    @error.HaikerError.replace
-    def user_timeline(self, url_name=None, *, body_formats=None, count=None,
-                      page=None, since=None, media=None, sort=None):
-        """statuses/user_timeline"""
-        params = utils.removed_dict(locals(), {'self', 'url_name'})
-        if url_name is None:
-            path = '/statuses/user_timeline.json'
-        else:
-            path = '/statuses/user_timeline/{0}.json'.format(url_name)
-        res = self._handler.get(path, params)
-        return types.list_of(types.Status)(res)
+    def _timeline(self, path, params, incremental, as_frame):
+        if as_frame and incremental:
+            dicts = self._handler.iter_get(path, params)
+            return frame.StatusFrame.from_dicts(dicts)
+        if as_frame:
+            return self._handler.get(path, params,
+                                     convert=frame.StatusFrame.from_dicts)
+        if incremental:
+            return self._handler.iter_get(path, params,
+                                          convert=self._parser.status)
+        return self._handler.get(path, params, convert=self._parser.statuses)
+
+    # Bulk APIs
+    def _bulk(self, func, keys, max_workers):
+        """Call func for each unique key in a pool of max_workers threads
+        and return the results in the order of keys.  A HaikerError
+        raised for a key is returned in place of its result.
+        """
+        keys = list(keys)
+        unique = list(collections.OrderedDict.fromkeys(keys))
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers) as executor, \
+                tracing.start('haiker.bulk', self._handler.tracer,
+                              size=len(unique)):
+            # contexts are copied to carry haiker.retry.deadline() and
+            # the span
+            futures = [(key, executor.submit(contextvars.copy_context().run,
+                                             func, key))
+                       for key in unique]
+            for key, future in futures:
+                try:
+                    results[key] = future.result()
+                except error.HaikerError as e:
+                    results[key] = e
+        return [results[key] for key in keys]
 
     @error.HaikerError.replace
-    def friends_timeline(self, url_name=None, *, count=None, page=None,
-                         since=None, body_formats=None):
-        """statuses/friends_timeline"""
-        params = utils.removed_dict(locals(), {'self', 'url_name'})
-        if url_name is None:
-            path = '/statuses/friends_timeline.json'
-        else:
-            path = '/statuses/friends_timeline/{0}.json'.format(url_name)
-        res = self._handler.get(path, params)
-        return types.list_of(types.Status)(res)
+    def show_statuses(self, eids, *, body_formats=None, max_workers=8):
+        """statuses/show for each of eids
 
-    @error.HaikerError.replace
-    def album(self, *, body_formats=None, count=None, page=None,
-              since=None, sort=None, word=None):
-        """statuses/album"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/statuses/album.json'
-        res = self._handler.get(path, params)
-        return types.list_of(types.Status)(res)
-
-    # Entry and star APIs
-    @error.HaikerError.replace
-    def update_status(self, keyword, status, *, in_reply_to_status_id=None,
-                      source=None, files=None, body_formats=None):
-        """statuses/update"""
-        data = utils.removed_dict(locals(), {'self', 'files'})
-        if files is not None:
-            files = [('file', f) for f in files]
-        path = '/statuses/update.json'
-        res = self._handler.post(path, data=data, files=files)
-        return types.Status(res)
+        Return a list of Status objects, or HaikerError objects for
+        failed ones, in the order of eids.
+        """
+        func = functools.partial(self.show_status, body_formats=body_formats)
+        return self._bulk(func, eids, max_workers)
 
     @error.HaikerError.replace
-    def show_status(self, eid, *, body_formats=None):
-        """statuses/show"""
-        params = utils.removed_dict(locals(), {'self', 'eid'})
-        path = '/statuses/show/{0}.json'.format(eid)
-        res = self._handler.get(path, params)
-        return types.Status(res)
+    def show_users(self, url_names, *, max_workers=8):
+        """friendships/show for each of url_names
 
-    @error.HaikerError.replace
-    def delete_status(self, eid, author_url_name, *, body_formats=None):
-        """statuses/destroy"""
-        params = utils.removed_dict(locals(), {'self', 'eid'})
-        path = '/statuses/destroy/{0}.json'.format(eid)
-        res = self._handler.post(path, params)
-        return types.Status(res)
+        Return a list of User objects, or HaikerError objects for
+        failed ones, in the order of url_names.
+        """
+        return self._bulk(self.show_user, url_names, max_workers)
 
     @error.HaikerError.replace
-    def add_star(self, eid, *, body_formats=None):
-        """favorites/create"""
-        params = utils.removed_dict(locals(), {'self', 'eid'})
-        path = '/favorites/create/{0}.json'.format(eid)
-        res = self._handler.post(path, params)
-        return types.Status(res)
+    def show_keywords(self, words, *, without_related_keywords=None,
+                      max_workers=8):
+        """keywords/show for each of words
 
-    @error.HaikerError.replace
-    def remove_star(self, eid, *, body_formats=None):
-        """favorites/destroy"""
-        params = utils.removed_dict(locals(), {'self', 'eid'})
-        path = '/favorites/destroy/{0}.json'.format(eid)
-        res = self._handler.post(path, params)
-        return types.Status(res)
-
-    # User and keyword APIs
-    @error.HaikerError.replace
-    def show_user(self, url_name=None):
-        """friendships/show"""
-        if url_name is None:
-            path = '/friendships/show.json'
-        else:
-            path = '/friendships/show/{0}.json'.format(url_name)
-        res = self._handler.get(path)
-        return types.User(res)
+        Return a list of Keyword objects, or HaikerError objects for
+        failed ones, in the order of words.
+        """
+        func = functools.partial(
+            self.show_keyword,
+            without_related_keywords=without_related_keywords)
+        return self._bulk(func, words, max_workers)
+
+    # Paginating iterators
+    def _paginate(self, fetch, kwargs, limit, prefetch):
+        """Yield items of fetch(page=1, **kwargs), fetch(page=2, **kwargs),
+        ... until an empty or a short page, or until limit items.
+        The next page is fetched in a background thread while the items
+        of the current page are consumed if prefetch is true.
+        """
+        kwargs = dict(kwargs)
+        page = kwargs.pop('page', None) or 1
+        count = kwargs.get('count')
+        executor = None
+        if prefetch:
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        future = None
+        # the span is current only while fetching, not while the
+        # consumer runs
+        span = tracing.start('haiker.paginate', self._handler.tracer,
+                             limit=limit)
+        error = None
+        try:
+            n = 0
+            with span.activate():
+                items = fetch(page=page, **kwargs)
+            while items:
+                page += 1
+                if count is not None and len(items) < count:
+                    has_next = False
+                else:
+                    has_next = limit is None or n + len(items) < limit
+                if has_next and executor is not None:
+                    with span.activate():
+                        context = contextvars.copy_context()
+                    future = executor.submit(context.run, fetch, page=page,
+                                             **kwargs)
+                for item in items:
+                    if limit is not None and n >= limit:
+                        return
+                    n += 1
+                    yield item
+                if not has_next:
+                    return
+                if future is None:
+                    with span.activate():
+                        items = fetch(page=page, **kwargs)
+                else:
+                    items, future = future.result(), None
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if future is not None:
+                future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+            span.end(error)
 
     @error.HaikerError.replace
-    def show_keyword(self, word, *, without_related_keywords=None):
-        """keywords/show"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/keywords/show.json'
-        res = self._handler.get(path, params)
-        return types.Keyword(res)
+    def iter_public_timeline(self, *, body_formats=None, count=None,
+                             page=None, since=None, limit=None,
+                             prefetch=True):
+        """Iterate over statuses/public_timeline across pages.  Iteration
+        stops after limit items unless limit is None.
+        """
+        kwargs = utils.removed_dict(locals(), {'self', 'limit', 'prefetch'})
+        return self._paginate(self.public_timeline, kwargs, limit, prefetch)
 
     @error.HaikerError.replace
-    def hot_keywords(self, *, without_related_keywords=None):
-        """keywords/hot"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/keywords/hot.json'
-        res = self._handler.get(path, params)
-        return types.list_of(types.Keyword)(res)
+    def iter_keyword_timeline(self, word, *, count=None, page=None,
+                              since=None, body_formats=None, sort=None,
+                              limit=None, prefetch=True):
+        """Iterate over statuses/keyword_timeline across pages.  Iteration
+        stops after limit items unless limit is None.
+        """
+        kwargs = utils.removed_dict(locals(), {'self', 'limit', 'prefetch'})
+        return self._paginate(self.keyword_timeline, kwargs, limit, prefetch)
 
     @error.HaikerError.replace
-    def keyword_list(self, *, page=None, without_related_keywords=None,
-                     word=None):
-        """keywords/list"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/keywords/list.json'
-        res = self._handler.get(path, params)
-        return types.list_of(types.Keyword)(res)
+    def iter_user_timeline(self, url_name=None, *, body_formats=None,
+                           count=None, page=None, since=None, media=None,
+                           sort=None, limit=None, prefetch=True):
+        """Iterate over statuses/user_timeline across pages.  Iteration
+        stops after limit items unless limit is None.
+        """
+        kwargs = utils.removed_dict(locals(), {'self', 'limit', 'prefetch'})
+        return self._paginate(self.user_timeline, kwargs, limit, prefetch)
 
     @error.HaikerError.replace
-    def associate_keywords(self, word1, word2, *,
-                           without_related_keywords=None):
-        """keywords/relation/create"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/keywords/relation/create.json'
-        res = self._handler.post(path, params)
-        return types.Keyword(res)
+    def iter_friends_timeline(self, url_name=None, *, count=None, page=None,
+                              since=None, body_formats=None, limit=None,
+                              prefetch=True):
+        """Iterate over statuses/friends_timeline across pages.  Iteration
+        stops after limit items unless limit is None.
+        """
+        kwargs = utils.removed_dict(locals(), {'self', 'limit', 'prefetch'})
+        return self._paginate(self.friends_timeline, kwargs, limit, prefetch)
 
     @error.HaikerError.replace
-    def dissociate_keywords(self, word1, word2, *,
-                            without_related_keywords=None):
-        """keywords/relation/destroy"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/keywords/relation/destroy.json'
-        res = self._handler.post(path, params)
-        return types.Keyword(res)
-
-    # Favorite APIs
-    @error.HaikerError.replace
-    def friends(self, url_name=None, *, page=None):
-        """statuses/friends"""
-        params = utils.removed_dict(locals(), {'self', 'url_name'})
-        if url_name is None:
-            path = '/statuses/friends.json'
-        else:
-            path = '/statuses/friends/{0}.json'.format(url_name)
-        res = self._handler.get(path, params)
-        return types.list_of(types.User)
+    def iter_album(self, *, body_formats=None, count=None, page=None,
+                   since=None, sort=None, word=None, limit=None,
+                   prefetch=True):
+        """Iterate over statuses/album across pages.  Iteration
+        stops after limit items unless limit is None.
+        """
+        kwargs = utils.removed_dict(locals(), {'self', 'limit', 'prefetch'})
+        return self._paginate(self.album, kwargs, limit, prefetch)
 
     @error.HaikerError.replace
-    def followers(self, url_name=None, *, page=None):
-        """statuses/followers"""
-        params = utils.removed_dict(locals(), {'self', 'url_name'})
-        if url_name is None:
-            path = '/statuses/followers.json'
-        else:
-            path = '/statuses/followers/{0}.json'.format(url_name)
-        res = self._handler.get(path, params)
-        return types.list_of(types.User)
+    def iter_keyword_list(self, *, page=None, without_related_keywords=None,
+                          word=None, limit=None, prefetch=True):
+        """Iterate over keywords/list across pages.  Iteration
+        stops after limit items unless limit is None.
+        """
+        kwargs = utils.removed_dict(locals(), {'self', 'limit', 'prefetch'})
+        return self._paginate(self.keyword_list, kwargs, limit, prefetch)
+
+    # Polling streams
+    def _stream(self, fetch, kwargs, count, min_interval, max_interval,
+                max_pages):
+        """Poll fetch(**kwargs) forever and yield new statuses.
+        Each poll fetches up to max_pages pages while they are full of
+        unseen statuses, and the next poll goes on after min_interval
+        if they all are.
+        """
+        kwargs = dict(kwargs)
+        poll = _Poll(kwargs.pop('since'), count, min_interval, max_interval)
+        while True:
+            for page in range(poll.page, poll.page + max_pages):
+                statuses = fetch(**kwargs, **poll.params(page))
+                if not poll.feed(statuses):
+                    break
+            else:  # older unseen statuses may be on the next page
+                poll.resume(page + 1)
+                time.sleep(min_interval)
+                continue
+            yield from poll.finish()
+            time.sleep(poll.interval)
 
     @error.HaikerError.replace
-    def follow_user(self, url_name):
-        """friendships/create"""
-        path = '/friendships/create/{0}.json'.format(url_name)
-        res = self._handler.post(path)
-        return types.User(res)
+    def stream_public_timeline(self, *, body_formats=None, since=None,
+                               count=100, min_interval=5, max_interval=300,
+                               max_pages=10):
+        """Follow statuses/public_timeline and yield each status once,
+        oldest first, as it is posted.  Polling starts with the newest
+        page unless since is given, and its interval is adapted to
+        the post rate within [min_interval, max_interval] seconds.
+        """
+        kwargs = utils.removed_dict(locals(), {'self', 'count',
+                                               'min_interval', 'max_interval',
+                                               'max_pages'})
+        return self._stream(self.public_timeline, kwargs, count,
+                            min_interval, max_interval, max_pages)
 
     @error.HaikerError.replace
-    def unfollow_user(self, url_name):
-        """friendships/destroy"""
-        path = '/friendships/destroy/{0}.json'.format(url_name)
-        res = self._handler.post(path)
-        return types.User(res)
+    def stream_keyword_timeline(self, word, *, body_formats=None, since=None,
+                                count=100, min_interval=5, max_interval=300,
+                                max_pages=10):
+        """Follow statuses/keyword_timeline as stream_public_timeline()."""
+        kwargs = utils.removed_dict(locals(), {'self', 'count',
+                                               'min_interval', 'max_interval',
+                                               'max_pages'})
+        return self._stream(self.keyword_timeline, kwargs, count,
+                            min_interval, max_interval, max_pages)
 
     @error.HaikerError.replace
-    def favorite_keywords(self, url_name=None, *, page=None,
-                          without_related_keywords=None):
-        """statuses/keywords"""
-        params = utils.removed_dict(locals(), {'self', 'url_name'})
-        if url_name is None:
-            path = '/statuses/keywords.json'
-        else:
-            path = '/statuses/keywords/{0}.json'.format(url_name)
-        res = self._handler.get(path, params)
-        return types.list_of(types.Keyword)
+    def stream_user_timeline(self, url_name=None, *, body_formats=None,
+                             since=None, media=None, count=100,
+                             min_interval=5, max_interval=300, max_pages=10):
+        """Follow statuses/user_timeline as stream_public_timeline()."""
+        kwargs = utils.removed_dict(locals(), {'self', 'count',
+                                               'min_interval', 'max_interval',
+                                               'max_pages'})
+        return self._stream(self.user_timeline, kwargs, count,
+                            min_interval, max_interval, max_pages)
 
     @error.HaikerError.replace
-    def follow_keyword(self, word, *, without_related_keywords=None):
-        """keywords/create"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/keywords/create.json'
-        res = self._handler.post(path, params)
-        return types.Keyword(res)
+    def stream_friends_timeline(self, url_name=None, *, body_formats=None,
+                                since=None, count=100, min_interval=5,
+                                max_interval=300, max_pages=10):
+        """Follow statuses/friends_timeline as stream_public_timeline()."""
+        kwargs = utils.removed_dict(locals(), {'self', 'count',
+                                               'min_interval', 'max_interval',
+                                               'max_pages'})
+        return self._stream(self.friends_timeline, kwargs, count,
+                            min_interval, max_interval, max_pages)
 
     @error.HaikerError.replace
-    def unfollow_keyword(self, word, *, without_related_keywords=None):
-        """keywords/destroy"""
-        params = utils.removed_dict(locals(), {'self'})
-        path = '/keywords/destroy.json'
-        res = self._handler.post(path, params)
-        return types.Keyword(res)
+    def stream_album(self, *, body_formats=None, since=None, word=None,
+                     count=100, min_interval=5, max_interval=300,
+                     max_pages=10):
+        """Follow statuses/album as stream_public_timeline()."""
+        kwargs = utils.removed_dict(locals(), {'self', 'count',
+                                               'min_interval', 'max_interval',
+                                               'max_pages'})
+        return self._stream(self.album, kwargs, count,
+                            min_interval, max_interval, max_pages)
+
+
+endpoints.define(Haiker)
@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 
 import functools
+import threading
+from types import MappingProxyType
 import urllib.parse
 import requests
 import requests_oauthlib
-from . import error, utils
+from . import error, tracing, utils
 
 
 class BasicAuth(requests.auth.HTTPBasicAuth):
@@ -39,33 +41,59 @@ class OAuth(object):
     >>> auth.verify(verifier)
     ('MyAccessToken', 'MyAccessTokenSecret')
     >>> api = haiker.Haiker(auth)
+
+    Example 3 (sharing a connection pool):
+
+    >>> session = haiker.utils.make_session(pool_maxsize=32)
+    >>> auth = haiker.OAuth('MyConsumerKey', 'MyConsumerSecret',
+    ...                     session=session)
+    >>> api = haiker.Haiker(auth, session=session)
+
+    An OAuth object may sign requests in many threads at once.  Each
+    request is signed with a snapshot of the keys, which initiate()
+    and verify() replace atomically.
     """
     _OAuthHandler = requests_oauthlib.OAuth1
 
     @error.HaikerError.replace
     def __init__(self, consumer_key, consumer_secret=None,
                  oauth_token=None, oauth_token_secret=None, *,
-                 user_agent=utils.user_agent()):
+                 user_agent=utils.user_agent(), session=None):
+        """session is a requests.Session used to fetch tokens.
+        A one-shot connection is made for each fetch if it is None.
+        """
         super().__init__()
-        self._keys = {
-            'client_key': consumer_key,
-            'client_secret': consumer_secret,
-            'resource_owner_key': oauth_token,
-            'resource_owner_secret': oauth_token_secret,
-        }
         self.user_agent = user_agent
-        self._auth = self._make_auth(**self._keys)
+        self.session = session
+        self._lock = threading.Lock()
+        self._state = ({}, None)  # (keys, signer)
+        self._set_keys(client_key=consumer_key,
+                       client_secret=consumer_secret,
+                       resource_owner_key=oauth_token,
+                       resource_owner_secret=oauth_token_secret)
 
     @functools.wraps(_OAuthHandler.__call__)
     def __call__(self, *args, **kwargs):
-        return self._auth.__call__(*args, **kwargs)
+        auth = self._state[1]  # never changes while signing
+        with tracing.start('haiker.sign'):
+            return auth.__call__(*args, **kwargs)
+
+    @property
+    def _keys(self):
+        return self._state[0]
+
+    def _set_keys(self, **kwargs):
+        """Replace the keys and the signer with new immutable ones."""
+        with self._lock:
+            keys = dict(self._state[0], **kwargs)
+            self._state = (MappingProxyType(keys),
+                           self._make_auth(**keys))
 
     @error.HaikerError.replace
     def initiate(self, scope, callback_url='oob', *,
                  url='https://www.hatena.com/oauth/initiate'):
         """Fetch a request token pair."""
-        self._keys['resource_owner_key'] = None
-        self._keys['resource_owner_secret'] = None
+        self._set_keys(resource_owner_key=None, resource_owner_secret=None)
         auth = self._make_auth(callback_uri=callback_url, **self._keys)
         return self._receive_token(url, auth, data={'scope': scope})
 
@@ -96,13 +124,21 @@ class OAuth(object):
 
     def _receive_token(self, url, auth, data=None):
         headers = {'User-Agent': self.user_agent}
-        res = requests.post(url, auth=auth, headers=headers,
-                            data=utils.build_params(data))
+        post = requests.post if self.session is None else self.session.post
+        res = post(url, auth=auth, headers=headers,
+                   data=utils.build_params(data))
         res.raise_for_status()
         d = urllib.parse.parse_qs(res.text)
         token = d['oauth_token'][0]
         token_secret = d['oauth_token_secret'][0]
-        self._keys['resource_owner_key'] = token
-        self._keys['resource_owner_secret'] = token_secret
-        self._auth = self._make_auth(**self._keys)
+        self._set_keys(resource_owner_key=token,
+                       resource_owner_secret=token_secret)
         return token, token_secret
+
+
+def identity(auth):
+    """Return a hashable identity of whom auth signs requests as."""
+    if isinstance(auth, OAuth):
+        keys = auth._keys
+        return keys['client_key'], keys['resource_owner_key']
+    return id(auth)
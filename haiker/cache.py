@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+
+import collections
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+from . import utils
+
+
+Entry = collections.namedtuple('Entry',
+                               'etag last_modified value expires')
+
+
+def _ttl_for(path, ttls, default):
+    prefixes = [p for p in ttls if path.startswith(p)]
+    if not prefixes:
+        return default
+    return ttls[max(prefixes, key=len)]
+
+
+class ResponseCache(object):
+    """In-memory LRU cache of parsed GET responses
+
+    Responses are stored with their validators (ETag and Last-Modified)
+    and keyed by path, encoded params, converter and the identity of
+    the auth (see haiker.auth.identity()).  An entry younger
+    than its TTL is returned without a request; an older one is
+    revalidated with If-None-Match/If-Modified-Since and returned again
+    on 304 Not Modified.
+
+    ttls maps path prefixes to TTLs in seconds; the longest matching
+    prefix wins and ttl is used for the other paths.
+
+    Cached objects are shared by the callers, so they should not
+    be modified.
+
+    Example:
+
+    >>> cache = haiker.cache.ResponseCache(
+    ...     ttls={'/keywords/hot.json': 60, '/friendships/show': 300})
+    >>> api = haiker.Haiker(cache=cache)
+    """
+    def __init__(self, maxsize=256, *, ttl=0, ttls=None):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key(path, params=None, convert=None, identity=None):
+        params = utils.build_params(params)
+        return (path, None if params is None else tuple(params), convert,
+                identity)
+
+    def ttl_for(self, path):
+        """Return the TTL in seconds for path."""
+        return _ttl_for(path, self.ttls, self.ttl)
+
+    def lookup(self, key):
+        """Return the Entry of key or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    @staticmethod
+    def is_fresh(entry):
+        return time.monotonic() < entry.expires
+
+    @staticmethod
+    def validators(entry):
+        """Return the conditional request headers for entry."""
+        headers = {}
+        if entry is not None and entry.etag is not None:
+            headers['If-None-Match'] = entry.etag
+        if entry is not None and entry.last_modified is not None:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, key, etag, last_modified, value):
+        """Store value unless it can be neither reused nor revalidated,
+        and return value.
+        """
+        ttl = self.ttl_for(key[0])
+        if ttl <= 0 and etag is None and last_modified is None:
+            return value
+        self._put(key, Entry(etag, last_modified, value,
+                             time.monotonic() + ttl))
+        return value
+
+    def refresh(self, key, entry):
+        """Restart the TTL of entry after 304 Not Modified and
+        return its value.
+        """
+        expires = time.monotonic() + self.ttl_for(key[0])
+        self._put(key, entry._replace(expires=expires))
+        return entry.value
+
+    def _put(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskCache(object):
+    """Persistent cache of raw GET responses in an SQLite database
+
+    Payloads are stored zlib-compressed and keyed by path and encoded
+    params.  Entries expire after their TTL (ttls maps path prefixes to
+    TTLs in seconds as in ResponseCache), and the least recently used
+    ones are evicted when the payloads exceed max_bytes in total.
+    The database may be shared by threads and processes.
+
+    Haiker uses it for the idempotent APIs show_status, show_user,
+    show_keyword and keyword_list.
+
+    Example:
+
+    >>> cache = haiker.cache.DiskCache('/var/cache/haiker.sqlite3',
+    ...                                ttls={'/statuses/show': 86400})
+    >>> api = haiker.Haiker(disk_cache=cache)
+    """
+    def __init__(self, filename, *, max_bytes=64 * 1024 * 1024, ttl=3600,
+                 ttls=None, level=6):
+        super().__init__()
+        self.filename = os.fspath(filename)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.ttls = dict(ttls or {})
+        self.level = level
+        self._local = threading.local()
+        with self._connect() as db:
+            db.execute('BEGIN IMMEDIATE')
+            db.execute('CREATE TABLE IF NOT EXISTS responses ('
+                       'key TEXT PRIMARY KEY, payload BLOB NOT NULL, '
+                       'size INTEGER NOT NULL, expires REAL NOT NULL, '
+                       'accessed REAL NOT NULL)')
+            db.execute('CREATE INDEX IF NOT EXISTS responses_accessed '
+                       'ON responses (accessed)')
+            db.execute('CREATE INDEX IF NOT EXISTS responses_expires '
+                       'ON responses (expires)')
+            # the total size of the payloads, kept by the triggers
+            db.execute('CREATE TABLE IF NOT EXISTS total ('
+                       'size INTEGER NOT NULL)')
+            db.execute('INSERT INTO total (size) '
+                       'SELECT COALESCE(SUM(size), 0) FROM responses '
+                       'WHERE NOT EXISTS (SELECT * FROM total)')
+            db.execute('CREATE TRIGGER IF NOT EXISTS responses_insert '
+                       'AFTER INSERT ON responses BEGIN '
+                       'UPDATE total SET size = size + new.size; END')
+            db.execute('CREATE TRIGGER IF NOT EXISTS responses_delete '
+                       'AFTER DELETE ON responses BEGIN '
+                       'UPDATE total SET size = size - old.size; END')
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.filename, timeout=30)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            # fires the delete trigger on INSERT OR REPLACE
+            db.execute('PRAGMA recursive_triggers=ON')
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def key(path, params=None):
+        params = utils.build_params(params)
+        if not params:
+            return path
+        return path + '?' + urllib.parse.urlencode(params)
+
+    def get(self, key):
+        """Return the payload of key or None if missing or expired."""
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute('SELECT payload, expires FROM responses '
+                             'WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                return None
+            db.execute('UPDATE responses SET accessed = ? WHERE key = ?',
+                       (now, key))
+        return zlib.decompress(row[0])
+
+    def put(self, key, payload):
+        """Store payload (bytes) and evict old entries if needed."""
+        ttl = _ttl_for(key.partition('?')[0], self.ttls, self.ttl)
+        if ttl <= 0:
+            return
+        compressed = zlib.compress(payload, self.level)
+        now = time.time()
+        with self._connect() as db:
+            db.execute('INSERT OR REPLACE INTO responses '
+                       '(key, payload, size, expires, accessed) '
+                       'VALUES (?, ?, ?, ?, ?)',
+                       (key, compressed, len(compressed), now + ttl, now))
+            self._evict(db, now)
+
+    def _evict(self, db, now):
+        db.execute('DELETE FROM responses WHERE expires <= ?', (now,))
+        total, = db.execute('SELECT size FROM total').fetchone()
+        if total <= self.max_bytes:
+            return
+        rows = db.execute('SELECT key, size FROM responses '
+                          'ORDER BY accessed')
+        victims = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        db.executemany('DELETE FROM responses WHERE key = ?', victims)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._connect() as db:
+            db.execute('DELETE FROM responses')
+
+    def close(self):
+        """Close the connection of the calling thread."""
+        db = getattr(self._local, 'db', None)
+        if db is not None:
+            db.close()
+            self._local.db = None
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+"""Compact versioned binary form of Status, User, Keyword and Target
+
+dumps() encodes an object of haiker.types, a list of them or None,
+and loads() restores equivalent objects without parsing or validating
+their fields again.  Repeated strings and objects (e.g. a User shared
+through haiker.store.EntityStore) are written once and referred to
+afterwards, and shared objects are shared again after loading.
+
+Example:
+
+>>> data = haiker.codec.dumps(api.keyword_timeline('BOT', count=200))
+>>> statuses = haiker.codec.loads(data)
+
+Format (version 1): b'HKR' and a version byte followed by one value.
+A value is a tag byte followed by:
+
+    NONE, TRUE, FALSE   nothing
+    INT                 zigzag varint
+    STR                 varint length and UTF-8 bytes (remembered)
+    STR_REF             varint index of a remembered string
+    DATETIME            zigzag varint POSIX seconds, varint microseconds
+                        and zigzag varint UTC offset in seconds
+    LIST                varint length and the values
+    STATUS, USER,       the values of the fields in the order of
+    KEYWORD, TARGET     FIELDS[tag] (the object is remembered)
+    OBJ_REF             varint index of a remembered object
+"""
+
+import datetime
+from . import types
+
+
+MAGIC = b'HKR'
+VERSION = 1
+
+NONE, TRUE, FALSE, INT, STR, STR_REF, DATETIME, LIST = range(8)
+STATUS, USER, KEYWORD, TARGET, OBJ_REF = range(16, 21)
+
+# fields of each type in version 1; new fields may only be appended
+# in a new version
+FIELDS = {
+    STATUS: ('link', 'created_at', 'favorited', 'haiku_text', 'html',
+             'html_touch', 'html_mobile', 'id', 'in_reply_to_status_id',
+             'in_reply_to_user_id', 'keyword', 'replies', 'source', 'target',
+             'text', 'user'),
+    USER: ('followers_count', 'name', 'id', 'profile_image_url',
+           'screen_name', 'url'),
+    KEYWORD: ('entry_count', 'followers_count', 'link', 'related_keywords',
+              'title', 'word', 'url_name'),
+    TARGET: ('title', 'word', 'url_name'),
+}
+CLASSES = {
+    STATUS: types.Status,
+    USER: types.User,
+    KEYWORD: types.Keyword,
+    TARGET: types.Target,
+}
+_TAGS = {cls: tag for tag, cls in CLASSES.items()}
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+_ONE_SECOND = datetime.timedelta(seconds=1)
+
+
+def _varint(n, out):
+    while n >= 0x80:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def _zigzag(n):
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+class _Encoder(object):
+    def __init__(self):
+        super().__init__()
+        self.out = bytearray(MAGIC)
+        self.out.append(VERSION)
+        self._strings = {}
+        self._objects = {}
+        self._keep = []  # keeps ids of the remembered objects unique
+
+    def value(self, x):
+        out = self.out
+        if x is None:
+            out.append(NONE)
+        elif x is True:
+            out.append(TRUE)
+        elif x is False:
+            out.append(FALSE)
+        elif isinstance(x, str):
+            index = self._strings.get(x)
+            if index is None:
+                self._strings[x] = len(self._strings)
+                data = x.encode('utf-8')
+                out.append(STR)
+                _varint(len(data), out)
+                out += data
+            else:
+                out.append(STR_REF)
+                _varint(index, out)
+        elif isinstance(x, int):
+            out.append(INT)
+            _varint(_zigzag(x), out)
+        elif isinstance(x, list):
+            out.append(LIST)
+            _varint(len(x), out)
+            for v in x:
+                self.value(v)
+        elif isinstance(x, datetime.datetime):
+            self.datetime(x)
+        else:
+            self.object(x)
+
+    def datetime(self, x):
+        offset = x.utcoffset()
+        if offset is None:
+            raise ValueError('naive datetime: {0!r}'.format(x))
+        seconds, rest = divmod(x - _EPOCH, _ONE_SECOND)
+        self.out.append(DATETIME)
+        _varint(_zigzag(seconds), self.out)
+        _varint(rest.microseconds, self.out)
+        _varint(_zigzag(int(offset.total_seconds())), self.out)
+
+    def object(self, x):
+        tag = _TAGS.get(x.__class__)
+        if tag is None:
+            raise TypeError('{0!r} is an unsupported type'.format(type(x)))
+        index = self._objects.get(id(x))
+        if index is not None:
+            self.out.append(OBJ_REF)
+            _varint(index, self.out)
+            return
+        self._objects[id(x)] = len(self._objects)
+        self._keep.append(x)
+        self.out.append(tag)
+        for name in FIELDS[tag]:
+            self.value(getattr(x, name))
+
+
+class _Decoder(object):
+    def __init__(self, data):
+        super().__init__()
+        self.data = data
+        self.pos = 0
+        self._strings = []
+        self._objects = []
+        self._timezones = {0: datetime.timezone.utc}
+
+    def varint(self):
+        data, pos = self.data, self.pos
+        b = data[pos]
+        pos += 1
+        n = b & 0x7f
+        shift = 7
+        while b & 0x80:
+            b = data[pos]
+            pos += 1
+            n |= (b & 0x7f) << shift
+            shift += 7
+        self.pos = pos
+        return n
+
+    def zigzag(self):
+        n = self.varint()
+        return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+    def value(self):
+        data, pos = self.data, self.pos
+        tag = data[pos]
+        # fast paths for the most frequent values in statuses
+        if tag == STR_REF and data[pos + 1] < 0x80:
+            self.pos = pos + 2
+            return self._strings[data[pos + 1]]
+        self.pos = pos + 1
+        if tag == NONE:
+            return None
+        if tag == STR:
+            n = self.varint()
+            x = self.data[self.pos:self.pos + n].decode('utf-8')
+            self.pos += n
+            self._strings.append(x)
+            return x
+        if tag == STR_REF:
+            return self._strings[self.varint()]
+        if tag == INT:
+            return self.zigzag()
+        if tag == DATETIME:
+            return self.datetime()
+        if tag == LIST:
+            return [self.value() for _ in range(self.varint())]
+        if tag == OBJ_REF:
+            return self._objects[self.varint()]
+        if tag in CLASSES:
+            return self.object(tag)
+        if tag == TRUE:
+            return True
+        if tag == FALSE:
+            return False
+        raise ValueError('unknown tag {0} at {1}'.format(tag, self.pos - 1))
+
+    def datetime(self):
+        seconds = self.zigzag()
+        microseconds = self.varint()
+        offset = self.zigzag()
+        tz = self._timezones.get(offset)
+        if tz is None:
+            tz = datetime.timezone(datetime.timedelta(seconds=offset))
+            self._timezones[offset] = tz
+        x = datetime.datetime.fromtimestamp(seconds, tz)
+        return x.replace(microsecond=microseconds) if microseconds else x
+
+    def object(self, tag):
+        cls = CLASSES[tag]
+        obj = cls.__new__(cls)  # fields are set without conversion
+        self._objects.append(obj)
+        data, strings = self.data, self._strings
+        pos = self.pos
+        for name in FIELDS[tag]:
+            tag = data[pos]
+            if tag == STR_REF and data[pos + 1] < 0x80:  # inlined value()
+                value = strings[data[pos + 1]]
+                pos += 2
+            elif tag == NONE:
+                value = None
+                pos += 1
+            else:
+                self.pos = pos
+                value = self.value()
+                pos = self.pos
+            setattr(obj, name, value)
+        self.pos = pos
+        return obj
+
+
+def dumps(obj):
+    """Return the bytes of obj (an object of haiker.types, a list of
+    them or None).
+    """
+    encoder = _Encoder()
+    encoder.value(obj)
+    return bytes(encoder.out)
+
+
+def loads(data):
+    """Return the object encoded in data by dumps().  Raise ValueError
+    if data is not in a supported version or is broken.
+    """
+    data = bytes(data)
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError('not encoded by haiker.codec')
+    version = data[len(MAGIC)] if len(data) > len(MAGIC) else None
+    if version != VERSION:
+        raise ValueError('unsupported version: {0!r}'.format(version))
+    decoder = _Decoder(data)
+    decoder.pos = len(MAGIC) + 1
+    try:
+        obj = decoder.value()
+    except IndexError:
+        raise ValueError('truncated data') from None
+    if decoder.pos != len(data):
+        raise ValueError('extra data at {0}'.format(decoder.pos))
+    return obj
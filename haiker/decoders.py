@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""Decoders of JSON response bodies
+
+A decoder is a callable which takes a response body (bytes in UTF-8)
+and returns the decoded JSON, raising ValueError if it is invalid.
+Handlers use the decoder given to haiker.Haiker(decoder=...), or else
+default(): orjson if it is installed, otherwise the json module.
+
+>>> api = haiker.Haiker(decoder=haiker.decoders.get('json'))
+
+orjson decodes straight from the bytes, several times faster than the
+json module.  It rejects NaN and Infinity and integers beyond 64 bits,
+none of which the API returns.
+
+The responses of timeline APIs called with incremental=True are always
+parsed by haiker.utils.iter_json_array() as they are received.
+"""
+
+import collections
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def stdlib(payload):
+    """Decode payload with the json module."""
+    return json.loads(payload)
+
+
+# name: decoder, the fastest first
+DECODERS = collections.OrderedDict()
+if orjson is not None:
+    DECODERS['orjson'] = orjson.loads
+DECODERS['json'] = stdlib
+
+
+def default():
+    """Return the fastest installed decoder."""
+    return next(iter(DECODERS.values()))
+
+
+def get(name):
+    """Return the decoder of name ('orjson' or 'json'), or default()
+    for 'auto'.  Raise ValueError if it is not installed.
+    """
+    if name == 'auto':
+        return default()
+    try:
+        return DECODERS[name]
+    except KeyError:
+        raise ValueError('unavailable decoder: {0!r}'.format(name)) from None
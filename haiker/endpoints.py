@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+"""Declarative table of the Hatena Haiku API endpoints
+
+Each Endpoint of ENDPOINTS becomes a method of haiker.Haiker (and so of
+haiker.aio.AsyncHaiker) by define().  The method is generated once with
+the exact signature, its path templates are formatted ahead of time and
+its params are collected into a dict literal, so that a call does no
+more work than a hand-written method.
+
+Fields of Endpoint:
+
+    name        the method name
+    method      'GET' or 'POST'
+    path        the path, where {arg} is replaced with the argument arg
+                and [/{arg}] is omitted if arg is None
+    args        the positional arguments; those which are not in path
+                are sent as params
+    options     the keyword-only arguments sent as params (default None)
+    convert     the name of a haiker.types.Parser method, or 'timeline'
+                for the timeline APIs (see Haiker._timeline)
+    form        if true, the params are sent as the form data and
+                the files option as the files to upload
+    persistent  if true, the response may be kept by the disk cache
+                when every path segment is given
+"""
+
+import collections
+import functools
+import re
+from . import error
+
+
+Endpoint = collections.namedtuple(
+    'Endpoint', ['name', 'method', 'path', 'args', 'options', 'convert',
+                 'form', 'persistent'])
+Endpoint.__new__.__defaults__ = (False, False)
+
+ENDPOINTS = [
+    # Timeline APIs
+    Endpoint('public_timeline', 'GET', '/statuses/public_timeline.json',
+             (), ('body_formats', 'count', 'page', 'since'), 'timeline'),
+    Endpoint('keyword_timeline', 'GET', '/statuses/keyword_timeline.json',
+             ('word',), ('count', 'page', 'since', 'body_formats', 'sort'),
+             'timeline'),
+    Endpoint('user_timeline', 'GET',
+             '/statuses/user_timeline[/{url_name}].json', ('url_name',),
+             ('body_formats', 'count', 'page', 'since', 'media', 'sort'),
+             'timeline'),
+    Endpoint('friends_timeline', 'GET',
+             '/statuses/friends_timeline[/{url_name}].json', ('url_name',),
+             ('count', 'page', 'since', 'body_formats'), 'timeline'),
+    Endpoint('album', 'GET', '/statuses/album.json', (),
+             ('body_formats', 'count', 'page', 'since', 'sort', 'word'),
+             'timeline'),
+    # Entry and star APIs
+    Endpoint('update_status', 'POST', '/statuses/update.json',
+             ('keyword', 'status'),
+             ('in_reply_to_status_id', 'source', 'files', 'body_formats'),
+             'status', form=True),
+    Endpoint('show_status', 'GET', '/statuses/show/{eid}.json', ('eid',),
+             ('body_formats',), 'status', persistent=True),
+    Endpoint('delete_status', 'POST', '/statuses/destroy/{eid}.json',
+             ('eid', 'author_url_name'), ('body_formats',), 'status'),
+    Endpoint('add_star', 'POST', '/favorites/create/{eid}.json', ('eid',),
+             ('body_formats',), 'status'),
+    Endpoint('remove_star', 'POST', '/favorites/destroy/{eid}.json',
+             ('eid',), ('body_formats',), 'status'),
+    # User and keyword APIs
+    Endpoint('show_user', 'GET', '/friendships/show[/{url_name}].json',
+             ('url_name',), (), 'user', persistent=True),
+    Endpoint('show_keyword', 'GET', '/keywords/show.json', ('word',),
+             ('without_related_keywords',), 'keyword', persistent=True),
+    Endpoint('hot_keywords', 'GET', '/keywords/hot.json', (),
+             ('without_related_keywords',), 'keywords'),
+    Endpoint('keyword_list', 'GET', '/keywords/list.json', (),
+             ('page', 'without_related_keywords', 'word'), 'keywords',
+             persistent=True),
+    Endpoint('associate_keywords', 'POST', '/keywords/relation/create.json',
+             ('word1', 'word2'), ('without_related_keywords',), 'keyword'),
+    Endpoint('dissociate_keywords', 'POST',
+             '/keywords/relation/destroy.json', ('word1', 'word2'),
+             ('without_related_keywords',), 'keyword'),
+    # Favorite APIs
+    Endpoint('friends', 'GET', '/statuses/friends[/{url_name}].json',
+             ('url_name',), ('page',), 'users'),
+    Endpoint('followers', 'GET', '/statuses/followers[/{url_name}].json',
+             ('url_name',), ('page',), 'users'),
+    Endpoint('follow_user', 'POST', '/friendships/create/{url_name}.json',
+             ('url_name',), (), 'user'),
+    Endpoint('unfollow_user', 'POST', '/friendships/destroy/{url_name}.json',
+             ('url_name',), (), 'user'),
+    Endpoint('favorite_keywords', 'GET',
+             '/statuses/keywords[/{url_name}].json', ('url_name',),
+             ('page', 'without_related_keywords'), 'keywords'),
+    Endpoint('follow_keyword', 'POST', '/keywords/create.json', ('word',),
+             ('without_related_keywords',), 'keyword'),
+    Endpoint('unfollow_keyword', 'POST', '/keywords/destroy.json',
+             ('word',), ('without_related_keywords',), 'keyword'),
+]
+
+_SEGMENT = re.compile('[a-zA-Z0-9._\\-]+\\Z')
+_OPTIONAL = re.compile('\\[/\\{(\\w+)\\}\\]')
+_REQUIRED = re.compile('\\{(\\w+)\\}')
+_SEGMENTS = re.compile('\\[?/\\{\\w+\\}\\]?')
+
+
+def segment(value):
+    """Return value as a path segment.  Raise ValueError unless it
+    consists of alphanumerics, '.', '_' and '-' only.
+    """
+    s = str(value)
+    if _SEGMENT.match(s) is None or '..' in s:
+        raise ValueError('invalid path segment: {0!r}'.format(value))
+    return s
+
+
+def _template(path):
+    """Return the format string of path and the names in it."""
+    names = _REQUIRED.findall(path)
+    template = path.replace('{', '{{').replace('}', '}}')
+    for i, name in enumerate(names):
+        template = template.replace('{{' + name + '}}', '{' + str(i) + '}')
+    return template, names
+
+
+def _source(e):
+    """Return the source code of the method of e."""
+    optional = _OPTIONAL.findall(e.path)
+    in_path = set(_REQUIRED.findall(e.path))
+    args = ['self'] + ['{0}=None'.format(a) if a in optional else a
+                       for a in e.args]
+    options = ['{0}=None'.format(o) for o in e.options]
+    if e.convert == 'timeline':
+        options += ['incremental=False', 'frame=False']
+    if options:
+        args += ['*'] + options
+    sent = [a for a in e.args if a not in in_path]
+    sent += [o for o in e.options if not (e.form and o == 'files')]
+    lines = ['def {0}({1}):'.format(e.name, ', '.join(args))]
+    if sent:
+        lines.append('    params = {' + ', '.join(
+            '{0!r}: {0}'.format(name) for name in sent) + '}')
+    if e.form:
+        lines += ['    if files is not None:',
+                  "        files = [('file', f) for f in files]"]
+    full, names = _template(_OPTIONAL.sub('/{\\1}', e.path))
+    path = '{0!r}.format({1})'.format(
+        full, ', '.join('_segment({0})'.format(n) for n in names))
+    if not names:
+        path = repr(full)
+    persistent = repr(True) if e.persistent else None
+    if optional:
+        lines += ['    if {0} is None:'.format(optional[0]),
+                  '        path = {0!r}'.format(_OPTIONAL.sub('', e.path)),
+                  '    else:',
+                  '        path = {0}'.format(path)]
+        if e.persistent:
+            persistent = '{0} is not None'.format(optional[0])
+    else:
+        lines.append('    path = {0}'.format(path))
+    if e.convert == 'timeline':
+        lines.append('    return self._timeline(path, params, incremental, '
+                     'frame)')
+        return '\n'.join(lines) + '\n'
+    call = ['path']
+    if e.form:
+        call += ['data=params', 'files=files']
+    elif sent:
+        call.append('params')
+    call.append('convert=self._parser.{0}'.format(e.convert))
+    if persistent is not None:
+        call.append('persistent={0}'.format(persistent))
+    lines.append('    return self._handler.{0}({1})'.format(
+        e.method.lower(), ', '.join(call)))
+    return '\n'.join(lines) + '\n'
+
+
+def _method(e, cls):
+    namespace = {'_segment': segment}
+    exec(_source(e), namespace)
+    func = namespace[e.name]
+    func.__module__ = cls.__module__
+    func.__qualname__ = '{0}.{1}'.format(cls.__qualname__, e.name)
+    func.__doc__ = _SEGMENTS.sub('', e.path)[1:-len('.json')]
+    return error.HaikerError.replace(func)
+
+
+def _pattern(e):
+    """Return the regular expression of the paths of e, which captures
+    the arguments in them by name.
+    """
+    parts = re.split('(\\[/\\{\\w+\\}\\]|\\{\\w+\\})', e.path)
+    pattern = ''
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            pattern += re.escape(part)
+        elif part.startswith('['):
+            pattern += '(?:/(?P<{0}>[^/]+))?'.format(part[3:-2])
+        else:
+            pattern += '(?P<{0}>[^/]+)'.format(part[1:-1])
+    return pattern + '\\Z'
+
+
+_PATTERNS = [(re.compile(_pattern(e)), e) for e in ENDPOINTS]
+
+
+@functools.lru_cache(maxsize=1024)
+def find(path):
+    """Return the Endpoint whose path matches path, or None."""
+    for pattern, e in _PATTERNS:
+        if pattern.match(path) is not None:
+            return e
+    return None
+
+
+def match(path):
+    """Return the Endpoint whose path matches path and a dict of the
+    arguments in path (None for an omitted one), or (None, None).
+    """
+    for pattern, e in _PATTERNS:
+        m = pattern.match(path)
+        if m is not None:
+            return e, m.groupdict()
+    return None, None
+
+
+def define(cls):
+    """Add the methods of ENDPOINTS to cls and return it."""
+    for e in ENDPOINTS:
+        setattr(cls, e.name, _method(e, cls))
+    return cls
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import functools
+import inspect
 
 
 class HaikerError(Exception):
@@ -21,13 +22,50 @@ class HaikerError(Exception):
     def replace(cls, func):
         """Return a function which has the same behavior as func but
         raises this exception instead of raising other exception.
+        An awaitable or a generator returned by func is wrapped likewise
+        so that the exception is replaced when it is awaited or iterated.
         """
         @functools.wraps(func)
         def call(*args, **kwargs):
             try:
-                return func(*args, **kwargs)
+                retval = func(*args, **kwargs)
             except cls:
                 raise
             except Exception as e:
                 raise cls(e) from e
+            if inspect.isawaitable(retval):
+                return cls._replace_awaitable(retval)
+            if inspect.isgenerator(retval):
+                return cls._replace_generator(retval)
+            if inspect.isasyncgen(retval):
+                return cls._replace_async_generator(retval)
+            return retval
         return call
+
+    @classmethod
+    async def _replace_awaitable(cls, awaitable):
+        try:
+            return await awaitable
+        except cls:
+            raise
+        except Exception as e:
+            raise cls(e) from e
+
+    @classmethod
+    def _replace_generator(cls, generator):
+        try:
+            return (yield from generator)
+        except cls:
+            raise
+        except Exception as e:
+            raise cls(e) from e
+
+    @classmethod
+    async def _replace_async_generator(cls, generator):
+        try:
+            async for item in generator:
+                yield item
+        except cls:
+            raise
+        except Exception as e:
+            raise cls(e) from e
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""Resumable export of whole timelines to gzipped JSON Lines
+
+Example:
+
+>>> api = haiker.Haiker(rate_limiter=haiker.ratelimit.RateLimiter(
+...     read=haiker.ratelimit.TokenBucket(2)))
+>>> haiker.export.export(api, 'keyword', 'BOT', 'BOT.jsonl.gz')
+12345
+
+or from the command line:
+
+    python3 -m haiker export keyword BOT -o BOT.jsonl.gz --rate 2
+"""
+
+import collections
+import concurrent.futures
+import contextvars
+import gzip
+import json
+import os
+from . import error, utils
+
+
+# kind: the Haiker method of the timeline
+_TIMELINES = {
+    'user': 'user_timeline',
+    'keyword': 'keyword_timeline',
+    'friends': 'friends_timeline',
+}
+
+KINDS = sorted(_TIMELINES)
+
+
+def _timeline(api, kind):
+    if kind not in _TIMELINES:
+        raise ValueError('unknown timeline: {0!r}'.format(kind))
+    return getattr(api, _TIMELINES[kind])
+
+
+def _load_checkpoint(filename, job):
+    """Return the saved state of job or None."""
+    try:
+        with open(filename, encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    if state.get('job') != job:
+        raise ValueError('{0} is a checkpoint of another export'.format(
+            filename))
+    return state
+
+
+def _save_checkpoint(filename, state):
+    temp = filename + '.tmp'
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, filename)  # atomically
+
+
+@error.HaikerError.replace
+def export(api, kind, name, filename, *, count=200, since=None,
+           body_formats=None, workers=4, checkpoint_every=10,
+           progress=None):
+    """Write all statuses of a timeline (kind is 'user', 'keyword' or
+    'friends', and name is a user name or a keyword) to filename as
+    gzipped JSON Lines of Status.to_dict(), newest first, and return
+    the number of them.
+
+    Up to workers pages are fetched concurrently by api, whose
+    rate_limiter keeps them within a budget, and written in order as
+    soon as they arrive.  The state is saved to filename + '.checkpoint'
+    every checkpoint_every pages, and a call with the same arguments
+    resumes from there after a crash.  The checkpoint is removed on
+    completion.
+
+    progress is called with the page number and the number of written
+    statuses after each page unless it is None.
+    """
+    timeline = _timeline(api, kind)
+    params = utils.build_params({'since': since,
+                                 'body_formats': body_formats})
+    checkpoint = filename + '.checkpoint'
+    job = {'kind': kind, 'name': name, 'count': count,
+           'params': [[key, value.decode('utf-8')] for key, value in params]}
+    state = _load_checkpoint(checkpoint, job)
+    if state is None:
+        state = {'job': job, 'page': 1, 'written': 0, 'offset': 0,
+                 'last_ids': []}
+
+    def fetch(page):
+        statuses = timeline(name, body_formats=body_formats, since=since,
+                            count=count, page=page)
+        return [status.to_dict() for status in statuses]
+
+    with open(filename, 'ab') as raw:
+        raw.truncate(state['offset'])  # drop data after the checkpoint
+        output = gzip.GzipFile(fileobj=raw, mode='wb')
+        executor = concurrent.futures.ThreadPoolExecutor(workers)
+        pending = collections.deque()
+        try:
+            page = state['page']
+            while True:
+                while len(pending) < workers:
+                    pending.append(executor.submit(
+                        contextvars.copy_context().run, fetch,
+                        page + len(pending)))
+                statuses = pending.popleft().result()
+                # posts during the export shift older statuses to the
+                # next page, so they may appear twice
+                last_ids = set(state['last_ids'])
+                for d in statuses:
+                    if d['id'] not in last_ids:
+                        line = json.dumps(d, ensure_ascii=False,
+                                          separators=(',', ':'))
+                        output.write(line.encode('utf-8') + b'\n')
+                        state['written'] += 1
+                state['last_ids'] = [d['id'] for d in statuses]
+                state['page'] = page = page + 1
+                if progress is not None:
+                    progress(page - 1, state['written'])
+                done = len(statuses) < count
+                if done or (page - 1) % checkpoint_every == 0:
+                    output.close()  # ends a gzip member
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                    state['offset'] = raw.tell()
+                    if done:
+                        break
+                    _save_checkpoint(checkpoint, state)
+                    output = gzip.GzipFile(fileobj=raw, mode='wb')
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown()
+            output.close()
+    try:
+        os.remove(checkpoint)
+    except FileNotFoundError:
+        pass
+    return state['written']
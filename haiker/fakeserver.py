@@ -0,0 +1,652 @@
+#!/usr/bin/env python3
+
+"""Local stand-in for the Hatena Haiku API
+
+FakeServer answers every API of haiker.Haiker from a Dataset of
+synthetic users, keywords and statuses, shaped like the real responses.
+Paging, since, stars, posts, deletions and follows work on the dataset.
+Latency, failures and the size of the payloads are configurable, so
+that throughput can be measured without the network.
+
+Example:
+
+>>> with haiker.fakeserver.FakeServer(latency=0.05) as server:
+...     api = haiker.Haiker(root=server.url)
+...     statuses = api.keyword_timeline('keyword1', count=200)
+
+or from the command line:
+
+    python3 -m haiker serve --port 8080 --latency 0.05 --error-rate 0.01
+
+Authorization is not checked, and the authenticated user is always
+the first one (Dataset.me).
+"""
+
+import collections
+import datetime
+import email.parser
+import email.policy
+import hashlib
+import http.server
+import itertools
+import json
+import random
+import threading
+import time
+import urllib.parse
+from . import endpoints, types
+
+
+_BASE = datetime.datetime(2010, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+_WORDS = ('haiku hatena spring summer autumn winter moon cherry rain snow '
+          'frog pond cicada river mountain wind cloud cat tea night').split()
+
+# body format: the fields it adds to a status
+_BODY_FORMATS = {
+    'haiku': ('haiku_text',),
+    'html': ('html',),
+    'touch': ('html_touch',),
+    'mobile': ('html_mobile',),
+}
+_BODY_FIELDS = {f for fields in _BODY_FORMATS.values() for f in fields}
+
+
+def _timestamp(d):
+    return d.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _since(value):
+    """Return the created_at string of a since param, which haiker
+    sends in the format of haiker.utils.serialize().
+    """
+    try:
+        d = datetime.datetime.strptime(value, '%a, %d %B %Y %H:%M:%S GMT')
+        d = d.replace(tzinfo=datetime.timezone.utc)
+    except ValueError:
+        d = types.to_datetime(value)  # raises ValueError if invalid
+    return _timestamp(d)
+
+
+def _int(value, default, name):
+    if value is None:
+        return default
+    try:
+        n = int(value)
+    except ValueError:
+        raise ValueError('{0} must be an integer'.format(name)) from None
+    if n < 1:
+        raise ValueError('{0} must be positive'.format(name))
+    return n
+
+
+def _flag(value):
+    return value not in {None, '', '0', 'false'}
+
+
+class Dataset(object):
+    """Thread-safe synthetic data of the API
+
+    users users, keywords keywords and statuses statuses are generated
+    from seed.  Each status has a body of about body_size characters in
+    every body format and replies replies.  Timelines return at most
+    max_count statuses per page, and lists of users or keywords
+    page_size per page.
+
+    The methods are named and take the arguments as the methods of
+    haiker.Haiker, as strings, and return the decoded JSON.  They raise
+    LookupError for what does not exist and ValueError for invalid
+    arguments.
+    """
+    def __init__(self, *, users=50, keywords=100, statuses=5000, replies=2,
+                 body_size=80, seed=0, max_count=200, page_size=100):
+        super().__init__()
+        self.max_count = max_count
+        self.page_size = page_size
+        self._random = random.Random(seed)
+        self._body_size = body_size
+        self._lock = threading.Lock()
+        self._ids = itertools.count(10 ** 17 + 1)
+        self._users = collections.OrderedDict()
+        self._follows = {}  # user name: set of user names
+        self._keywords = collections.OrderedDict()
+        self._favorite_keywords = {}  # user name: list of words
+        self._statuses = []  # newest first
+        self._by_id = {}
+        for i in range(users):
+            self._add_user('user{0}'.format(i))
+        for i in range(keywords):
+            self._add_keyword('keyword{0}'.format(i))
+        names = list(self._users)
+        words = list(self._keywords)
+        for i, name in enumerate(names):
+            self._follows[name] = {names[(i + j) % len(names)]
+                                   for j in range(1, min(6, len(names)))}
+            self._favorite_keywords[name] = self._random.sample(
+                words, min(3, len(words)))
+        for name, follows in self._follows.items():
+            for followed in follows:
+                self._count(self._users[followed], 'followers_count', 1)
+        for name, favorites in self._favorite_keywords.items():
+            for word in favorites:
+                self._count(self._keywords[word], 'followers_count', 1)
+        for word in words:
+            self._keywords[word]['related_keywords'] = self._random.sample(
+                words, min(2, len(words)))
+        # oldest first, 37 seconds apart, and every tenth with a photo
+        for i in range(statuses):
+            created_at = _BASE - datetime.timedelta(seconds=37 *
+                                                    (statuses - i))
+            self._add_status(self._random.choice(names),
+                             self._random.choice(words),
+                             self._body(), 'web', created_at, replies,
+                             files=[b''] if i % 10 == 0 else ())
+
+    @property
+    def me(self):
+        """The name of the authenticated user"""
+        return next(iter(self._users))
+
+    def _body(self):
+        words = []
+        size = -1
+        while size < self._body_size:
+            word = self._random.choice(_WORDS)
+            words.append(word)
+            size += len(word) + 1
+        return ' '.join(words)
+
+    @staticmethod
+    def _count(d, key, n):
+        d[key] = str(int(d[key]) + n)
+
+    def _add_user(self, name):
+        self._users[name] = {
+            'followers_count': '0',
+            'name': name.capitalize(),
+            'id': name,
+            'profile_image_url': 'http://h.hatena.ne.jp/{0}.gif'.format(name),
+            'screen_name': name,
+            'url': 'http://h.hatena.ne.jp/{0}/'.format(name),
+        }
+
+    def _add_keyword(self, word):
+        self._keywords[word] = {
+            'entry_count': '0',
+            'followers_count': '0',
+            'link': 'http://h.hatena.ne.jp/{0}'.format(word),
+            'related_keywords': [],
+            'title': word.capitalize(),
+            'word': word,
+            'url_name': word,
+        }
+        return self._keywords[word]
+
+    def _entry(self, name, text, source, created_at, in_reply_to=None,
+               files=()):
+        eid = str(next(self._ids))
+        user = self._users[name]
+        html = '<div class="body"><p>{0}</p>{1}</div>'.format(
+            text, ''.join('<img src="http://h.hatena.ne.jp/{0}.jpg">'.format(
+                eid) for f in files))
+        d = {
+            'link': 'http://h.hatena.ne.jp/{0}/{1}'.format(name, eid),
+            'created_at': _timestamp(created_at),
+            'favorited': str(self._random.randrange(20)),
+            'haiku_text': text,
+            'html': html,
+            'html_touch': html,
+            'html_mobile': html,
+            'id': eid,
+            'source': source,
+            'text': text,
+            'user': user,
+        }
+        if in_reply_to is not None:
+            d['in_reply_to_status_id'] = in_reply_to['id']
+            d['in_reply_to_user_id'] = in_reply_to['user']['id']
+        return d
+
+    def _add_status(self, name, word, text, source, created_at, replies=0,
+                    in_reply_to=None, files=()):
+        keyword = self._keywords.get(word)
+        if keyword is None:
+            keyword = self._add_keyword(word)
+        d = self._entry(name, text, source, created_at, in_reply_to, files)
+        d['keyword'] = word
+        d['target'] = {'title': keyword['title'], 'word': word,
+                       'url_name': keyword['url_name']}
+        names = list(self._users)
+        d['replies'] = [
+            self._entry(self._random.choice(names), self._body(), 'web',
+                        created_at + datetime.timedelta(seconds=j + 1), d)
+            for j in range(replies)]
+        self._count(keyword, 'entry_count', 1)
+        self._statuses.insert(0, d)
+        self._by_id[d['id']] = d
+        return d
+
+    def _status(self, eid):
+        d = self._by_id.get(eid)
+        if d is None:
+            raise LookupError('no status {0!r}'.format(eid))
+        return d
+
+    def _user(self, url_name):
+        if url_name is None:
+            url_name = self.me
+        d = self._users.get(url_name)
+        if d is None:
+            raise LookupError('no user {0!r}'.format(url_name))
+        return d
+
+    def _keyword(self, word, without_related_keywords=None):
+        d = self._keywords.get(word)
+        if d is None:
+            raise LookupError('no keyword {0!r}'.format(word))
+        return self._render_keyword(d, without_related_keywords)
+
+    @staticmethod
+    def _render_keyword(d, without_related_keywords):
+        d = dict(d, related_keywords=list(d['related_keywords']))
+        if _flag(without_related_keywords):
+            del d['related_keywords']
+        return d
+
+    @staticmethod
+    def _render(d, body_formats):
+        """Return a copy of status d with the fields of body_formats."""
+        fields = {'text'}
+        for f in (body_formats or '').split(','):
+            fields.update(_BODY_FORMATS.get(f, ()))
+        r = {k: v for k, v in d.items()
+             if k not in _BODY_FIELDS or k in fields}
+        r['user'] = dict(d['user'])
+        if 'replies' in d:
+            r['replies'] = [Dataset._render(reply, body_formats)
+                            for reply in d['replies']]
+        return r
+
+    def _timeline(self, match, body_formats, count, page, since,
+                  sort=None):
+        count = min(_int(count, 20, 'count'), self.max_count)
+        page = _int(page, 1, 'page')
+        since = None if since is None else _since(since)
+        with self._lock:
+            statuses = (d for d in self._statuses if match(d))
+            if since is not None:
+                statuses = itertools.takewhile(
+                    lambda d: d['created_at'] >= since, statuses)
+            if sort == 'hot':
+                statuses = sorted(statuses, key=lambda d: -int(d['favorited']))
+            statuses = itertools.islice(statuses, count * (page - 1),
+                                        count * page)
+            return [self._render(d, body_formats) for d in statuses]
+
+    def _page(self, items, page):
+        page = _int(page, 1, 'page')
+        return items[self.page_size * (page - 1):self.page_size * page]
+
+    # Timeline APIs
+
+    def public_timeline(self, *, body_formats=None, count=None, page=None,
+                        since=None):
+        return self._timeline(lambda d: True, body_formats, count, page,
+                              since)
+
+    def keyword_timeline(self, word, *, count=None, page=None, since=None,
+                         body_formats=None, sort=None):
+        return self._timeline(lambda d: d['keyword'] == word, body_formats,
+                              count, page, since, sort)
+
+    def user_timeline(self, url_name=None, *, body_formats=None, count=None,
+                      page=None, since=None, media=None, sort=None):
+        name = self._user(url_name)['id']
+        if media is None:
+            def match(d):
+                return d['user']['id'] == name
+        else:
+            def match(d):
+                return d['user']['id'] == name and '<img' in d['html']
+        return self._timeline(match, body_formats, count, page, since, sort)
+
+    def friends_timeline(self, url_name=None, *, count=None, page=None,
+                         since=None, body_formats=None):
+        name = self._user(url_name)['id']
+        with self._lock:
+            users = self._follows[name] | {name}
+            words = set(self._favorite_keywords[name])
+        return self._timeline(
+            lambda d: d['user']['id'] in users or d['keyword'] in words,
+            body_formats, count, page, since)
+
+    def album(self, *, body_formats=None, count=None, page=None, since=None,
+              sort=None, word=None):
+        return self._timeline(
+            lambda d: '<img' in d['html'] and word in {None, d['keyword']},
+            body_formats, count, page, since, sort)
+
+    # Entry and star APIs
+
+    def update_status(self, keyword, status, *, in_reply_to_status_id=None,
+                      source=None, files=(), body_formats=None):
+        if not status and not files:
+            raise ValueError('status is empty')
+        with self._lock:
+            in_reply_to = None
+            if in_reply_to_status_id is not None:
+                in_reply_to = self._status(in_reply_to_status_id)
+            d = self._add_status(
+                self.me, keyword, status, source or 'API',
+                datetime.datetime.now(datetime.timezone.utc),
+                in_reply_to=in_reply_to, files=files)
+            d['favorited'] = '0'
+            if in_reply_to is not None:
+                in_reply_to['replies'].append(d)
+            return self._render(d, body_formats)
+
+    def show_status(self, eid, *, body_formats=None):
+        with self._lock:
+            return self._render(self._status(eid), body_formats)
+
+    def delete_status(self, eid, author_url_name, *, body_formats=None):
+        with self._lock:
+            d = self._status(eid)
+            if d['user']['id'] != author_url_name:
+                raise ValueError('{0} is not the author'.format(
+                    author_url_name))
+            self._statuses.remove(d)
+            del self._by_id[eid]
+            self._count(self._keywords[d['keyword']], 'entry_count', -1)
+            return self._render(d, body_formats)
+
+    def add_star(self, eid, *, body_formats=None):
+        with self._lock:
+            d = self._status(eid)
+            self._count(d, 'favorited', 1)
+            return self._render(d, body_formats)
+
+    def remove_star(self, eid, *, body_formats=None):
+        with self._lock:
+            d = self._status(eid)
+            if d['favorited'] != '0':
+                self._count(d, 'favorited', -1)
+            return self._render(d, body_formats)
+
+    # User and keyword APIs
+
+    def show_user(self, url_name=None):
+        with self._lock:
+            return dict(self._user(url_name))
+
+    def show_keyword(self, word, *, without_related_keywords=None):
+        with self._lock:
+            return self._keyword(word, without_related_keywords)
+
+    def hot_keywords(self, *, without_related_keywords=None):
+        with self._lock:
+            hot = sorted(self._keywords.values(),
+                         key=lambda d: -int(d['entry_count']))[:20]
+            return [self._render_keyword(d, without_related_keywords)
+                    for d in hot]
+
+    def keyword_list(self, *, page=None, without_related_keywords=None,
+                     word=None):
+        with self._lock:
+            found = [self._render_keyword(d, without_related_keywords)
+                     for d in self._keywords.values()
+                     if word is None or d['word'].startswith(word)]
+        return self._page(found, page)
+
+    def associate_keywords(self, word1, word2, *,
+                           without_related_keywords=None):
+        with self._lock:
+            d1 = self._keywords.get(word1)
+            d2 = self._keywords.get(word2)
+            if d1 is None or d2 is None:
+                raise LookupError('no keyword {0!r}'.format(
+                    word1 if d1 is None else word2))
+            for d, other in [(d1, word2), (d2, word1)]:
+                if other not in d['related_keywords']:
+                    d['related_keywords'] = d['related_keywords'] + [other]
+            return self._render_keyword(d1, without_related_keywords)
+
+    def dissociate_keywords(self, word1, word2, *,
+                            without_related_keywords=None):
+        with self._lock:
+            d1 = self._keywords.get(word1)
+            d2 = self._keywords.get(word2)
+            if d1 is None or d2 is None:
+                raise LookupError('no keyword {0!r}'.format(
+                    word1 if d1 is None else word2))
+            for d, other in [(d1, word2), (d2, word1)]:
+                d['related_keywords'] = [w for w in d['related_keywords']
+                                         if w != other]
+            return self._render_keyword(d1, without_related_keywords)
+
+    # Favorite APIs
+
+    def friends(self, url_name=None, *, page=None):
+        with self._lock:
+            name = self._user(url_name)['id']
+            found = [dict(self._users[n]) for n in sorted(self._follows[name])]
+        return self._page(found, page)
+
+    def followers(self, url_name=None, *, page=None):
+        with self._lock:
+            name = self._user(url_name)['id']
+            found = [dict(d) for n, d in self._users.items()
+                     if name in self._follows[n]]
+        return self._page(found, page)
+
+    def follow_user(self, url_name):
+        with self._lock:
+            d = self._user(url_name)
+            follows = self._follows[self.me]
+            if url_name not in follows:
+                follows.add(url_name)
+                self._count(d, 'followers_count', 1)
+            return dict(d)
+
+    def unfollow_user(self, url_name):
+        with self._lock:
+            d = self._user(url_name)
+            follows = self._follows[self.me]
+            if url_name in follows:
+                follows.remove(url_name)
+                self._count(d, 'followers_count', -1)
+            return dict(d)
+
+    def favorite_keywords(self, url_name=None, *, page=None,
+                          without_related_keywords=None):
+        with self._lock:
+            name = self._user(url_name)['id']
+            found = [self._render_keyword(self._keywords[w],
+                                          without_related_keywords)
+                     for w in self._favorite_keywords[name]]
+        return self._page(found, page)
+
+    def follow_keyword(self, word, *, without_related_keywords=None):
+        with self._lock:
+            d = self._keywords.get(word)
+            if d is None:
+                d = self._add_keyword(word)
+            favorites = self._favorite_keywords[self.me]
+            if word not in favorites:
+                favorites.append(word)
+                self._count(d, 'followers_count', 1)
+            return self._render_keyword(d, without_related_keywords)
+
+    def unfollow_keyword(self, word, *, without_related_keywords=None):
+        with self._lock:
+            favorites = self._favorite_keywords[self.me]
+            d = self._keywords.get(word)
+            if d is None:
+                raise LookupError('no keyword {0!r}'.format(word))
+            if word in favorites:
+                favorites.remove(word)
+                self._count(d, 'followers_count', -1)
+            return self._render_keyword(d, without_related_keywords)
+
+
+def _form(content_type, body):
+    """Return the fields of a POST body as a list of (name, value)
+    pairs, where the values of files are bytes.
+    """
+    if content_type.startswith('multipart/form-data'):
+        message = email.parser.BytesParser(
+            policy=email.policy.HTTP).parsebytes(
+                b'Content-Type: ' + content_type.encode('latin-1') +
+                b'\r\n\r\n' + body)
+        fields = []
+        for part in message.iter_parts():
+            value = part.get_payload(decode=True)
+            if part.get_filename() is None:
+                value = value.decode(part.get_content_charset('utf-8'))
+            name = part.get_param('name', header='content-disposition')
+            fields.append((name, value))
+        return fields
+    return urllib.parse.parse_qsl(body.decode('utf-8'),
+                                  keep_blank_values=True)
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive as the real API
+    server_version = 'FakeHaiku/1.0'
+    # send each response at once, flushed after the request, without
+    # waiting for the delayed ACK of the client
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _handle(self, method):
+        server = self.server
+        url = urllib.parse.urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        delay = server.latency + server.random.uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        path = url.path
+        e = None
+        if path.startswith(server.prefix + '/'):
+            e, args = endpoints.match(path[len(server.prefix):])
+        if e is None:
+            return self._error(404, 'no API of {0}'.format(url.path))
+        server.count(e.name)
+        if method != e.method:
+            return self._error(405, '{0} requires {1}'.format(e.name,
+                                                              e.method))
+        if server.random.random() < server.error_rate:
+            return self._error(503, 'injected failure')
+        params = dict(urllib.parse.parse_qsl(url.query,
+                                             keep_blank_values=True))
+        files = []
+        if method == 'POST':
+            for name, value in _form(self.headers.get('Content-Type', ''),
+                                     body):
+                if isinstance(value, bytes):
+                    files.append(value)
+                else:
+                    params[name] = value
+        kwargs = {k: v for k, v in args.items() if v is not None}
+        for name in e.args + e.options:
+            if name in params and name not in args:
+                kwargs[name] = params[name]
+        missing = [a for a in e.args if a not in args and a not in kwargs]
+        if missing:
+            return self._error(400, 'missing {0}'.format(', '.join(missing)))
+        if e.form:
+            kwargs['files'] = files
+        try:
+            obj = getattr(server.dataset, e.name)(**kwargs)
+        except LookupError as exc:
+            return self._error(404, str(exc))
+        except ValueError as exc:
+            return self._error(400, str(exc))
+        payload = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8'}
+        if method == 'GET':
+            etag = '"{0}"'.format(hashlib.md5(payload).hexdigest())
+            headers['ETag'] = etag
+            if self.headers.get('If-None-Match') == etag:
+                return self._respond(304, b'', headers)
+        self._respond(200, payload, headers)
+
+    def _error(self, status, message):
+        self._respond(status, message.encode('utf-8'),
+                      {'Content-Type': 'text/plain; charset=utf-8'})
+
+    def _respond(self, status, payload, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class FakeServer(http.server.ThreadingHTTPServer):
+    """Threaded HTTP server of the API backed by a Dataset
+
+    Every response is delayed by latency plus a random fraction of
+    jitter seconds, and fails with 503 at the probability of
+    error_rate.  The API is served under prefix, so that url is the
+    root to give haiker.Haiker.
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address=('127.0.0.1', 0), dataset=None, *,
+                 latency=0.0, jitter=0.0, error_rate=0.0, prefix='/api',
+                 seed=None, verbose=False):
+        super().__init__(address, _Handler)
+        self.dataset = Dataset() if dataset is None else dataset
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.prefix = prefix.rstrip('/')
+        self.random = random.Random(seed)
+        self.verbose = verbose
+        self.counts = collections.Counter()  # endpoint name: requests
+        self._counts_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        """The root URL of the API"""
+        host, port = self.server_address[:2]
+        return 'http://{0}:{1}{2}'.format(host, port, self.prefix)
+
+    def count(self, name):
+        with self._counts_lock:
+            self.counts[name] += 1
+
+    def start(self):
+        """Serve in a daemon thread and return self."""
+        self._thread = threading.Thread(target=self.serve_forever,
+                                        args=(0.05,), daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """Stop serving and close the socket."""
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+
+"""Columnar batches of statuses for bulk analytics
+
+Example:
+
+>>> api = haiker.Haiker()
+>>> frame = api.keyword_timeline('BOT', count=200, frame=True)
+>>> frame.count_by_user()
+{'xxxxxx': 120, 'yyyyyy': 80}
+>>> recent = frame.select(frame.mask_time(since=datetime.datetime(2010, 1, 1,
+...                                        tzinfo=datetime.timezone.utc)))
+>>> columns = recent.to_numpy()  # requires numpy
+
+Masks are computed, and frames filtered and aggregated, by numpy on
+views of the columns if it is installed, or else by loops in Python.
+"""
+
+import array
+import collections
+import datetime
+import itertools
+from . import types
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+Row = collections.namedtuple('Row',
+                             'id created_at favorited user_id keyword')
+
+
+def _view(column):
+    """Return a numpy array sharing memory with an array column."""
+    return numpy.frombuffer(column,
+                            dtype='int{0}'.format(column.itemsize * 8))
+
+
+def _epoch(d):
+    if d.tzinfo is None:
+        d = d.astimezone()
+    return int(d.timestamp())
+
+
+class _Encoder(object):
+    """Dictionary encoder mapping values to consecutive codes"""
+    def __init__(self):
+        super().__init__()
+        self.values = []
+        self._codes = {}
+
+    def __call__(self, value):
+        if value is None:
+            return -1
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class StatusFrame(object):
+    """Columnar batch of statuses
+
+    Each column is a compact array: id is a list of strings,
+    created_at an int64 array of POSIX timestamps (seconds),
+    favorited an int64 array, and user ids and keywords are
+    dictionary-encoded into int32 codes (-1 for no keyword) indexing
+    the users and keywords lists.
+    """
+    __slots__ = ('id', 'created_at', 'favorited', 'user_codes', 'users',
+                 'keyword_codes', 'keywords')
+
+    def __init__(self, id=(), created_at=(), favorited=(), user_codes=(),
+                 users=(), keyword_codes=(), keywords=()):
+        super().__init__()
+        self.id = list(id)
+        self.created_at = array.array('q', created_at)
+        self.favorited = array.array('q', favorited)
+        self.user_codes = array.array('i', user_codes)
+        self.users = list(users)
+        self.keyword_codes = array.array('i', keyword_codes)
+        self.keywords = list(keywords)
+
+    @classmethod
+    def from_dicts(cls, iterable):
+        """Create a frame from decoded JSON objects of statuses
+        without creating haiker.types.Status objects.
+        """
+        frame = cls()
+        users, keywords = _Encoder(), _Encoder()
+        for d in iterable:
+            frame.id.append(str(d['id']))
+            created_at = types.to_datetime(d['created_at'])
+            frame.created_at.append(_epoch(created_at))
+            frame.favorited.append(int(d['favorited']))
+            frame.user_codes.append(users(str(d['user']['id'])))
+            keyword = d.get('keyword')
+            frame.keyword_codes.append(
+                keywords(None if keyword is None else str(keyword)))
+        frame.users, frame.keywords = users.values, keywords.values
+        return frame
+
+    @classmethod
+    def from_statuses(cls, iterable):
+        """Create a frame from haiker.types.Status objects."""
+        frame = cls()
+        users, keywords = _Encoder(), _Encoder()
+        for status in iterable:
+            frame.id.append(status.id)
+            frame.created_at.append(_epoch(status.created_at))
+            frame.favorited.append(status.favorited)
+            frame.user_codes.append(users(status.user.id))
+            frame.keyword_codes.append(keywords(status.keyword))
+        frame.users, frame.keywords = users.values, keywords.values
+        return frame
+
+    @classmethod
+    def concat(cls, frames):
+        """Concatenate frames into a new frame."""
+        result = cls()
+        users, keywords = _Encoder(), _Encoder()
+        for frame in frames:
+            result.id.extend(frame.id)
+            result.created_at.extend(frame.created_at)
+            result.favorited.extend(frame.favorited)
+            result.user_codes.extend(users(frame.users[c])
+                                     for c in frame.user_codes)
+            result.keyword_codes.extend(
+                keywords(None if c < 0 else frame.keywords[c])
+                for c in frame.keyword_codes)
+        result.users, result.keywords = users.values, keywords.values
+        return result
+
+    def __len__(self):
+        return len(self.id)
+
+    def __getitem__(self, i):
+        code = self.keyword_codes[i]
+        created_at = datetime.datetime.fromtimestamp(self.created_at[i],
+                                                     datetime.timezone.utc)
+        return Row(self.id[i], created_at, self.favorited[i],
+                   self.users[self.user_codes[i]],
+                   None if code < 0 else self.keywords[code])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __repr__(self):
+        return '<{name} len={n}>'.format(name=self.__class__.__name__,
+                                         n=len(self))
+
+    # Filtering
+    def select(self, mask):
+        """Return a new frame of the rows whose mask is true.
+        The dictionaries are shared with this frame.
+        """
+        if numpy is not None:
+            mask = numpy.asarray(mask, dtype=bool)
+        else:
+            mask = list(mask)
+        if len(mask) != len(self):
+            raise ValueError('mask length {0} != frame length {1}'.format(
+                len(mask), len(self)))
+        if numpy is not None:
+            def compress(column, mask):
+                return _view(column)[mask].tobytes()
+            ids = [self.id[i] for i in numpy.flatnonzero(mask).tolist()]
+        else:
+            compress = itertools.compress
+            ids = compress(self.id, mask)
+        return self.__class__(ids,
+                              compress(self.created_at, mask),
+                              compress(self.favorited, mask),
+                              compress(self.user_codes, mask),
+                              self.users,
+                              compress(self.keyword_codes, mask),
+                              self.keywords)
+
+    def mask_users(self, user_ids):
+        """Return a mask of the rows posted by one of user_ids: a numpy
+        bool array if numpy is installed, or else a list (as the other
+        masks).
+        """
+        user_ids = set(user_ids)
+        hit = [u in user_ids for u in self.users]
+        if numpy is not None:
+            return numpy.array(hit, dtype=bool)[_view(self.user_codes)]
+        return [hit[c] for c in self.user_codes]
+
+    def mask_keywords(self, words):
+        """Return a mask of the rows whose keyword is one of words."""
+        words = set(words)
+        # code -1 (no keyword) picks the last element
+        hit = [k in words for k in self.keywords] + [None in words]
+        if numpy is not None:
+            return numpy.array(hit, dtype=bool)[_view(self.keyword_codes)]
+        return [hit[c] for c in self.keyword_codes]
+
+    def mask_time(self, since=None, until=None):
+        """Return a mask of the rows created in [since, until)."""
+        lo = -2 ** 63 if since is None else _epoch(since)
+        hi = 2 ** 63 - 1 if until is None else _epoch(until)
+        if numpy is not None:
+            created_at = _view(self.created_at)
+            return (created_at >= lo) & (created_at < hi)
+        return [lo <= t < hi for t in self.created_at]
+
+    def mask_favorited(self, minimum):
+        """Return a mask of the rows with at least minimum stars."""
+        if numpy is not None:
+            return _view(self.favorited) >= minimum
+        return [n >= minimum for n in self.favorited]
+
+    # Aggregation
+    def _count(self, codes, n):
+        """Return the number of rows of each of the n codes, counting
+        code -1 last as indexing does.
+        """
+        if numpy is not None and n:
+            return numpy.bincount(_view(codes) % n, minlength=n).tolist()
+        counts = [0] * n
+        for c in codes:
+            counts[c] += 1
+        return counts
+
+    def count_by_user(self):
+        """Return {user id: number of rows}."""
+        counts = self._count(self.user_codes, len(self.users))
+        return {u: n for u, n in zip(self.users, counts) if n}
+
+    def count_by_keyword(self):
+        """Return {keyword: number of rows}, counting the rows
+        without keyword under None.
+        """
+        # code -1 (no keyword) is counted last
+        counts = self._count(self.keyword_codes, len(self.keywords) + 1)
+        return {k: n for k, n in zip(self.keywords + [None], counts) if n}
+
+    def favorited_by_user(self):
+        """Return {user id: total number of stars}."""
+        if numpy is not None:
+            totals = numpy.zeros(len(self.users), dtype='int64')
+            numpy.add.at(totals, _view(self.user_codes),
+                         _view(self.favorited))
+            totals = totals.tolist()
+        else:
+            totals = [0] * len(self.users)
+            for c, n in zip(self.user_codes, self.favorited):
+                totals[c] += n
+        return {u: n for u, n in zip(self.users, totals) if n}
+
+    def favorited_distribution(self):
+        """Return {number of stars: number of rows}."""
+        if numpy is not None:
+            values, counts = numpy.unique(_view(self.favorited),
+                                          return_counts=True)
+            return dict(zip(values.tolist(), counts.tolist()))
+        return dict(collections.Counter(self.favorited))
+
+    # Export
+    def to_numpy(self):
+        """Return a dict of numpy arrays (requires numpy).  The integer
+        columns share memory with this frame.
+        """
+        import numpy
+        return {
+            'id': numpy.array(self.id, dtype=object),
+            'created_at': numpy.frombuffer(self.created_at, dtype='int64'),
+            'favorited': numpy.frombuffer(self.favorited, dtype='int64'),
+            'user_codes': numpy.frombuffer(
+                self.user_codes, dtype='int{0}'.format(
+                    self.user_codes.itemsize * 8)),
+            'users': numpy.array(self.users, dtype=object),
+            'keyword_codes': numpy.frombuffer(
+                self.keyword_codes, dtype='int{0}'.format(
+                    self.keyword_codes.itemsize * 8)),
+            'keywords': numpy.array(self.keywords, dtype=object),
+        }
+
+    def to_arrow(self):
+        """Return a pyarrow.Table with dictionary-encoded user_id and
+        keyword columns (requires pyarrow).
+        """
+        import pyarrow
+        keyword_codes = pyarrow.array(self.keyword_codes,
+                                      mask=[c < 0 for c in self.keyword_codes],
+                                      type=pyarrow.int32())
+        return pyarrow.table({
+            'id': pyarrow.array(self.id, type=pyarrow.string()),
+            'created_at': pyarrow.array(self.created_at,
+                                        type=pyarrow.int64()).cast(
+                                            pyarrow.timestamp('s', 'UTC')),
+            'favorited': pyarrow.array(self.favorited, type=pyarrow.int64()),
+            'user_id': pyarrow.DictionaryArray.from_arrays(
+                pyarrow.array(self.user_codes, type=pyarrow.int32()),
+                pyarrow.array(self.users, type=pyarrow.string())),
+            'keyword': pyarrow.DictionaryArray.from_arrays(
+                keyword_codes,
+                pyarrow.array(self.keywords, type=pyarrow.string())),
+        })
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+
+"""Load generation against the API with latency percentiles
+
+run() drives a weighted mix of Haiker calls from threads and
+run_async() drives it from coroutines of an AsyncHaiker.  Either keeps
+concurrency calls in flight as fast as they complete, or starts calls
+at a fixed rate per second, and stops after duration seconds or
+a number of calls.  The Report gives the throughput, latency
+percentiles, errors and the CPU and memory used by the process.
+
+Example:
+
+>>> api = haiker.Haiker(root='http://127.0.0.1:8080/api',
+...                     session=haiker.utils.make_session(pool_maxsize=50),
+...                     single_flight=False)
+>>> report = haiker.loadtest.run(api, concurrency=50, duration=30)
+>>> print(report.format())
+
+or from the command line, against a stand-in started by
+``python3 -m haiker serve``:
+
+    python3 -m haiker --root http://127.0.0.1:8080/api loadtest \\
+        --concurrency 50 --duration 30
+
+The latency of a call started at a fixed rate is measured from the
+time it was due, so a slow server cannot hide queued calls.  Each call
+must reach the server: a client with single_flight or a cache is
+refused.
+"""
+
+import asyncio
+import collections
+import itertools
+import os
+import random
+import threading
+import time
+from . import endpoints
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# method name: weight
+DEFAULT_MIX = collections.OrderedDict([
+    ('public_timeline', 20),
+    ('keyword_timeline', 25),
+    ('user_timeline', 15),
+    ('friends_timeline', 5),
+    ('show_status', 15),
+    ('show_user', 10),
+    ('show_keyword', 5),
+    ('hot_keywords', 5),
+])
+
+_ENDPOINTS = {e.name: e for e in endpoints.ENDPOINTS}
+
+
+def parse_mix(text):
+    """Return the mix of text such as 'show_status=3,hot_keywords'
+    (whose weights default to 1).
+    """
+    mix = collections.OrderedDict()
+    for item in text.split(','):
+        name, _, weight = item.strip().partition('=')
+        if name not in _ENDPOINTS:
+            raise ValueError('unknown API: {0!r}'.format(name))
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise ValueError('invalid weight: {0!r}'.format(item)) from None
+    return mix
+
+
+class Targets(object):
+    """Arguments of the calls of a mix
+
+    Each call takes a random one of words (for word, word1, word2 and
+    keyword), url_names (for url_name and author_url_name) and eids
+    (for eid and in_reply_to_status_id).  Timeline APIs are called
+    with count unless it is None.
+    """
+    def __init__(self, words, url_names, eids, count=None):
+        super().__init__()
+        self.words = list(words)
+        self.url_names = list(url_names)
+        self.eids = list(eids)
+        self.count = count
+
+    @classmethod
+    def from_results(cls, statuses, keywords, count=None):
+        """Return Targets of the users, keywords and ids of statuses
+        and keywords (haiker.types objects).
+        """
+        words = [k.word for k in keywords]
+        words += [s.keyword for s in statuses if s.keyword not in words]
+        url_names = list(collections.OrderedDict.fromkeys(
+            s.user.id for s in statuses))
+        return cls(words, url_names, [s.id for s in statuses], count)
+
+    def check(self, mix):
+        """Raise ValueError unless every API of mix can be called."""
+        for name in mix:
+            for arg in _ENDPOINTS[name].args:
+                if not self._values(arg):
+                    raise ValueError('no {0} for {1}'.format(arg, name))
+
+    def _values(self, arg):
+        if arg in {'word', 'word1', 'word2', 'keyword'}:
+            return self.words
+        if arg in {'url_name', 'author_url_name'}:
+            return self.url_names
+        if arg in {'eid', 'in_reply_to_status_id'}:
+            return self.eids
+        if arg == 'status':
+            return ['load test']
+        return None
+
+    def call(self, api, name, rng):
+        """Call the API of name and return the result (an awaitable for
+        an AsyncHaiker).
+        """
+        e = _ENDPOINTS[name]
+        args = [rng.choice(self._values(arg)) for arg in e.args]
+        kwargs = {}
+        if self.count is not None and 'count' in e.options:
+            kwargs['count'] = self.count
+        return getattr(api, name)(*args, **kwargs)
+
+
+def find_targets(api, count=None):
+    """Return Targets found by calling public_timeline() and
+    hot_keywords() of api.
+    """
+    return Targets.from_results(api.public_timeline(count=100),
+                                api.hot_keywords(), count)
+
+
+async def find_targets_async(api, count=None):
+    """Coroutine version of find_targets() for an AsyncHaiker"""
+    statuses, keywords = await asyncio.gather(api.public_timeline(count=100),
+                                              api.hot_keywords())
+    return Targets.from_results(statuses, keywords, count)
+
+
+class _Schedule(object):
+    """Thread-safe source of the due times of the calls"""
+    def __init__(self, rate, duration, requests):
+        super().__init__()
+        self.rate = rate
+        self.requests = requests
+        self.start = time.perf_counter()
+        self.end = None if duration is None else self.start + duration
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def next(self):
+        """Return when the next call is due, or None if it is not to be
+        made.
+        """
+        with self._lock:
+            i = next(self._counter)
+        if self.requests is not None and i >= self.requests:
+            return None
+        if self.rate is None:
+            due = time.perf_counter()
+        else:
+            due = self.start + i / self.rate
+        if self.end is not None and due >= self.end:
+            return None
+        return due
+
+
+def _error(e):
+    """Return the label of an error: the HTTP status or the name of
+    the exception.
+    """
+    e = getattr(e, 'causal_error', e)
+    status = getattr(getattr(e, 'response', None), 'status_code', None)
+    if status is None:
+        status = getattr(e, 'status', None)  # aiohttp.ClientResponseError
+    return type(e).__name__ if status is None else str(status)
+
+
+def _usage():
+    """Return the CPU seconds of the process and its peak RSS in bytes
+    (None if unknown).
+    """
+    times = os.times()
+    cpu = times.user + times.system
+    if resource is None:
+        return cpu, None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return cpu, rss * 1024 if os.uname().sysname != 'Darwin' else rss
+
+
+def _choices(mix, seed, n):
+    """Return a function which returns the name of a random API of mix
+    and a random.Random for the arguments.
+    """
+    rng = random.Random('{0}/{1}'.format(seed, n))
+    names = list(mix)
+    weights = list(itertools.accumulate(mix[name] for name in names))
+    return lambda: rng.choices(names, cum_weights=weights)[0], rng
+
+
+def _check(mix, concurrency, rate, duration, requests):
+    if not mix:
+        raise ValueError('mix is empty')
+    if concurrency < 1:
+        raise ValueError('concurrency must be positive')
+    if rate is not None and rate <= 0:
+        raise ValueError('rate must be positive')
+    if duration is None and requests is None:
+        raise ValueError('either duration or requests is required')
+
+
+def _check_api(api):
+    handler = api._handler
+    if handler.flights is not None:
+        raise ValueError('calls of api are coalesced; '
+                         'make it with single_flight=False')
+    if handler.cache is not None or handler.disk_cache is not None:
+        raise ValueError('calls of api are cached; make it without caches')
+
+
+def run(api, mix=DEFAULT_MIX, *, concurrency=10, rate=None, duration=10.0,
+        requests=None, targets=None, seed=0):
+    """Call the APIs of mix (a mapping of Haiker method names to
+    weights) of api from concurrency threads and return a Report.
+
+    Without rate, each thread makes a call as soon as its last one
+    returns.  With rate, calls are due at rate per second and wait for
+    a free thread.  The run stops after duration seconds or after
+    requests calls, whichever comes first (None for no limit).
+
+    targets are the Targets of the arguments, found by calling api if
+    None.  Give api a session with a connection for each thread, and
+    neither single_flight nor a cache (ValueError is raised).
+    """
+    _check(mix, concurrency, rate, duration, requests)
+    _check_api(api)
+    if targets is None:
+        targets = find_targets(api)
+    targets.check(mix)
+    samples = []
+    usage = _usage()
+    schedule = _Schedule(rate, duration, requests)
+
+    def work(n):
+        choose, rng = _choices(mix, seed, n)
+        while True:
+            due = schedule.next()
+            if due is None:
+                return
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            name = choose()
+            try:
+                targets.call(api, name, rng)
+            except Exception as e:
+                error = _error(e)
+            else:
+                error = None
+            samples.append((name, due - schedule.start,
+                            time.perf_counter() - due, error))
+    threads = [threading.Thread(target=work, args=(n,), daemon=True)
+               for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return Report(samples, time.perf_counter() - schedule.start,
+                  concurrency, rate, usage)
+
+
+async def run_async(api, mix=DEFAULT_MIX, *, concurrency=100, rate=None,
+                    duration=10.0, requests=None, targets=None, seed=0):
+    """Coroutine version of run() which calls the APIs of an
+    AsyncHaiker from concurrency tasks
+    """
+    _check(mix, concurrency, rate, duration, requests)
+    _check_api(api)
+    if targets is None:
+        targets = await find_targets_async(api)
+    targets.check(mix)
+    samples = []
+    usage = _usage()
+    schedule = _Schedule(rate, duration, requests)
+
+    async def work(n):
+        choose, rng = _choices(mix, seed, n)
+        while True:
+            due = schedule.next()
+            if due is None:
+                return
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name = choose()
+            try:
+                await targets.call(api, name, rng)
+            except Exception as e:
+                error = _error(e)
+            else:
+                error = None
+            samples.append((name, due - schedule.start,
+                            time.perf_counter() - due, error))
+    await asyncio.gather(*[work(n) for n in range(concurrency)])
+    return Report(samples, time.perf_counter() - schedule.start,
+                  concurrency, rate, usage)
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0 < q <= 100) of sorted values by
+    the nearest rank, or None if values is empty.
+    """
+    if not values:
+        return None
+    rank = max(1, -(-len(values) * q // 100))  # ceil
+    return values[int(rank) - 1]
+
+
+class Report(object):
+    """Results of a load test
+
+    samples are (API name, seconds from the start when the call was
+    due, latency in seconds, error label or None) tuples, in the order
+    of completion.  cpu_time is the CPU seconds used by the process
+    (every thread of it, not only the calls), and max_rss is its peak
+    resident memory in bytes, or None if unknown.
+    """
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, samples, elapsed, concurrency, rate, usage):
+        super().__init__()
+        self.samples = samples
+        self.elapsed = elapsed
+        self.concurrency = concurrency
+        self.rate = rate
+        cpu, _ = usage
+        now_cpu, self.max_rss = _usage()
+        self.cpu_time = now_cpu - cpu
+
+    @property
+    def count(self):
+        return len(self.samples)
+
+    @property
+    def throughput(self):
+        """Calls completed per second"""
+        return self.count / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def errors(self):
+        """collections.Counter of the error labels"""
+        return collections.Counter(s[3] for s in self.samples
+                                   if s[3] is not None)
+
+    @property
+    def error_rate(self):
+        if not self.samples:
+            return 0.0
+        return sum(self.errors.values()) / self.count
+
+    @property
+    def cpu_utilization(self):
+        """CPU seconds per second (1.0 for a busy core)"""
+        return self.cpu_time / self.elapsed if self.elapsed > 0 else 0.0
+
+    def latencies(self, name=None):
+        """Return the sorted latencies of the calls (of the API of name
+        unless it is None).
+        """
+        return sorted(s[2] for s in self.samples
+                      if name is None or s[0] == name)
+
+    def summary(self, name=None):
+        """Return a dict of the count, error count, mean, percentiles
+        (p50, p95 and p99) and max of the latencies in seconds.
+        """
+        latencies = self.latencies(name)
+        samples = [s for s in self.samples if name is None or s[0] == name]
+        d = collections.OrderedDict([
+            ('count', len(samples)),
+            ('errors', sum(1 for s in samples if s[3] is not None)),
+            ('mean', sum(latencies) / len(latencies) if latencies else None),
+        ])
+        for q in self.PERCENTILES:
+            d['p{0}'.format(q)] = percentile(latencies, q)
+        d['max'] = latencies[-1] if latencies else None
+        return d
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ('concurrency', self.concurrency),
+            ('rate', self.rate),
+            ('elapsed', self.elapsed),
+            ('throughput', self.throughput),
+            ('error_rate', self.error_rate),
+            ('errors', dict(self.errors)),
+            ('cpu_time', self.cpu_time),
+            ('cpu_utilization', self.cpu_utilization),
+            ('max_rss', self.max_rss),
+            ('latency', self.summary()),
+            ('apis', collections.OrderedDict(
+                (name, self.summary(name))
+                for name in sorted({s[0] for s in self.samples}))),
+        ])
+
+    def format(self):
+        """Return the report as a table in text."""
+        def ms(value):
+            return '-' if value is None else '{0:.1f}'.format(value * 1e3)
+        lines = [
+            '{0} calls in {1:.1f}s: {2:.1f}/s, concurrency {3}{4}'.format(
+                self.count, self.elapsed, self.throughput, self.concurrency,
+                '' if self.rate is None else ', rate {0}/s'.format(
+                    self.rate)),
+            'errors: {0:.2%}{1}'.format(self.error_rate, ''.join(
+                ' {0}={1}'.format(k, v)
+                for k, v in sorted(self.errors.items()))),
+            'client: {0:.1f}s CPU ({1:.0%}), max RSS {2}'.format(
+                self.cpu_time, self.cpu_utilization,
+                '-' if self.max_rss is None else '{0:.1f}MB'.format(
+                    self.max_rss / 2 ** 20)),
+            '',
+            '{0:<20}{1:>8}{2:>8}{3:>9}{4:>9}{5:>9}{6:>9}{7:>9}'.format(
+                'latency (ms)', 'calls', 'errors', 'mean', 'p50', 'p95',
+                'p99', 'max'),
+        ]
+        names = sorted({s[0] for s in self.samples}) + [None]
+        for name in names:
+            d = self.summary(name)
+            lines.append(
+                '{0:<20}{1:>8}{2:>8}{3:>9}{4:>9}{5:>9}{6:>9}{7:>9}'.format(
+                    name or 'all', d['count'], d['errors'], ms(d['mean']),
+                    ms(d['p50']), ms(d['p95']), ms(d['p99']),
+                    ms(d['max'])))
+        return '\n'.join(lines)
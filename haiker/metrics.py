@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+
+"""Per-call measurements of API requests
+
+An observer is a callable which receives a CallRecord after each API
+call made by a handler.  Aggregator is an observer which keeps counters
+and latency histograms and exports them in the Prometheus text format.
+
+Example:
+
+>>> metrics = haiker.metrics.Aggregator()
+>>> api = haiker.Haiker(observers=[metrics])
+>>> statuses = api.keyword_timeline('BOT')
+>>> print(metrics.prometheus())
+# HELP haiker_calls_total API calls.
+# TYPE haiker_calls_total counter
+haiker_calls_total{endpoint="keyword_timeline",method="GET",code="200"} 1
+...
+
+Records are only made while a handler has observers.
+"""
+
+import bisect
+import collections
+import contextlib
+import threading
+import time
+from . import endpoints
+
+
+class CallRecord(object):
+    """Measurements of an API call
+
+    method, path    the HTTP method and the path of API
+    status          the HTTP status of the last response, or None if
+                    there was none (e.g. a connection error or a hit of
+                    a cache)
+    cached          True if the result came from a cache, including
+                    a response revalidated with 304 Not Modified
+    bytes_sent      the size of the request bodies
+    bytes_received  the size of the response bodies
+    network_time    seconds spent sending requests and receiving
+                    responses
+    decode_time     seconds spent decoding JSON
+    parse_time      seconds spent converting it (e.g. to
+                    haiker.types objects)
+    retries         the number of retried attempts
+    duration        seconds of the whole call, including waits for
+                    the rate limiter and backoff
+    error           the exception which failed the call, or None
+    """
+    __slots__ = ('method', 'path', 'status', 'cached', 'bytes_sent',
+                 'bytes_received', 'network_time', 'decode_time',
+                 'parse_time', 'retries', 'duration', 'error', '_started')
+
+    def __init__(self, method, path):
+        super().__init__()
+        self.method = method
+        self.path = path
+        self.status = None
+        self.cached = False
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.network_time = 0.0
+        self.decode_time = 0.0
+        self.parse_time = 0.0
+        self.retries = 0
+        self.duration = None
+        self.error = None
+        self._started = time.perf_counter()
+
+    @property
+    def endpoint(self):
+        """The name of the Haiker method of path (e.g. 'show_status'),
+        or None if path is not of a known API.
+        """
+        e = endpoints.find(self.path)
+        return None if e is None else e.name
+
+    def __repr__(self):
+        return '<{0} {1} {2} {3}>'.format(type(self).__name__, self.method,
+                                          self.path, self.status)
+
+
+class _Recording(object):
+    """Context manager which passes its CallRecord to observers when
+    the call is finished.
+    """
+    __slots__ = ('record', 'observers')
+
+    def __init__(self, observers, method, path):
+        super().__init__()
+        self.record = CallRecord(method, path)
+        self.observers = observers
+
+    def __enter__(self):
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        record = self.record
+        record.duration = time.perf_counter() - record._started
+        # not GeneratorExit of a closed iterator
+        if isinstance(exc_value, Exception):
+            record.error = exc_value
+        for observer in list(self.observers):
+            observer(record)
+
+
+_DISABLED = contextlib.nullcontext()
+
+
+def recording(observers, method, path):
+    """Return a context manager giving a CallRecord of a call, which is
+    passed to each of observers at the end, or None if there are no
+    observers.
+    """
+    if not observers:
+        return _DISABLED
+    return _Recording(observers, method, path)
+
+
+def timed(record, field, func, arg):
+    """Return func(arg) and add the seconds it takes to the field of
+    record unless record is None.
+    """
+    if record is None:
+        return func(arg)
+    start = time.perf_counter()
+    try:
+        return func(arg)
+    finally:
+        setattr(record, field,
+                getattr(record, field) + time.perf_counter() - start)
+
+
+def received(record, chunks):
+    """Yield chunks of a response body, adding their size and the time
+    to receive them to record.
+    """
+    chunks = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(chunks, None)
+        record.network_time += time.perf_counter() - start
+        if chunk is None:
+            return
+        record.bytes_received += len(chunk)
+        yield chunk
+
+
+def decoded(record, objs):
+    """Yield objs decoded from a response body received by received(),
+    adding the time to decode them to record.
+    """
+    objs = iter(objs)
+    while True:
+        start = time.perf_counter()
+        network = record.network_time
+        try:
+            obj = next(objs)
+        except StopIteration:
+            return
+        finally:
+            record.decode_time += (time.perf_counter() - start -
+                                   (record.network_time - network))
+        yield obj
+
+
+def body_size(body):
+    """Return the size of a prepared request body."""
+    if body is None:
+        return 0
+    if isinstance(body, str):
+        return len(body.encode('utf-8'))
+    return len(body)
+
+
+class Histogram(object):
+    """Cumulative histogram of observed values
+
+    buckets are the upper bounds in ascending order, and +Inf is
+    implied.
+    """
+    def __init__(self, buckets):
+        super().__init__()
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Return a list of (upper bound, count of values <= it)
+        including (float('inf'), count).
+        """
+        pairs = []
+        total = 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            total += n
+            pairs.append((bound, total))
+        return pairs
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('"', '\\"'))
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(name, _escape(value))
+                          for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return repr(value)
+
+
+class Aggregator(object):
+    """Thread-safe observer which aggregates CallRecord objects
+
+    Calls are counted by endpoint (the Haiker method name, or 'other'),
+    HTTP method and code (the status, 'cache' for a hit of a cache
+    without a request or 'error' for no response), and their seconds
+    are observed in histograms by endpoint.
+    """
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+               10.0, 30.0)
+
+    # name: (type, help, label names)
+    _METRICS = collections.OrderedDict([
+        ('haiker_calls_total',
+         ('counter', 'API calls.', ('endpoint', 'method', 'code'))),
+        ('haiker_retries_total',
+         ('counter', 'Retried attempts.', ('endpoint',))),
+        ('haiker_sent_bytes_total',
+         ('counter', 'Bytes of request bodies.', ('endpoint',))),
+        ('haiker_received_bytes_total',
+         ('counter', 'Bytes of response bodies.', ('endpoint',))),
+        ('haiker_call_duration_seconds',
+         ('histogram', 'Seconds of whole calls.', ('endpoint',))),
+        ('haiker_network_seconds',
+         ('histogram', 'Seconds spent on the network per call.',
+          ('endpoint',))),
+        ('haiker_decode_seconds',
+         ('histogram', 'Seconds spent decoding JSON per call.',
+          ('endpoint',))),
+        ('haiker_parse_seconds',
+         ('histogram', 'Seconds spent building objects per call.',
+          ('endpoint',))),
+    ])
+
+    def __init__(self, buckets=BUCKETS):
+        super().__init__()
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything observed."""
+        with self._lock:
+            self._values = {name: {} for name in self._METRICS}
+
+    def __call__(self, record):
+        endpoint = record.endpoint or 'other'
+        if record.status is not None:
+            code = str(record.status)
+        elif record.cached:
+            code = 'cache'
+        else:
+            code = 'error'
+        with self._lock:
+            self._add('haiker_calls_total', (endpoint, record.method, code),
+                      1)
+            self._add('haiker_retries_total', (endpoint,), record.retries)
+            self._add('haiker_sent_bytes_total', (endpoint,),
+                      record.bytes_sent)
+            self._add('haiker_received_bytes_total', (endpoint,),
+                      record.bytes_received)
+            for name, value in [
+                    ('haiker_call_duration_seconds', record.duration),
+                    ('haiker_network_seconds', record.network_time),
+                    ('haiker_decode_seconds', record.decode_time),
+                    ('haiker_parse_seconds', record.parse_time)]:
+                self._observe(name, (endpoint,), value)
+
+    def _add(self, name, labels, value):
+        values = self._values[name]
+        values[labels] = values.get(labels, 0) + value
+
+    def _observe(self, name, labels, value):
+        values = self._values[name]
+        histogram = values.get(labels)
+        if histogram is None:
+            histogram = values[labels] = Histogram(self.buckets)
+        histogram.observe(value)
+
+    def value(self, name, *labels):
+        """Return the counter (or the Histogram) of name with labels,
+        or None if nothing has been observed for them.
+        """
+        with self._lock:
+            return self._values[name].get(labels)
+
+    def prometheus(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, (kind, help, label_names) in self._METRICS.items():
+                lines.append('# HELP {0} {1}'.format(name, help))
+                lines.append('# TYPE {0} {1}'.format(name, kind))
+                values = self._values[name]
+                for labels in sorted(values):
+                    if kind == 'counter':
+                        lines.append('{0}{1} {2}'.format(
+                            name, _labels(label_names, labels),
+                            _number(values[labels])))
+                        continue
+                    histogram = values[labels]
+                    for bound, count in histogram.cumulative():
+                        lines.append('{0}_bucket{1} {2}'.format(
+                            name, _labels(label_names, labels,
+                                          [('le', _number(bound))]),
+                            count))
+                    lines.append('{0}_sum{1} {2}'.format(
+                        name, _labels(label_names, labels),
+                        _number(histogram.sum)))
+                    lines.append('{0}_count{1} {2}'.format(
+                        name, _labels(label_names, labels),
+                        histogram.count))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket
+
+    Tokens are added at rate per second up to capacity, which is the
+    size of the allowed burst.  A caller reserves tokens and then waits
+    outside the lock until they are available, so concurrent callers
+    are served in order and together never exceed the rate.
+    """
+    def __init__(self, rate, capacity=None):
+        super().__init__()
+        if rate <= 0:
+            raise ValueError('rate must be positive: {0!r}'.format(rate))
+        self.rate = rate
+        self.capacity = max(1.0, rate) if capacity is None else capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """Take tokens and return the seconds to wait before using them."""
+        with self._lock:
+            now = time.monotonic()
+            refill = (now - self._updated) * self.rate
+            self._tokens = min(self.capacity, self._tokens + refill)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available and return the waited
+        seconds.
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RateLimiter(object):
+    """Separate read (GET) and write (POST) budgets
+
+    Either bucket may be None for no limit.  A limiter can be shared
+    by Haiker objects and threads to hold them to one budget.
+
+    Example:
+
+    >>> limiter = haiker.ratelimit.RateLimiter(
+    ...     read=haiker.ratelimit.TokenBucket(10, capacity=20),
+    ...     write=haiker.ratelimit.TokenBucket(0.5))
+    >>> api1 = haiker.Haiker(auth1, rate_limiter=limiter)
+    >>> api2 = haiker.Haiker(auth2, rate_limiter=limiter)
+    """
+    def __init__(self, read=None, write=None):
+        super().__init__()
+        self.read = read
+        self.write = write
+
+    def bucket(self, method):
+        """Return the bucket for an HTTP method."""
+        return self.read if method in {'GET', 'HEAD'} else self.write
+
+    def reserve(self, method):
+        """Take a token for method and return the seconds to wait."""
+        bucket = self.bucket(method)
+        return 0.0 if bucket is None else bucket.reserve()
+
+    def acquire(self, method):
+        """Block until a request with method is allowed and return
+        the waited seconds.
+        """
+        bucket = self.bucket(method)
+        return 0.0 if bucket is None else bucket.acquire()
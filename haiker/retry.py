@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+
+"""Retries, deadlines and circuit breaking of API calls
+
+Example:
+
+>>> api = haiker.Haiker(
+...     timeout=(3.05, 30),
+...     retry=haiker.retry.RetryPolicy(max_retries=4, backoff=0.5),
+...     circuit_breaker=haiker.retry.CircuitBreaker(failure_threshold=5,
+...                                                 reset_timeout=30))
+>>> with haiker.retry.deadline(60):  # for all the pages
+...     statuses = list(api.iter_keyword_timeline('BOT'))
+"""
+
+import contextlib
+import contextvars
+import random
+import threading
+import time
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling API while the circuit is open."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the deadline has passed before or during a call."""
+
+
+class RetryPolicy(object):
+    """Exponential backoff with full jitter
+
+    A failed attempt is retried up to max_retries times if its method
+    is in methods and it failed with a connection error, a timeout or
+    an HTTP status in statuses.  Before the n-th retry (n >= 1) it waits
+    a random time up to min(max_backoff, backoff * 2 ** (n - 1)) seconds.
+    Only GET is retried by default since other methods are not
+    idempotent.
+    """
+    def __init__(self, max_retries=3, *, backoff=0.5, max_backoff=30.0,
+                 statuses=(429, 500, 502, 503, 504), methods=('GET',)):
+        super().__init__()
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = frozenset(statuses)
+        self.methods = frozenset(methods)
+
+    def retryable(self, method, status, attempt):
+        """Return whether attempt (0 for the first call) should be
+        retried.  status is None for a connection error or a timeout.
+        """
+        return (attempt < self.max_retries and method in self.methods and
+                (status is None or status in self.statuses))
+
+    def delay(self, attempt):
+        """Return the seconds to wait before retrying attempt."""
+        return random.uniform(0, min(self.max_backoff,
+                                     self.backoff * 2 ** attempt))
+
+
+class CircuitBreaker(object):
+    """Thread-safe circuit breaker
+
+    After failure_threshold consecutive failures (connection errors,
+    timeouts and 5xx responses) the circuit opens and calls fail fast
+    with CircuitOpenError.  After reset_timeout seconds a single trial
+    call is let through; its success closes the circuit and its
+    failure opens it again.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        super().__init__()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """'closed', 'open' or 'half-open'"""
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if self._trial or self._expired():
+                return 'half-open'
+            return 'open'
+
+    def _expired(self):
+        return time.monotonic() >= self._opened_at + self.reset_timeout
+
+    def before(self):
+        """Raise CircuitOpenError unless a call is allowed now."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial or not self._expired():
+                raise CircuitOpenError('circuit is open')
+            self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial = False
+
+    def release(self):
+        """End the trial call, if any, without its result (e.g. it was
+        cancelled or failed before a response), so that the next call
+        after reset_timeout is tried again.
+        """
+        with self._lock:
+            self._trial = False
+
+
+_deadline = contextvars.ContextVar('haiker_deadline', default=None)
+
+
+@contextlib.contextmanager
+def deadline(seconds):
+    """Limit all the API calls in the with block to seconds in total,
+    including retries, backoff and paging.  An inner deadline cannot
+    extend an outer one.
+    """
+    at = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(at if current is None else min(current, at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining():
+    """Return the seconds left until the current deadline,
+    or None without deadline.
+    """
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def timeout_for(timeout):
+    """Return timeout (None, seconds or a (connect, read) pair) capped
+    by the current deadline.  Raise DeadlineExceeded if it has passed.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded('deadline exceeded')
+    if timeout is None:
+        return (left, left)
+    if isinstance(timeout, tuple):
+        return tuple(left if t is None else min(t, left) for t in timeout)
+    return min(timeout, left)
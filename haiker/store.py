@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import collections
+import threading
+from . import types
+
+
+class EntityStore(object):
+    """Identity map of User, Target and Keyword objects
+
+    Objects are keyed by user id or by keyword, and the same object is
+    returned as long as the decoded JSON it was built from is unchanged,
+    so a timeline dominated by a few users holds a few User objects.
+    Changed data replaces the entry with a new object.  At most maxsize
+    entries are kept and the least recently used one is evicted.
+    A store can be shared by threads and by Haiker objects.
+
+    Example:
+
+    >>> store = haiker.store.EntityStore(maxsize=10000)
+    >>> api = haiker.Haiker(store=store)
+    >>> statuses = api.keyword_timeline('BOT', count=200)
+    >>> statuses[0].user is statuses[1].user
+    True
+    """
+    def __init__(self, maxsize=4096):
+        super().__init__()
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _intern(self, cls, key, d, lazy):
+        key = (cls, key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == d:
+                self._entries.move_to_end(key)
+                return entry[1]
+        obj = cls(d, lazy=lazy)
+        with self._lock:
+            self._entries[key] = (d, obj)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return obj
+
+    def user(self, d, *, lazy=False):
+        """Return a haiker.types.User for d."""
+        return self._intern(types.User, str(d['id']), d, lazy)
+
+    def target(self, d, *, lazy=False):
+        """Return a haiker.types.Target for d."""
+        return self._intern(types.Target, str(d['word']), d, lazy)
+
+    def keyword(self, d, *, lazy=False):
+        """Return a haiker.types.Keyword for d."""
+        return self._intern(types.Keyword, str(d['word']), d, lazy)
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
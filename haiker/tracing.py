@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+
+"""Nested spans of the stages of API calls
+
+A Haiker given a tracer opens a span for each API call, with child
+spans for the stages of its requests:
+
+    haiker.call     endpoint, method, path and page of the call
+    haiker.sign     OAuth signing of a request
+    haiker.network  an attempt to send a request and receive the
+                    response (attempt and status)
+    haiker.receive  reading the response body (AsyncHaiker only, whose
+                    haiker.network spans end with the headers)
+    haiker.decode   decoding the JSON response
+    haiker.parse    building objects (e.g. haiker.types.Status)
+
+Calls made by iter_* methods and bulk methods (e.g. show_statuses())
+are children of a haiker.paginate or a haiker.bulk span, including
+those run in other threads or tasks.
+
+Example:
+
+>>> tracer = haiker.tracing.RecordingTracer()
+>>> api = haiker.Haiker(tracer=tracer)
+>>> statuses = api.keyword_timeline('BOT', page=2)
+>>> print(tracer.format())
+haiker.call 412.3ms endpoint='keyword_timeline' method='GET' ...
+  haiker.network 398.0ms attempt=0 status=200
+  haiker.decode 6.1ms
+  haiker.parse 8.0ms
+
+Without a tracer, no span is made and each stage costs a context
+variable lookup.  Subclass Tracer to pass spans elsewhere (e.g. to
+OpenTelemetry) by overriding finish().
+"""
+
+import contextvars
+import itertools
+import threading
+import time
+
+
+_current = contextvars.ContextVar('haiker_span', default=None)
+_ids = itertools.count(1)
+
+
+class Span(object):
+    """A timed stage of a call
+
+    A span is activated (made the parent of new spans in the current
+    context) and ended by a with statement, or activated by
+    activate() while it is open and ended by end().
+    """
+    def __init__(self, tracer, name, parent=None, attributes=None):
+        super().__init__()
+        self.tracer = tracer
+        self.name = name
+        self.id = next(_ids)
+        self.parent_id = None if parent is None else parent.id
+        self.attributes = dict(attributes or {})
+        self.error = None
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.end_time = None
+        self._tokens = []
+
+    @property
+    def duration(self):
+        """Seconds from the start to the end, or None while open"""
+        if self.end_time is None:
+            return None
+        return self.end_time - self.start
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def activate(self):
+        """Return a context manager which makes this span the current
+        one while it is entered, without ending it.
+        """
+        return _Activation(self)
+
+    def end(self, error=None):
+        """End this span and pass it to the tracer (only once)."""
+        if self.end_time is not None:
+            return
+        self.end_time = time.perf_counter()
+        if error is not None:
+            self.error = error
+        self.tracer.finish(self)
+
+    def __enter__(self):
+        self._tokens.append(_current.set(self))
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current.reset(self._tokens.pop())
+        self.end(exc_value if isinstance(exc_value, Exception) else None)
+
+    def to_dict(self):
+        return {'id': self.id, 'parent_id': self.parent_id,
+                'name': self.name, 'timestamp': self.timestamp,
+                'duration': self.duration, 'attributes': self.attributes,
+                'error': None if self.error is None else repr(self.error)}
+
+    def __repr__(self):
+        return '<{0} {1} {2}>'.format(type(self).__name__, self.name,
+                                      self.attributes)
+
+
+class _Activation(object):
+    __slots__ = ('_span', '_token')
+
+    def __init__(self, span):
+        super().__init__()
+        self._span = span
+
+    def __enter__(self):
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, *exc_info):
+        _current.reset(self._token)
+
+
+class _NoopSpan(object):
+    """Span which records nothing"""
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def activate(self):
+        return self
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NOOP = _NoopSpan()
+
+
+class Tracer(object):
+    """Factory of spans which drops ended ones
+
+    Override finish() to export them.
+    """
+    def start(self, name, parent=None, attributes=None):
+        """Return a new open span."""
+        return Span(self, name, parent, attributes)
+
+    def finish(self, span):
+        """Called with each ended span."""
+
+
+class RecordingTracer(Tracer):
+    """Thread-safe tracer which keeps the last maxlen ended spans"""
+    def __init__(self, maxlen=10000):
+        super().__init__()
+        self.maxlen = maxlen
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def finish(self, span):
+        with self._lock:
+            self._spans.append(span)
+            del self._spans[:-self.maxlen]
+
+    def spans(self, name=None):
+        """Return the ended spans (of name unless it is None) in the
+        order of their starts.
+        """
+        with self._lock:
+            spans = list(self._spans)
+        if name is not None:
+            spans = [s for s in spans if s.name == name]
+        return sorted(spans, key=lambda s: (s.start, s.id))
+
+    def clear(self):
+        with self._lock:
+            del self._spans[:]
+
+    def format(self):
+        """Return the ended spans as an indented tree."""
+        spans = self.spans()
+        ids = {s.id for s in spans}
+        children = {}
+        for s in spans:
+            parent = s.parent_id if s.parent_id in ids else None
+            children.setdefault(parent, []).append(s)
+        lines = []
+
+        def walk(parent, depth):
+            for s in children.get(parent, []):
+                attributes = ''.join(' {0}={1!r}'.format(k, v)
+                                     for k, v in s.attributes.items())
+                lines.append('{0}{1} {2:.1f}ms{3}{4}'.format(
+                    '  ' * depth, s.name, s.duration * 1e3, attributes,
+                    '' if s.error is None else ' error={0!r}'.format(
+                        s.error)))
+                walk(s.id, depth + 1)
+        walk(None, 0)
+        return '\n'.join(lines)
+
+
+def current():
+    """Return the current span or None."""
+    return _current.get()
+
+
+def start(name, tracer=None, **attributes):
+    """Return a new span of name, a child of the current span, made by
+    tracer or else by the tracer of the current span.  NOOP is returned
+    if there are neither.
+    """
+    parent = _current.get()
+    if tracer is None:
+        if parent is None:
+            return NOOP
+        tracer = parent.tracer
+    return tracer.start(name, parent, attributes)
+
+
+def enabled(tracer=None):
+    """Return whether start() with tracer makes a span."""
+    return tracer is not None or _current.get() is not None
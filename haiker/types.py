@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import datetime
+import functools
+import re
 
 
 def list_of(type):
@@ -21,10 +23,23 @@ def none_or(type):
     return to_type
 
 
-def to_datetime(x):
-    """Convert a valid global date and time string
-    (e.g. '2010-01-02T03:04:05Z') to the datetime.datetime object.
-    """
+_DATETIME = re.compile('(\\d{4})-(\\d\\d)-(\\d\\d)'
+                       'T(\\d\\d):(\\d\\d):(\\d\\d)(?:\\.(\\d{1,6})\\d*)?'
+                       '(?:(Z)|([+-])(\\d\\d):?(\\d\\d))\\Z')
+_TIMEZONES = {}
+
+
+def _timezone(sign, hours, minutes):
+    key = (sign, hours, minutes)
+    tz = _TIMEZONES.get(key)
+    if tz is None:
+        offset = datetime.timedelta(hours=int(hours), minutes=int(minutes))
+        tz = datetime.timezone(-offset if sign == '-' else offset)
+        _TIMEZONES[key] = tz
+    return tz
+
+
+def _strptime(x):
     x = x.replace('Z', '+00:00').replace('T', ' ')
     x = x[:-3] + x[-2:]  # '...+XX:YY' -> '...+XXYY'
     try:
@@ -33,6 +48,110 @@ def to_datetime(x):
         return datetime.datetime.strptime(x, '%Y-%m-%d %H:%M:%S.%f%z')
 
 
+@functools.lru_cache(maxsize=256)
+def to_datetime(x):
+    """Convert a valid global date and time string
+    (e.g. '2010-01-02T03:04:05Z') to the datetime.datetime object.
+    Recent results are memoized since entries in a page
+    often share their timestamps.
+    """
+    m = _DATETIME.match(x)
+    if m is None:
+        return _strptime(x)
+    year, month, day, hour, minute, second, fraction, z = m.groups()[:8]
+    microsecond = 0 if fraction is None else int(fraction.ljust(6, '0'))
+    if z is None:
+        tz = _timezone(*m.groups()[8:])
+    else:
+        tz = datetime.timezone.utc
+    return datetime.datetime(int(year), int(month), int(day), int(hour),
+                             int(minute), int(second), microsecond, tz)
+
+
+def _getattr(self, name):
+    # Called only for an unset slot, i.e. an attribute of a lazy object
+    # which has not been accessed yet
+    parse = self._lazy_fields.get(name)
+    if parse is None:
+        raise AttributeError(name)
+    try:
+        d = object.__getattribute__(self, '_raw')
+    except AttributeError:
+        raise AttributeError(name) from None
+    try:
+        value = parse(d, self._store)
+    except KeyError:  # missing in the raw data
+        raise AttributeError(name) from None
+    setattr(self, name, value)
+    return value
+
+
+def from_datetime(d):
+    """Convert an aware datetime.datetime object back to a global date
+    and time string, which to_datetime() converts to an equal object.
+    """
+    s = d.isoformat()
+    return s[:-6] + 'Z' if s.endswith('+00:00') else s
+
+
+def _to_json(value):
+    if isinstance(value, datetime.datetime):
+        return from_datetime(value)
+    if isinstance(value, list):
+        return [_to_json(v) for v in value]
+    if hasattr(value, 'to_dict'):
+        return value.to_dict()
+    return value
+
+
+def _to_dict(self):
+    """Return the decoded JSON form of this object, from which
+    from_dict() creates an equivalent object.
+    """
+    return {name: _to_json(getattr(self, name)) for name in self._lazy_fields}
+
+
+def _from_dict(cls, d, **kwargs):
+    """Create an object from decoded JSON (same as the constructor)."""
+    return cls(d, **kwargs)
+
+
+def _restore(cls, values):
+    """Create an object of cls from the values of its fields in the
+    order of cls._lazy_fields without converting them again.
+    """
+    obj = cls.__new__(cls)
+    for name, value in zip(cls._lazy_fields, values):
+        setattr(obj, name, value)
+    return obj
+
+
+def _reduce(self):
+    return (_restore, (self.__class__,
+                       tuple(getattr(self, name)
+                             for name in self._lazy_fields)))
+
+
+def _user(d, lazy, store):
+    if store is None:
+        return User(d, lazy=lazy)
+    return store.user(d, lazy=lazy)
+
+
+def _target(d, lazy, store):
+    if d is None:
+        return None
+    if store is None:
+        return Target(d, lazy=lazy)
+    return store.target(d, lazy=lazy)
+
+
+def _replies(x, lazy, store):
+    if x is None:
+        return None
+    return [Status(d, lazy=lazy, store=store) for d in x]
+
+
 def _repr(self, *attrs):
     name = self.__class__.__name__
     body = ', '.join('{attr}={value!r}'.format(attr=a, value=getattr(self, a))
@@ -45,11 +164,40 @@ class Status(object):
     __slots__ = (
         'link', 'created_at', 'favorited', 'haiku_text', 'html', 'html_touch',
         'html_mobile', 'id', 'in_reply_to_status_id', 'in_reply_to_user_id',
-        'keyword', 'replies', 'source', 'target', 'text', 'user',
+        'keyword', 'replies', 'source', 'target', 'text', 'user', '_raw',
+        '_store',
     )
+    _lazy_fields = {
+        'link': lambda d, store: str(d['link']),
+        'created_at': lambda d, store: to_datetime(d['created_at']),
+        'favorited': lambda d, store: int(d['favorited']),
+        'haiku_text': lambda d, store: none_or(str)(d.get('haiku_text')),
+        'html': lambda d, store: none_or(str)(d.get('html')),
+        'html_touch': lambda d, store: none_or(str)(d.get('html_touch')),
+        'html_mobile': lambda d, store: none_or(str)(d.get('html_mobile')),
+        'id': lambda d, store: str(d['id']),
+        'in_reply_to_status_id':
+            lambda d, store: none_or(str)(d.get('in_reply_to_status_id')),
+        'in_reply_to_user_id':
+            lambda d, store: none_or(str)(d.get('in_reply_to_user_id')),
+        'keyword': lambda d, store: none_or(str)(d.get('keyword')),
+        'replies': lambda d, store: _replies(d.get('replies'), True, store),
+        'source': lambda d, store: str(d['source']),
+        'target': lambda d, store: _target(d.get('target'), True, store),
+        'text': lambda d, store: none_or(str)(d.get('text')),
+        'user': lambda d, store: _user(d['user'], True, store),
+    }
 
-    def __init__(self, d):
+    def __init__(self, d, *, lazy=False, store=None):
+        """If lazy is true, d is kept and each attribute is converted
+        on its first access.  If store (a haiker.store.EntityStore)
+        is given, users and targets are taken from it.
+        """
         super().__init__()
+        if lazy:
+            self._raw = d
+            self._store = store
+            return
         self.link = str(d['link'])
         self.created_at = to_datetime(d['created_at'])
         self.favorited = int(d['favorited'])
@@ -63,11 +211,16 @@ class Status(object):
         raw = d.get('in_reply_to_user_id')
         self.in_reply_to_user_id = none_or(str)(raw)
         self.keyword = none_or(str)(d.get('keyword'))
-        self.replies = none_or(list_of(Status))(d.get('replies'))
+        self.replies = _replies(d.get('replies'), False, store)
         self.source = str(d['source'])
-        self.target = none_or(Target)(d.get('target'))
+        self.target = _target(d.get('target'), False, store)
         self.text = none_or(str)(d.get('text'))
-        self.user = User(d['user'])
+        self.user = _user(d['user'], False, store)
+
+    __getattr__ = _getattr
+    __reduce__ = _reduce
+    to_dict = _to_dict
+    from_dict = classmethod(_from_dict)
 
     def __repr__(self):
         return _repr(self, 'link')
@@ -77,11 +230,23 @@ class User(object):
     """User object"""
     __slots__ = (
         'followers_count', 'name', 'id', 'profile_image_url', 'screen_name',
-        'url',
+        'url', '_raw',
     )
+    _store = None
+    _lazy_fields = {
+        'followers_count': lambda d, store: int(d['followers_count']),
+        'name': lambda d, store: str(d['name']),
+        'id': lambda d, store: str(d['id']),
+        'profile_image_url': lambda d, store: str(d['profile_image_url']),
+        'screen_name': lambda d, store: str(d['screen_name']),
+        'url': lambda d, store: str(d['url']),
+    }
 
-    def __init__(self, d):
+    def __init__(self, d, *, lazy=False):
         super().__init__()
+        if lazy:
+            self._raw = d
+            return
         self.followers_count = int(d['followers_count'])
         self.name = str(d['name'])
         self.id = str(d['id'])
@@ -89,6 +254,11 @@ class User(object):
         self.screen_name = str(d['screen_name'])
         self.url = str(d['url'])
 
+    __getattr__ = _getattr
+    __reduce__ = _reduce
+    to_dict = _to_dict
+    from_dict = classmethod(_from_dict)
+
     def __repr__(self):
         return _repr(self, 'id')
 
@@ -97,11 +267,25 @@ class Keyword(object):
     """Keyword object"""
     __slots__ = (
         'entry_count', 'followers_count', 'link', 'related_keywords', 'title',
-        'word', 'url_name',
+        'word', 'url_name', '_raw',
     )
+    _store = None
+    _lazy_fields = {
+        'entry_count': lambda d, store: int(d['entry_count']),
+        'followers_count': lambda d, store: int(d['followers_count']),
+        'link': lambda d, store: str(d['link']),
+        'related_keywords':
+            lambda d, store: none_or(list_of(str))(d.get('related_keywords')),
+        'title': lambda d, store: str(d['title']),
+        'word': lambda d, store: str(d['word']),
+        'url_name': lambda d, store: none_or(str)(d.get('url_name')),
+    }
 
-    def __init__(self, d):
+    def __init__(self, d, *, lazy=False):
         super().__init__()
+        if lazy:
+            self._raw = d
+            return
         self.entry_count = int(d['entry_count'])
         self.followers_count = int(d['followers_count'])
         self.link = str(d['link'])
@@ -111,19 +295,74 @@ class Keyword(object):
         self.word = str(d['word'])
         self.url_name = none_or(str)(d.get('url_name'))
 
+    __getattr__ = _getattr
+    __reduce__ = _reduce
+    to_dict = _to_dict
+    from_dict = classmethod(_from_dict)
+
     def __repr__(self):
         return _repr(self, 'word')
 
 
 class Target(object):
     """Target object"""
-    __slots__ = ('title', 'word', 'url_name',)
+    __slots__ = ('title', 'word', 'url_name', '_raw',)
+    _store = None
+    _lazy_fields = {
+        'title': lambda d, store: str(d['title']),
+        'word': lambda d, store: str(d['word']),
+        'url_name': lambda d, store: none_or(str)(d.get('url_name')),
+    }
 
-    def __init__(self, d):
+    def __init__(self, d, *, lazy=False):
         super().__init__()
+        if lazy:
+            self._raw = d
+            return
         self.title = str(d['title'])
         self.word = str(d['word'])
         self.url_name = none_or(str)(d.get('url_name'))
 
+    __getattr__ = _getattr
+    __reduce__ = _reduce
+    to_dict = _to_dict
+    from_dict = classmethod(_from_dict)
+
     def __repr__(self):
         return _repr(self, 'word')
+
+
+class Parser(object):
+    """Converters from decoded JSON to the objects of this module
+
+    If lazy is true, the objects are created in the lazy mode:
+    they keep the decoded JSON and convert each attribute on its
+    first access, so attributes never read cost nothing.
+
+    If store (a haiker.store.EntityStore) is given, User, Target and
+    Keyword objects are shared through it across responses.
+    """
+    def __init__(self, *, lazy=False, store=None):
+        super().__init__()
+        self.lazy = lazy
+        self.store = store
+
+    def status(self, d):
+        return Status(d, lazy=self.lazy, store=self.store)
+
+    def statuses(self, x):
+        return [Status(d, lazy=self.lazy, store=self.store) for d in x]
+
+    def user(self, d):
+        return _user(d, self.lazy, self.store)
+
+    def users(self, x):
+        return [_user(d, self.lazy, self.store) for d in x]
+
+    def keyword(self, d):
+        if self.store is None:
+            return Keyword(d, lazy=self.lazy)
+        return self.store.keyword(d, lazy=self.lazy)
+
+    def keywords(self, x):
+        return [self.keyword(d) for d in x]
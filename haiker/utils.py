@@ -1,8 +1,16 @@
 #!/usr/bin/env python3
 
-import collections
+import codecs
+import collections.abc
+import concurrent.futures
 import datetime
+import functools
+import json
+import re
+import threading
 import time
+import requests
+import requests.adapters
 from . import __version__
 
 
@@ -10,6 +18,26 @@ def user_agent(name='python-haiker', version=__version__):
     return '{name}/{version}'.format(name=name, version=version)
 
 
+def make_session(*, pool_connections=10, pool_maxsize=10, pool_block=False,
+                 keep_alive=True):
+    """Return a requests.Session with a tuned connection pool.
+
+    pool_connections is the number of per-host pools to cache,
+    pool_maxsize is the number of connections kept alive per host and
+    pool_block makes a request wait for a free connection instead of
+    opening a throwaway one when the pool for its host is exhausted.
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                            pool_maxsize=pool_maxsize,
+                                            pool_block=pool_block)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+    return session
+
+
 def removed_dict(dic, keys):
     """Create a copy of dic, remove keys and return it."""
     return {kw: dic[kw] for kw in dic if kw not in keys}
@@ -30,25 +58,186 @@ def strftime(d, format):
 def serialize(obj, *, charset='utf-8',
               datetime_format='%a, %d %B %Y %H:%M:%S GMT'):
     """Return a string expression of obj."""
-    if obj is None:
-        return None
-    if isinstance(obj, int):  # bool is a subclass of int
-        obj = str(int(obj))
-    if isinstance(obj, datetime.datetime):
-        obj = strftime(obj, datetime_format)
-    if isinstance(obj, str):
-        obj = obj.encode(charset)
-    if isinstance(obj, bytes):
-        return obj
-    if isinstance(obj, collections.Iterable):
-        return b','.join(b'' if d is None else serialize(d) for d in obj)
+    cls = obj.__class__
+    func = _serializers.get(cls)
+    if func is None:
+        func = _serializers[cls] = _serialize.dispatch(cls)
+    return func(obj, charset, datetime_format)
+
+
+_serializers = {}  # exact type: implementation of _serialize
+
+
+@functools.singledispatch
+def _serialize(obj, charset, datetime_format):
     raise TypeError('{0!r} is an unsupported type'.format(type(obj)))
 
 
+@_serialize.register(type(None))
+def _(obj, charset, datetime_format):
+    return None
+
+
+@_serialize.register(bytes)
+def _(obj, charset, datetime_format):
+    return obj
+
+
+@_serialize.register(str)
+def _(obj, charset, datetime_format):
+    return obj.encode(charset)
+
+
+@_serialize.register(int)  # bool is a subclass of int
+def _(obj, charset, datetime_format):
+    return str(int(obj)).encode(charset)
+
+
+@_serialize.register(datetime.datetime)
+def _(obj, charset, datetime_format):
+    return strftime(obj, datetime_format).encode(charset)
+
+
+@_serialize.register(collections.abc.Iterable)
+def _(obj, charset, datetime_format):
+    return b','.join(b'' if d is None else serialize(d) for d in obj)
+
+
 def build_params(params):
-    """Return a list of (key, serialized value) pairs from params."""
+    """Return a list of (key, serialized value) pairs from params.
+    Pairs whose value is None are omitted as requests does.
+    """
     if params is None:
         return None
-    if isinstance(params, collections.Mapping):
-        return [(key, serialize(params[key])) for key in params]
-    return [(key, serialize(value)) for key, value in params]
+    if isinstance(params, collections.abc.Mapping):
+        params = params.items()
+    return [(key, serialize(value)) for key, value in params
+            if value is not None]
+
+
+class JSONArrayParser(object):
+    """Incremental parser of a JSON array
+
+    Example:
+
+    >>> parser = JSONArrayParser()
+    >>> parser.feed('[{"a": 1}, {"b"')
+    [{'a': 1}]
+    >>> parser.feed(': 2}]')
+    [{'b': 2}]
+    >>> parser.close()
+    """
+    _decoder = json.JSONDecoder()
+    _space = re.compile('[ \\t\\n\\r]*')
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = ''
+        self._state = 'start'  # start, first, element, separator or end
+
+    def feed(self, text):
+        """Append text and return a list of the elements
+        completed by it.
+        """
+        buf = self._buffer + text
+        pos = 0
+        elements = []
+        while True:
+            pos = self._space.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if self._state == 'start':
+                if buf[pos] != '[':
+                    raise ValueError('JSON array is expected')
+                pos += 1
+                self._state = 'first'
+            elif self._state in {'first', 'separator'}:
+                if buf[pos] == ']':
+                    pos += 1
+                    self._state = 'end'
+                elif self._state == 'separator':
+                    if buf[pos] != ',':
+                        raise ValueError('"," or "]" is expected')
+                    pos += 1
+                    self._state = 'element'
+                else:
+                    self._state = 'element'
+            elif self._state == 'element':
+                try:
+                    obj, end = self._decoder.raw_decode(buf, pos)
+                except ValueError:
+                    break  # incomplete (or invalid) element
+                if end == len(buf) and buf[pos] not in '{["':
+                    break  # a number or a literal may continue
+                elements.append(obj)
+                pos = end
+                self._state = 'separator'
+            else:
+                raise ValueError('extra data after JSON array')
+        self._buffer = buf[pos:]
+        return elements
+
+    def close(self):
+        """Check that the whole array has been fed."""
+        if self._state == 'element' and self._buffer:
+            self._decoder.decode(self._buffer)  # raises the error
+        if self._state != 'end' or self._buffer.strip():
+            raise ValueError('JSON array is not terminated')
+
+
+def iter_json_array(chunks, charset='utf-8'):
+    """Yield elements of a JSON array from an iterable of
+    encoded chunks.
+    """
+    decoder = codecs.getincrementaldecoder(charset)()
+    parser = JSONArrayParser()
+    for chunk in chunks:
+        for obj in parser.feed(decoder.decode(chunk)):
+            yield obj
+    for obj in parser.feed(decoder.decode(b'', final=True)):
+        yield obj
+    parser.close()
+
+
+class SingleFlight(object):
+    """Coalescer of concurrent identical calls
+
+    While func is running for a key, other threads calling do() with
+    the same key wait for it and receive its result (or its exception)
+    instead of calling func again.
+    """
+    def __init__(self):
+        super().__init__()
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, func, timeout=None):
+        """Return func() or the result of the running call of key.
+        A waiter raises concurrent.futures.TimeoutError after timeout
+        seconds unless it is None.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = concurrent.futures.Future()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            return call.result(timeout)
+        try:
+            value = func()
+        except BaseException as e:
+            self._finish(key)
+            call.set_exception(e)
+            raise
+        self._finish(key)
+        call.set_result(value)
+        return value
+
+    def _finish(self, key):
+        with self._lock:
+            del self._calls[key]
@@ -6,8 +6,8 @@ import sys
 import setuptools
 
 
-if sys.version_info < (3, 2):
-    raise RuntimeError('Python 3.2 or greater is required')
+if sys.version_info < (3, 7):
+    raise RuntimeError('Python 3.7 or greater is required')
 
 
 def relative_path(path):
@@ -38,10 +38,15 @@ setuptools.setup(
     long_description=long_description(),
     license=from_init('__license__'),
     packages=['haiker'],
+    python_requires='>=3.7',
     install_requires=[
         'requests>=0',
         'requests-oauthlib>=0',
     ],
+    extras_require={
+        'async': ['aiohttp>=0'],
+        'fast': ['orjson>=0'],
+    },
     tests_require=[
         'responses>=0',
     ],
@@ -53,10 +58,11 @@ setuptools.setup(
         'Operating System :: OS Independent',
         'Programming Language :: Python',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.2',
-        'Programming Language :: Python :: 3.3',
-        'Programming Language :: Python :: 3.4',
-        'Programming Language :: Python :: 3.5',
+        'Programming Language :: Python :: 3.7',
+        'Programming Language :: Python :: 3.8',
+        'Programming Language :: Python :: 3.9',
+        'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
         'Programming Language :: Python :: 3 :: Only',
         'Topic :: Software Development :: Libraries',
     ],
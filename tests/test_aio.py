@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+import asyncio
+import functools
+import inspect
+import unittest
+import unittest.mock
+import haiker
+import haiker.cache
+import haiker.decoders
+import haiker.retry
+import haiker.tracing
+from . import samples
+from .test_api import check
+
+try:
+    import aiohttp.test_utils
+    import aiohttp.web
+    import haiker.aio
+except ImportError:
+    aiohttp = None
+
+
+def _responses():
+    statuses = 'public_timeline keyword_timeline user_timeline ' \
+               'friends_timeline album'.split()
+    bodies = {'/api/statuses/{0}'.format(s): [samples.STATUS]
+              for s in statuses}
+    bodies.update({
+        '/api/keywords/hot': [samples.KEYWORD],
+        '/api/keywords/list': [samples.KEYWORD],
+        '/api/statuses/keywords': [samples.KEYWORD],
+        '/api/statuses/friends': [samples.USER],
+        '/api/statuses/followers': [samples.USER],
+        '/api/friendships': samples.USER,
+        '/api/keywords': samples.KEYWORD,
+    })
+    return bodies
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestAsyncHaiker(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.requests = []
+        self.failures = 0
+        bodies = _responses()
+
+        async def handle(request):
+            self.requests.append(request)
+            if self.failures > 0:
+                self.failures -= 1
+                return aiohttp.web.Response(status=503)
+            if request.headers.get('If-None-Match') == '"v1"':
+                return aiohttp.web.Response(status=304)
+            headers = {'ETag': '"v1"'}
+            for prefix in sorted(bodies, key=len, reverse=True):
+                if request.path.startswith(prefix):
+                    return aiohttp.web.json_response(bodies[prefix],
+                                                     headers=headers)
+            return aiohttp.web.json_response(samples.STATUS,
+                                             headers=headers)
+
+        app = aiohttp.web.Application()
+        app.router.add_route('*', '/{tail:.*}', handle)
+        self.server = aiohttp.test_utils.TestServer(app, loop=self.loop)
+        self.wait(self.server.start_server())
+        self.root = str(self.server.make_url('/api'))
+
+    def tearDown(self):
+        self.wait(self.server.close())
+        self.loop.close()
+
+    def wait(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def check(self, api, name, **kwargs):
+        func = getattr(api, name)
+
+        async def to_list(iterator):
+            return [x async for x in iterator]
+
+        @functools.wraps(func)
+        def call(*args, **kwargs):
+            retval = func(*args, **kwargs)
+            if inspect.isasyncgen(retval):
+                retval = to_list(retval)
+            return self.wait(retval)
+        check(call, kwargs)
+
+    def test_all_methods(self):
+        api = haiker.aio.AsyncHaiker(root=self.root)
+        kwargs = {
+            'update_status': {'keyword': 'BOT', 'status': 'hello world',
+                              'in_reply_to_status_id': '123',
+                              'source': 'API', 'files': [b'A']},
+            'delete_status': {'author_url_name': 'me'},
+        }
+        names = [name for name in dir(haiker.Haiker)
+                 if not name.startswith(('_', 'iter_', 'stream_')) and
+                 name not in {'auth', 'close', 'session', 'observers'}]
+        for name in names:
+            self.check(api, name, **kwargs.get(name, {}))
+        self.wait(api.close())
+
+    def test_types(self):
+        async def main():
+            async with haiker.aio.AsyncHaiker(root=self.root) as api:
+                return await asyncio.gather(
+                    api.public_timeline(count=3),
+                    api.show_user('someone'),
+                    api.hot_keywords(),
+                )
+        statuses, user, keywords = self.wait(main())
+        self.assertIsInstance(statuses[0], haiker.types.Status)
+        self.assertIsInstance(user, haiker.types.User)
+        self.assertIsInstance(keywords[0], haiker.types.Keyword)
+        self.assertEqual(self.requests[0].query['count'], '3')
+
+    def test_iter(self):
+        async def main():
+            async with haiker.aio.AsyncHaiker(root=self.root) as api:
+                return [s async for s in api.iter_keyword_timeline(
+                    'BOT', limit=3)]
+        statuses = self.wait(main())
+        self.assertEqual(len(statuses), 3)
+        self.assertEqual([r.query['page'] for r in self.requests],
+                         ['1', '2', '3'])
+
+    def test_stream(self):
+        async def main():
+            async with haiker.aio.AsyncHaiker(root=self.root) as api:
+                it = api.stream_keyword_timeline('BOT', min_interval=0)
+                status = await it.__anext__()
+                await it.aclose()
+                return status
+        self.assertIsInstance(self.wait(main()), haiker.types.Status)
+        self.assertEqual(self.requests[0].query['count'], '100')
+
+    def test_cache(self):
+        async def main():
+            cache = haiker.cache.ResponseCache()
+            async with haiker.aio.AsyncHaiker(root=self.root,
+                                              cache=cache) as api:
+                return [await api.show_keyword('BOT') for _ in range(2)]
+        first, second = self.wait(main())
+        self.assertIs(first, second)
+        self.assertEqual(self.requests[1].headers['If-None-Match'], '"v1"')
+
+    def test_retry(self):
+        async def main():
+            policy = haiker.retry.RetryPolicy(backoff=0.01)
+            breaker = haiker.retry.CircuitBreaker(failure_threshold=3)
+            async with haiker.aio.AsyncHaiker(root=self.root, retry=policy,
+                                              circuit_breaker=breaker) as api:
+                self.failures = 2
+                status = await api.show_status('123')
+                self.failures = 4
+                with self.assertRaises(haiker.HaikerError):
+                    await api.show_status('123')
+                with self.assertRaises(haiker.HaikerError) as cm:
+                    await api.show_status('123')
+                return status, cm.exception
+        status, e = self.wait(main())
+        self.assertIsInstance(status, haiker.types.Status)
+        self.assertEqual(len(self.requests), 3 + 3)
+        self.assertIsInstance(e.causal_error, haiker.retry.CircuitOpenError)
+
+    def test_half_open_error(self):
+        async def main():
+            breaker = haiker.retry.CircuitBreaker(failure_threshold=1,
+                                                  reset_timeout=0)
+            async with haiker.aio.AsyncHaiker(root=self.root,
+                                              circuit_breaker=breaker) as api:
+                self.failures = 1
+                with self.assertRaises(haiker.HaikerError):
+                    await api.show_status('123')
+                enter = haiker.aio._Attempts._enter
+
+                async def broken(attempts):
+                    (await enter(attempts)).release()
+                    raise aiohttp.ClientPayloadError('truncated')
+                with unittest.mock.patch.object(haiker.aio._Attempts,
+                                                '_enter', broken):
+                    with self.assertRaises(haiker.HaikerError) as cm:
+                        await api.show_status('123')  # the trial call
+                self.assertIsInstance(cm.exception.causal_error,
+                                      aiohttp.ClientPayloadError)
+                self.assertEqual(breaker.state, 'half-open')
+                await api.show_status('123')
+                self.assertEqual(breaker.state, 'closed')
+        self.wait(main())
+
+    def test_observers(self):
+        records = []
+
+        async def main():
+            policy = haiker.retry.RetryPolicy(backoff=0.01)
+            async with haiker.aio.AsyncHaiker(
+                    root=self.root, retry=policy,
+                    observers=[records.append]) as api:
+                self.failures = 1
+                await api.show_status('123')
+                await api.update_status('BOT', 'hello')
+                return [s async for s in api.public_timeline(
+                    incremental=True)]
+        statuses = self.wait(main())
+        self.assertEqual(len(statuses), 1)
+        show, update, timeline = records
+        self.assertEqual(show.endpoint, 'show_status')
+        self.assertEqual((show.status, show.retries), (200, 1))
+        self.assertGreater(show.bytes_received, 0)
+        self.assertGreater(show.parse_time, 0)
+        self.assertEqual(update.method, 'POST')
+        self.assertGreater(update.bytes_sent, 0)
+        self.assertEqual(timeline.endpoint, 'public_timeline')
+        self.assertGreater(timeline.bytes_received, 0)
+        self.assertGreater(timeline.decode_time, 0)
+
+    def test_decoder(self):
+        payloads = []
+
+        def decode(payload):
+            payloads.append(payload)
+            return haiker.decoders.stdlib(payload)
+
+        async def main():
+            async with haiker.aio.AsyncHaiker(root=self.root,
+                                              decoder=decode) as api:
+                return await api.show_user('someone')
+        self.assertIsInstance(self.wait(main()), haiker.types.User)
+        self.assertEqual(len(payloads), 1)
+        self.assertIsInstance(payloads[0], bytes)
+
+    def test_tracer(self):
+        tracer = haiker.tracing.RecordingTracer()
+
+        async def main():
+            async with haiker.aio.AsyncHaiker(root=self.root,
+                                              tracer=tracer) as api:
+                await api.show_statuses(['1', '2'])
+                async for status in api.iter_keyword_timeline('BOT',
+                                                              limit=3):
+                    self.assertIsNone(haiker.tracing.current())
+        self.wait(main())
+        bulk, = tracer.spans('haiker.bulk')
+        paginate, = tracer.spans('haiker.paginate')
+        calls = tracer.spans('haiker.call')
+        self.assertEqual([c.parent_id for c in calls],
+                         [bulk.id] * 2 + [paginate.id] * 3)
+        children = [s.name for s in tracer.spans()
+                    if s.parent_id == calls[0].id]
+        self.assertEqual(children, ['haiker.network', 'haiker.receive',
+                                    'haiker.decode', 'haiker.parse'])
+
+    def test_single_flight(self):
+        async def main():
+            async with haiker.aio.AsyncHaiker(root=self.root) as api:
+                return await asyncio.gather(
+                    *[api.show_keyword('BOT') for _ in range(5)],
+                    api.show_keyword('Python'))
+        keywords = self.wait(main())
+        self.assertEqual(len(self.requests), 2)
+        self.assertTrue(all(k is keywords[0] for k in keywords[:5]))
+
+        async def timelines():
+            async with haiker.aio.AsyncHaiker(root=self.root) as api:
+                return await asyncio.gather(api.public_timeline(),
+                                            api.public_timeline())
+        a, b = self.wait(timelines())
+        self.assertEqual(len(self.requests), 3)
+        a.pop()
+        self.assertEqual(len(b), 1)
+
+    def test_auth(self):
+        auth = haiker.OAuth('MyConsumerKey', 'MyConsumerSecret',
+                            'MyAccessToken', 'MyAccessTokenSecret')
+        api = haiker.aio.AsyncHaiker(auth, root=self.root,
+                                     user_agent='TestUserAgent')
+        self.wait(api.update_status('BOT', 'hello world'))
+        self.wait(api.close())
+        request = self.requests[0]
+        self.assertTrue(request.headers['Authorization'].startswith('OAuth'))
+        self.assertEqual(request.headers['User-Agent'], 'TestUserAgent')
+
+    def test_error(self):
+        api = haiker.aio.AsyncHaiker(root=self.root)
+        with self.assertRaises(haiker.HaikerError) as cm:
+            self.wait(api.show_status('../malicious'))
+        self.assertIsInstance(cm.exception.causal_error, ValueError)
+        with self.assertRaises(TypeError):
+            with api:
+                pass
+        self.wait(api.close())
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 
+import concurrent.futures
 import datetime
 import inspect
 import itertools
+import json
 import re
 import sys
+import threading
+import time
 import unittest
+import unittest.mock
+import urllib.parse
 import requests
 import responses
 import haiker
+import haiker.store
 from . import samples
 
 
@@ -99,15 +106,21 @@ def check(func, kwargs=None):
         'body_formats': ['text', 'haiku'],
         'count': 1,
         'eid': '123',
+        'eids': ['123', '456', '123'],
+        'frame': True,
+        'incremental': True,
+        'max_workers': 2,
         'media': 'album',
         'page': 1,
         'since': datetime.datetime(2010, 1, 1, 0, 0, 0),
         'url_name': 'me',
+        'url_names': ['me', 'you'],
         'sort': 'hot',
         'without_related_keywords': True,
         'word': 'BOT',
         'word1': 'BOT1',
         'word2': 'BOT2',
+        'words': ['BOT1', 'BOT2'],
     }
     kwargs.update(d)
     required, optional = find_args(func, kwargs)
@@ -151,6 +164,88 @@ class TestBaseAPIHandler(unittest.TestCase):
             with self.assertRaises(ValueError):
                 self.api.get('/get/{0}.json'.format(s))
 
+    @responses.activate
+    def test_session(self):
+        url = 'http://h.hatena.ne.jp/api/get/method.json'
+        responses.add(responses.GET, url, json=samples.STATUS)
+        session = haiker.utils.make_session(pool_maxsize=2)
+        api = haiker.api.BaseAPIHandler(None, 'http://h.hatena.ne.jp/api/',
+                                        'TestUserAgent', session=session)
+        self.assertIs(api.session, session)
+        api.get('/get/method.json')
+        self.assertEqual(responses.calls[0].request.headers['User-Agent'],
+                         'TestUserAgent')
+        api.close()  # a shared session is left open
+        api.get('/get/method.json')
+
+    @responses.activate
+    def test_single_flight(self):
+        def callback(request):
+            time.sleep(0.2)  # while the other threads call get()
+            return 200, {}, json.dumps(samples.STATUS)
+        url = 'http://h.hatena.ne.jp/api/get/method.json'
+        responses.add_callback(responses.GET, url, callback=callback)
+
+        def call(api, params):
+            with concurrent.futures.ThreadPoolExecutor(4) as executor:
+                futures = [executor.submit(api.get, '/get/method.json', p)
+                           for p in params]
+                return [f.result() for f in futures]
+        results = call(self.api, [{'a': 1}] * 4)
+        self.assertEqual(len(responses.calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        call(self.api, [{'a': 1}, {'a': 2}])
+        self.assertEqual(len(responses.calls), 3)
+        api = haiker.api.BaseAPIHandler(None, 'http://h.hatena.ne.jp/api/',
+                                        'TestUserAgent', single_flight=False)
+        call(api, [{'a': 1}] * 4)
+        self.assertEqual(len(responses.calls), 7)
+
+    @responses.activate
+    def test_single_flight_own_lists(self):
+        def callback(request):
+            time.sleep(0.2)  # while the other threads call get()
+            return 200, {}, json.dumps([samples.STATUS] * 3)
+        url = 'http://h.hatena.ne.jp/api/get/method.json'
+        responses.add_callback(responses.GET, url, callback=callback)
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            futures = [executor.submit(self.api.get, '/get/method.json')
+                       for _ in range(2)]
+            a, b = [f.result() for f in futures]
+        self.assertEqual(len(responses.calls), 1)
+        self.assertIsNot(a, b)
+        a.pop()
+        self.assertEqual(len(b), 3)
+
+    @responses.activate
+    def test_single_flight_auth(self):
+        called = threading.Event()
+
+        def callback(request):
+            called.set()
+            time.sleep(0.2)  # while the other call is made
+            return 200, {}, json.dumps(request.headers['Authorization'])
+        url = 'http://h.hatena.ne.jp/api/get/method.json'
+        responses.add_callback(responses.GET, url, callback=callback)
+        self.api.auth = haiker.BasicAuth('alice', 'password')
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            first = executor.submit(self.api.get, '/get/method.json')
+            called.wait()
+            self.api.auth = haiker.BasicAuth('bob', 'password')
+            second = executor.submit(self.api.get, '/get/method.json')
+            self.assertNotEqual(first.result(), second.result())
+        self.assertEqual(len(responses.calls), 2)
+        identities = {haiker.auth.identity(haiker.OAuth('key', 'secret',
+                                                        token, 'secret'))
+                      for token in ['token1', 'token1', 'token2']}
+        self.assertEqual(len(identities), 2)
+
+    def test_close(self):
+        closed = []
+        with self.api as api:
+            api.session.close = lambda: closed.append(True)
+        self.assertEqual(closed, [True])
+
 
 class TestHaiker(unittest.TestCase):
     def setUp(self):
@@ -164,6 +259,38 @@ class TestHaiker(unittest.TestCase):
         api.auth = auth2
         self.assertIs(api.auth, auth2)
 
+    @responses.activate
+    def test_frame(self):
+        change([samples.STATUS] * 3)
+        for incremental in [False, True]:
+            f = self.api.keyword_timeline('BOT', frame=True,
+                                          incremental=incremental)
+            self.assertIsInstance(f, haiker.frame.StatusFrame)
+            self.assertEqual(f.count_by_user(), {'xxxx': 3})
+
+    @responses.activate
+    def test_lazy(self):
+        change([samples.STATUS])
+        api = haiker.Haiker(lazy=True)
+        status = api.public_timeline()[0]
+        self.assertEqual(status._raw, samples.STATUS)
+        self.assertEqual(status.user.id, 'xxxx')
+
+    @responses.activate
+    def test_store(self):
+        change([samples.STATUS] * 2)
+        api = haiker.Haiker(store=haiker.store.EntityStore())
+        a, b = api.public_timeline()
+        self.assertIs(a.user, b.user)
+        self.assertIs(api.public_timeline()[0].user, a.user)
+
+    def test_session(self):
+        session = haiker.utils.make_session()
+        with haiker.Haiker(session=session) as api:
+            self.assertIs(api.session, session)
+        with haiker.Haiker() as api:
+            self.assertIsNot(api.session, session)
+
     # Timeline APIs
     @responses.activate
     def test_public_timeline(self):
@@ -190,6 +317,19 @@ class TestHaiker(unittest.TestCase):
         change([samples.STATUS])
         check(self.api.album)
 
+    @responses.activate
+    def test_incremental(self):
+        change([samples.STATUS] * 3)
+        it = self.api.public_timeline(incremental=True)
+        for status in it:
+            self.assertIsInstance(status, haiker.types.Status)
+        self.assertEqual(len(list(self.api.album(incremental=True))), 3)
+        responses.reset()
+        url = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+        responses.add(responses.GET, url, body='[{"link": 1}, ')
+        with self.assertRaises(haiker.HaikerError):
+            list(self.api.user_timeline(incremental=True))
+
     # Entry and star APIs
     @responses.activate
     def test_update_status(self):
@@ -257,16 +397,56 @@ class TestHaiker(unittest.TestCase):
         change(samples.KEYWORD)
         check(self.api.dissociate_keywords)
 
+    # Bulk APIs
+    @responses.activate
+    def test_show_statuses(self):
+        change(samples.STATUS)
+        check(self.api.show_statuses)
+
+    @responses.activate
+    def test_show_users(self):
+        change(samples.USER)
+        check(self.api.show_users)
+
+    @responses.activate
+    def test_show_keywords(self):
+        change(samples.KEYWORD)
+        check(self.api.show_keywords)
+
+    @responses.activate
+    def test_bulk(self):
+        def callback(request):
+            eid = request.url.rsplit('/', 1)[1].split('.')[0]
+            if eid == 'bad':
+                return 404, {}, ''
+            return 200, {}, json.dumps(dict(samples.STATUS, id=eid))
+        url = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+        responses.add_callback(responses.GET, url, callback=callback)
+        eids = ['1', 'bad', '2', '1', '3']
+        results = self.api.show_statuses(eids, max_workers=3)
+        self.assertEqual(len(responses.calls), 4)
+        self.assertEqual([r.id for r in results if
+                          isinstance(r, haiker.types.Status)],
+                         ['1', '2', '1', '3'])
+        self.assertIsInstance(results[1], haiker.HaikerError)
+        self.assertIs(results[0], results[3])
+
     # Favorite APIs
     @responses.activate
     def test_friends(self):
         change([samples.USER])
         check(self.api.friends)
+        result = self.api.friends('me')
+        self.assertIsInstance(result, list)
+        self.assertIsInstance(result[0], haiker.types.User)
 
     @responses.activate
     def test_followers(self):
         change([samples.USER])
         check(self.api.followers)
+        result = self.api.followers('me')
+        self.assertIsInstance(result, list)
+        self.assertIsInstance(result[0], haiker.types.User)
 
     @responses.activate
     def test_follow_user(self):
@@ -282,6 +462,9 @@ class TestHaiker(unittest.TestCase):
     def test_favorite_keywords(self):
         change([samples.KEYWORD])
         check(self.api.favorite_keywords)
+        result = self.api.favorite_keywords('me')
+        self.assertIsInstance(result, list)
+        self.assertIsInstance(result[0], haiker.types.Keyword)
 
     @responses.activate
     def test_follow_keyword(self):
@@ -292,3 +475,176 @@ class TestHaiker(unittest.TestCase):
     def test_unfollow_keyword(self):
         change(samples.KEYWORD)
         check(self.api.unfollow_keyword)
+
+
+def paged(n_pages, per_page, sample=samples.STATUS):
+    """Serve n_pages pages of per_page elements for any GET API and
+    return the list of requested page numbers.
+    """
+    requested = []
+
+    def callback(request):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(request.url).query)
+        page = int(query['page'][0])
+        requested.append(page)
+        body = [sample] * per_page if page <= n_pages else []
+        return 200, {}, json.dumps(body)
+    url = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+    responses.add_callback(responses.GET, url, callback=callback,
+                           content_type='application/json')
+    return requested
+
+
+class TestPagination(unittest.TestCase):
+    def setUp(self):
+        self.api = haiker.Haiker()
+
+    @responses.activate
+    def test_all_pages(self):
+        for prefetch in [True, False]:
+            responses.reset()
+            requested = paged(3, 2)
+            it = self.api.iter_public_timeline(prefetch=prefetch)
+            self.assertEqual(len(list(it)), 6)
+            self.assertEqual(requested, [1, 2, 3, 4])
+
+    @responses.activate
+    def test_short_page(self):
+        requested = paged(3, 2)
+        statuses = list(self.api.iter_keyword_timeline('BOT', count=5))
+        self.assertEqual(len(statuses), 2)
+        self.assertEqual(requested, [1])
+
+    @responses.activate
+    def test_limit(self):
+        requested = paged(10, 2)
+        it = self.api.iter_user_timeline('me', page=3, limit=3)
+        self.assertEqual(len(list(it)), 3)
+        self.assertEqual(requested, [3, 4])
+        self.assertEqual(list(self.api.iter_album(limit=0)), [])
+
+    @responses.activate
+    def test_types(self):
+        paged(2, 1)
+        for status in self.api.iter_friends_timeline('me'):
+            self.assertIsInstance(status, haiker.types.Status)
+        responses.reset()
+        paged(2, 1, samples.KEYWORD)
+        for keyword in self.api.iter_keyword_list(word='BOT'):
+            self.assertIsInstance(keyword, haiker.types.Keyword)
+
+    @responses.activate
+    def test_error(self):
+        url = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+        responses.add(responses.GET, url, status=500)
+        it = self.api.iter_public_timeline()
+        with self.assertRaises(haiker.HaikerError) as cm:
+            next(it)
+        self.assertIsInstance(cm.exception.causal_error, requests.HTTPError)
+
+
+class FakeTimeline(object):
+    """Timeline API serving posted statuses newest first"""
+    def __init__(self):
+        self.posted = []
+        self.requests = []
+        self.clock = 1262401445  # 2010-01-02T03:04:05Z
+
+    def post(self, n, seconds=1):
+        for _ in range(n):
+            self.clock += seconds
+            created_at = datetime.datetime.fromtimestamp(
+                self.clock, datetime.timezone.utc)
+            self.posted.append(dict(
+                samples.STATUS, id=str(len(self.posted)),
+                created_at=created_at.strftime('%Y-%m-%dT%H:%M:%SZ')))
+
+    def __call__(self, request):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(request.url).query)
+        page, count = int(query['page'][0]), int(query['count'][0])
+        self.requests.append((page, query.get('since', [None])[0]))
+        statuses = self.posted[::-1]
+        if 'since' in query:
+            since = datetime.datetime.strptime(query['since'][0],
+                                               '%a, %d %B %Y %H:%M:%S GMT')
+            statuses = [s for s in statuses
+                        if s['created_at'] >= since.isoformat() + 'Z']
+        body = statuses[(page - 1) * count:page * count]
+        return 200, {}, json.dumps(body)
+
+
+class TestStream(unittest.TestCase):
+    def setUp(self):
+        self.api = haiker.Haiker()
+        self.timeline = FakeTimeline()
+        url = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+        responses.add_callback(responses.GET, url, callback=self.timeline,
+                               content_type='application/json')
+        self.sleeps = []
+        patcher = unittest.mock.patch('time.sleep', self.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.posts = []  # numbers of statuses posted before each poll
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        if self.posts:
+            self.timeline.post(self.posts.pop(0))
+
+    def take(self, it, n):
+        return [s.id for s in itertools.islice(it, n)]
+
+    @responses.activate
+    def test_stream(self):
+        self.timeline.post(3)
+        self.posts = [0, 5, 12]
+        it = self.api.stream_keyword_timeline('BOT', count=4, min_interval=1,
+                                              max_interval=60)
+        # no duplicates across polls and pages, oldest first
+        self.assertEqual(self.take(it, 20), [str(i) for i in range(20)])
+        requests = self.timeline.requests
+        self.assertEqual(requests[0], (1, None))
+        self.assertTrue(all(since is not None for _, since in requests[1:]))
+        # all the pages of 12 new statuses in the last poll
+        self.assertEqual([page for page, _ in requests[-4:]], [1, 2, 3, 4])
+
+    @responses.activate
+    def test_first_poll(self):
+        self.timeline.post(10)
+        it = self.api.stream_public_timeline(count=4)
+        # only the newest page, not the backlog
+        self.assertEqual(self.take(it, 4), ['6', '7', '8', '9'])
+        self.assertEqual(self.timeline.requests, [(1, None)])
+
+    @responses.activate
+    def test_interval(self):
+        self.timeline.post(1)
+        self.posts = [0, 0, 0, 0, 0, 0, 0, 0, 100, 1]
+        it = self.api.stream_public_timeline(count=10, min_interval=1,
+                                             max_interval=16)
+        self.take(it, 102)
+        # backs off while quiet and polls fast while busy
+        self.assertEqual(self.sleeps[:6], [1, 2, 4, 8, 16, 16])
+        self.assertEqual(self.sleeps[-1], 1)
+
+    @responses.activate
+    def test_backlog(self):
+        self.timeline.post(30)
+        self.posts = [0, 0, 0, 2]
+        since = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+        it = self.api.stream_public_timeline(since=since, count=4,
+                                             min_interval=1, max_pages=3)
+        # more than max_pages full pages, none missed and oldest first
+        self.assertEqual(self.take(it, 32), [str(i) for i in range(32)])
+        pages = [page for page, _ in self.timeline.requests]
+        self.assertEqual(pages[:9], [1, 2, 3, 4, 5, 6, 7, 8, 1])
+        self.assertEqual(self.sleeps[:2], [1, 1])
+
+    @responses.activate
+    def test_since(self):
+        self.timeline.post(5)
+        since = datetime.datetime(2010, 1, 2, 3, 4, 8,
+                                  tzinfo=datetime.timezone.utc)
+        it = self.api.stream_user_timeline('me', since=since)
+        # created at or after since
+        self.assertEqual(self.take(it, 3), ['2', '3', '4'])
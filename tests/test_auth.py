@@ -50,6 +50,16 @@ class TestOAuth(unittest.TestCase):
         auth.verify('verifier')
         check(auth)
 
+    @responses.activate
+    def test_oauth_session(self):
+        responses.add(responses.POST, URL_INITIATE, body=BODY_INITIATE)
+        session = haiker.utils.make_session()
+        auth = haiker.OAuth('MyConsumerKey', 'MyConsumerSecret',
+                            session=session)
+        self.assertIs(auth.session, session)
+        token = auth.initiate(['read_public', 'write_public'])
+        self.assertEqual(token, ('OAuthToken', 'OAuthTokenSecret'))
+
     def _check_403(self, func, *args, **kwargs):
         with self.assertRaises(haiker.HaikerError) as cm:
             func(*args, **kwargs)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import json
+import os
+import tempfile
+import time
+import unittest
+import unittest.mock
+import responses
+import haiker
+import haiker.cache
+from . import samples
+
+
+URL = 'http://h.hatena.ne.jp/api/keywords/hot.json'
+
+
+class TestResponseCache(unittest.TestCase):
+    def test_ttl_for(self):
+        cache = haiker.cache.ResponseCache(ttl=1, ttls={'/a': 2, '/a/b': 3})
+        self.assertEqual(cache.ttl_for('/a/b/c.json'), 3)
+        self.assertEqual(cache.ttl_for('/a/c.json'), 2)
+        self.assertEqual(cache.ttl_for('/c.json'), 1)
+
+    def test_store(self):
+        cache = haiker.cache.ResponseCache(maxsize=2)
+        keys = [cache.key('/{0}.json'.format(i), {'a': i}) for i in range(3)]
+        self.assertEqual(cache.store(keys[0], None, None, 'x'), 'x')
+        self.assertEqual(len(cache), 0)  # neither reusable nor validatable
+        for key in keys:
+            cache.store(key, '"etag"', None, key)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.lookup(keys[0]))
+        entry = cache.lookup(keys[1])
+        self.assertFalse(cache.is_fresh(entry))
+        self.assertEqual(cache.validators(entry),
+                         {'If-None-Match': '"etag"'})
+        self.assertEqual(cache.validators(None), {})
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_key(self):
+        f = haiker.cache.ResponseCache.key
+        self.assertEqual(f('/a.json', {'b': True}), f('/a.json', {'b': 1}))
+        self.assertNotEqual(f('/a.json'), f('/a.json', {'b': 1}))
+        self.assertNotEqual(f('/a.json', None, len), f('/a.json'))
+
+
+class TestCachedGet(unittest.TestCase):
+    @responses.activate
+    def test_conditional(self):
+        headers = {'ETag': '"v1"', 'Last-Modified': 'Sat, 01 Jan 2000'}
+        responses.add(responses.GET, URL, json=[samples.KEYWORD],
+                      headers=headers)
+        responses.add(responses.GET, URL, status=304)
+        api = haiker.Haiker(cache=haiker.cache.ResponseCache())
+        first = api.hot_keywords()
+        self.assertIs(api.hot_keywords()[0], first[0])
+        request = responses.calls[1].request
+        self.assertEqual(request.headers['If-None-Match'], '"v1"')
+        self.assertEqual(request.headers['If-Modified-Since'],
+                         'Sat, 01 Jan 2000')
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_ttl(self):
+        responses.add(responses.GET, URL, json=[samples.KEYWORD])
+        cache = haiker.cache.ResponseCache(ttls={'/keywords/hot': 60})
+        api = haiker.Haiker(cache=cache)
+        first = api.hot_keywords()
+        self.assertIs(api.hot_keywords()[0], first[0])
+        self.assertEqual(len(responses.calls), 1)
+        self.assertIsNot(api.hot_keywords(without_related_keywords=True)[0],
+                         first[0])
+        self.assertEqual(len(responses.calls), 2)
+        with unittest.mock.patch('time.monotonic', return_value=1e12):
+            self.assertIsNot(api.hot_keywords()[0], first[0])
+        self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    def test_auth(self):
+        def callback(request):
+            name = request.headers['Authorization'].split()[1]
+            return 200, {}, json.dumps(dict(samples.USER, id=name))
+        url = 'http://h.hatena.ne.jp/api/friendships/show.json'
+        responses.add_callback(responses.GET, url, callback=callback)
+        cache = haiker.cache.ResponseCache(ttls={'/friendships/show': 300})
+        api = haiker.Haiker(haiker.BasicAuth('alice', 'password'),
+                            cache=cache)
+        alice = api.show_user()
+        self.assertIs(api.show_user(), alice)
+        api.auth = haiker.BasicAuth('bob', 'password')
+        self.assertNotEqual(api.show_user().id, alice.id)
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_modified(self):
+        responses.add(responses.GET, URL, json=[samples.KEYWORD],
+                      headers={'ETag': '"v1"'})
+        responses.add(responses.GET, URL, json=[samples.KEYWORD] * 2,
+                      headers={'ETag': '"v2"'})
+        api = haiker.Haiker(cache=haiker.cache.ResponseCache())
+        self.assertEqual(len(api.hot_keywords()), 1)
+        self.assertEqual(len(api.hot_keywords()), 2)
+        self.assertEqual(responses.calls[1].request.headers['If-None-Match'],
+                         '"v1"')
+
+
+class TestDiskCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, 'cache.sqlite3')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_get_put(self):
+        cache = haiker.cache.DiskCache(self.filename)
+        key = cache.key('/keywords/show.json', {'word': 'BOT'})
+        self.assertEqual(key, '/keywords/show.json?word=BOT')
+        self.assertIsNone(cache.get(key))
+        cache.put(key, b'{"a": 1}' * 100)
+        self.assertEqual(cache.get(key), b'{"a": 1}' * 100)
+        # shared by another connection
+        other = haiker.cache.DiskCache(self.filename)
+        self.assertEqual(other.get(key), b'{"a": 1}' * 100)
+        other.clear()
+        self.assertIsNone(cache.get(key))
+        cache.close()
+        other.close()
+
+    def test_ttl(self):
+        cache = haiker.cache.DiskCache(self.filename, ttl=10,
+                                       ttls={'/statuses/show': 0})
+        cache.put('/statuses/show/1.json', b'x')
+        self.assertIsNone(cache.get('/statuses/show/1.json'))
+        cache.put('/keywords/show.json', b'x')
+        now = time.time()
+        with unittest.mock.patch('time.time', return_value=now + 11):
+            self.assertIsNone(cache.get('/keywords/show.json'))
+        cache.close()
+
+    def test_eviction(self):
+        payload = os.urandom(1000)  # incompressible
+        cache = haiker.cache.DiskCache(self.filename, max_bytes=3500)
+        now = time.time()
+        for i in range(4):
+            with unittest.mock.patch('time.time', return_value=now + i):
+                cache.put('/{0}.json'.format(i), payload)
+                if i == 2:
+                    cache.get('/0.json')
+        self.assertIsNone(cache.get('/1.json'))
+        for i in [0, 2, 3]:
+            self.assertEqual(cache.get('/{0}.json'.format(i)), payload)
+        cache.close()
+
+    def test_total(self):
+        def check(cache):
+            db = cache._connect()
+            total, = db.execute('SELECT size FROM total').fetchone()
+            expected, = db.execute('SELECT COALESCE(SUM(size), 0) '
+                                   'FROM responses').fetchone()
+            self.assertEqual(total, expected)
+            return total
+        cache = haiker.cache.DiskCache(self.filename, max_bytes=3500)
+        for i in range(6):
+            cache.put('/{0}.json'.format(i % 4), os.urandom(1000 + i))
+            check(cache)
+        self.assertLessEqual(check(cache), 3500)
+        cache.put('/0.json', b'x')  # replaced
+        check(cache)
+        with cache._connect() as db:  # made by an older version
+            db.execute('DROP TABLE total')
+        other = haiker.cache.DiskCache(self.filename, max_bytes=3500)
+        self.assertGreater(check(other), 0)
+        other.clear()
+        self.assertEqual(check(cache), 0)
+        cache.close()
+        other.close()
+
+    def test_threads(self):
+        cache = haiker.cache.DiskCache(self.filename, max_bytes=10000)
+
+        def work(n):
+            for i in range(50):
+                key = '/{0}/{1}.json'.format(n, i % 7)
+                cache.put(key, key.encode('ascii'))
+                value = cache.get(key)
+                self.assertIn(value, [None, key.encode('ascii')])
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            list(executor.map(work, range(8)))
+
+    @responses.activate
+    def test_haiker(self):
+        responses.add(responses.GET,
+                      'http://h.hatena.ne.jp/api/keywords/show.json',
+                      json=samples.KEYWORD)
+        responses.add(responses.GET,
+                      'http://h.hatena.ne.jp/api/friendships/show.json',
+                      json=samples.USER)
+        for _ in range(2):
+            api = haiker.Haiker(
+                disk_cache=haiker.cache.DiskCache(self.filename))
+            self.assertEqual(api.show_keyword('BOT').word, 'Word')
+            api.show_user()  # not persistent
+        self.assertEqual(len(responses.calls), 3)
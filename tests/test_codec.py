@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import datetime
+import unittest
+import haiker
+import haiker.codec
+import haiker.store
+from . import samples
+
+
+class TestCodec(unittest.TestCase):
+    def round_trip(self, obj):
+        data = haiker.codec.dumps(obj)
+        self.assertTrue(data.startswith(b'HKR\x01'))
+        return haiker.codec.loads(data)
+
+    def test_types(self):
+        classes = [
+            (haiker.types.Status, samples.STATUS),
+            (haiker.types.User, samples.USER),
+            (haiker.types.Keyword, samples.KEYWORD),
+            (haiker.types.Target, samples.TARGET),
+        ]
+        for cls, d in classes:
+            for lazy in [False, True]:
+                obj = cls(d, lazy=lazy)
+                restored = self.round_trip(obj)
+                self.assertIsInstance(restored, cls)
+                self.assertEqual(restored.to_dict(), obj.to_dict())
+
+    def test_values(self):
+        tz = datetime.timezone(-datetime.timedelta(hours=3, minutes=30))
+        values = [None, True, False, 0, -1, 2 ** 70, -2 ** 70, '', 'abc',
+                  'あ' * 100, [], [[1, 'abc'], 'abc'],
+                  datetime.datetime(2010, 1, 2, 3, 4, 5, 678,
+                                    tzinfo=datetime.timezone.utc),
+                  datetime.datetime(1960, 1, 2, 3, 4, 5, tzinfo=tz)]
+        for value in values:
+            restored = self.round_trip(value)
+            self.assertEqual(restored, value)
+            self.assertEqual(type(restored), type(value))
+            if isinstance(value, datetime.datetime):
+                self.assertEqual(restored.utcoffset(), value.utcoffset())
+        self.assertRaises(ValueError, haiker.codec.dumps,
+                          datetime.datetime(2010, 1, 2))
+        self.assertRaises(TypeError, haiker.codec.dumps, 1.5)
+
+    def test_sharing(self):
+        parser = haiker.types.Parser(store=haiker.store.EntityStore())
+        statuses = parser.statuses([dict(samples.STATUS, id=str(i))
+                                    for i in range(50)])
+        data = haiker.codec.dumps(statuses)
+        restored = haiker.codec.loads(data)
+        self.assertEqual([s.id for s in restored], [str(i) for i in range(50)])
+        self.assertIs(restored[0].user, restored[1].user)
+        single = haiker.codec.dumps(statuses[0])
+        # less than a quarter of 50 separate statuses
+        self.assertLess(len(data), len(single) * 50 / 4)
+
+    def test_errors(self):
+        data = haiker.codec.dumps(haiker.types.User(samples.USER))
+        for broken in [b'', b'JSON', b'HKR\x02' + data[4:], data[:-1],
+                       data + b'\x00', data[:4] + b'\xff']:
+            with self.assertRaises(ValueError):
+                haiker.codec.loads(broken)
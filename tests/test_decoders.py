@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import re
+import tempfile
+import unittest
+import responses
+import haiker
+import haiker.cache
+import haiker.decoders
+from . import samples
+
+
+URL = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+
+PAYLOADS = [
+    [samples.STATUS] * 3,
+    samples.USER,
+    [samples.KEYWORD],
+    [],
+    {},
+    {'text': 'ハイク 俳句 \U0001f338', 'escaped': '\\"\n\t\u00e9\u3042'},
+    {'numbers': [0, -1, 2 ** 53, 1.5, -2.25e-10, 1e300]},
+    {'literals': [True, False, None], 'nested': [[[{'a': [{}]}]]]},
+]
+
+
+class TestDecoders(unittest.TestCase):
+    def test_parity(self):
+        for obj in PAYLOADS:
+            for payload in [json.dumps(obj).encode('utf-8'),
+                            json.dumps(obj, ensure_ascii=False,
+                                       indent=2).encode('utf-8')]:
+                expected = json.loads(payload.decode('utf-8'))
+                for name, decode in haiker.decoders.DECODERS.items():
+                    self.assertEqual(decode(payload), expected, name)
+
+    def test_invalid(self):
+        for payload in [b'', b'[1,', b'{"a": 1} x', b'{\'a\': 1}',
+                        b'"\xff"']:
+            for name, decode in haiker.decoders.DECODERS.items():
+                with self.assertRaises(ValueError, msg=name):
+                    decode(payload)
+
+    def test_get(self):
+        self.assertIs(haiker.decoders.get('json'), haiker.decoders.stdlib)
+        self.assertIs(haiker.decoders.get('auto'),
+                      haiker.decoders.default())
+        with self.assertRaises(ValueError):
+            haiker.decoders.get('unknown')
+
+    @unittest.skipIf(haiker.decoders.orjson is None,
+                     'orjson is not installed')
+    def test_orjson(self):
+        self.assertIs(haiker.decoders.default(),
+                      haiker.decoders.orjson.loads)
+
+    @responses.activate
+    def test_handler(self):
+        payloads = []
+
+        def decode(payload):
+            payloads.append(payload)
+            return haiker.decoders.stdlib(payload)
+        body = json.dumps(samples.STATUS)
+        responses.add(responses.GET, URL, body=body)
+        api = haiker.Haiker(decoder=decode)
+        status = api.show_status('XXXX')
+        self.assertEqual(status.id, samples.STATUS['id'])
+        api._handler.cache = haiker.cache.ResponseCache()
+        api.show_status('XXXX')
+        with tempfile.TemporaryDirectory() as d:
+            api._handler.disk_cache = haiker.cache.DiskCache(
+                os.path.join(d, 'cache.sqlite3'))
+            api.show_status('XXXX')
+            api.show_status('XXXX')  # from the disk
+        self.assertEqual(payloads, [body.encode('utf-8')] * 4)
+        self.assertIs(haiker.Haiker()._handler.decoder,
+                      haiker.decoders.default())
+
+    @responses.activate
+    def test_invalid_response(self):
+        responses.add(responses.GET, URL, body='<html>')
+        for name in haiker.decoders.DECODERS:
+            api = haiker.Haiker(decoder=haiker.decoders.get(name))
+            with self.assertRaises(haiker.HaikerError) as cm:
+                api.hot_keywords()
+            self.assertIsInstance(cm.exception.causal_error, ValueError)
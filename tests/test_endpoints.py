@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import inspect
+import re
+import unittest
+import unittest.mock
+import urllib.parse
+import responses
+import haiker
+import haiker.endpoints
+from . import samples
+
+
+class TestEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.api = haiker.Haiker(single_flight=False)
+
+    def test_methods(self):
+        for e in haiker.endpoints.ENDPOINTS:
+            method = getattr(haiker.Haiker, e.name)
+            self.assertEqual(method.__qualname__, 'Haiker.' + e.name)
+            self.assertEqual(method.__module__, 'haiker.api')
+        self.assertEqual(haiker.Haiker.show_status.__doc__, 'statuses/show')
+        self.assertEqual(haiker.Haiker.user_timeline.__doc__,
+                         'statuses/user_timeline')
+        self.assertEqual(haiker.Haiker.associate_keywords.__doc__,
+                         'keywords/relation/create')
+
+    def test_signatures(self):
+        expected = {
+            'public_timeline': '(self, *, body_formats=None, count=None, '
+            'page=None, since=None, incremental=False, frame=False)',
+            'user_timeline': '(self, url_name=None, *, body_formats=None, '
+            'count=None, page=None, since=None, media=None, sort=None, '
+            'incremental=False, frame=False)',
+            'update_status': '(self, keyword, status, *, '
+            'in_reply_to_status_id=None, source=None, files=None, '
+            'body_formats=None)',
+            'delete_status': '(self, eid, author_url_name, *, '
+            'body_formats=None)',
+            'show_user': '(self, url_name=None)',
+            'follow_user': '(self, url_name)',
+            'keyword_list': '(self, *, page=None, '
+            'without_related_keywords=None, word=None)',
+        }
+        for name, signature in expected.items():
+            method = getattr(haiker.Haiker, name)
+            self.assertEqual(str(inspect.signature(method)), signature)
+
+    @responses.activate
+    def test_requests(self):
+        url = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+        responses.add(responses.GET, url, json=[samples.STATUS])
+        responses.add(responses.POST, url, json=samples.STATUS)
+        self.api.user_timeline('me', count=2, body_formats=['haiku', 'html'])
+        self.api.user_timeline()
+        self.api.delete_status('123', 'me')
+        self.api.update_status('BOT', 'hello', source='API')
+        split = [urllib.parse.urlsplit(c.request.url)
+                 for c in responses.calls]
+        self.assertEqual(split[0].path, '/api/statuses/user_timeline/me.json')
+        self.assertEqual(urllib.parse.parse_qsl(split[0].query),
+                         [('body_formats', 'haiku,html'), ('count', '2')])
+        self.assertEqual(split[1].path, '/api/statuses/user_timeline.json')
+        self.assertEqual(split[1].query, '')
+        self.assertEqual(split[2].path, '/api/statuses/destroy/123.json')
+        self.assertEqual(split[2].query, 'author_url_name=me')
+        self.assertEqual(split[3].query, '')
+        body = responses.calls[3].request.body
+        self.assertEqual(urllib.parse.parse_qsl(body),
+                         [('keyword', 'BOT'), ('status', 'hello'),
+                          ('source', 'API')])
+
+    def test_persistent(self):
+        with unittest.mock.patch.object(self.api._handler, 'get') as get:
+            self.api.show_user()
+            self.assertFalse(get.call_args[1]['persistent'])
+            self.api.show_user('me')
+            self.assertTrue(get.call_args[1]['persistent'])
+            self.api.show_status('123')
+            self.assertTrue(get.call_args[1]['persistent'])
+            self.api.hot_keywords()
+            self.assertNotIn('persistent', get.call_args[1])
+
+    def test_segment(self):
+        f = haiker.endpoints.segment
+        self.assertEqual(f('Th1s-1S_s4F3.x'), 'Th1s-1S_s4F3.x')
+        self.assertEqual(f(123), '123')
+        for s in ['', '..', 'a/b', '../me', 'Ａ', '# ', 'a\n']:
+            self.assertRaises(ValueError, f, s)
+        with self.assertRaises(haiker.HaikerError) as cm:
+            self.api.show_status('a/b')
+        self.assertIsInstance(cm.exception.causal_error, ValueError)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import contextlib
+import gzip
+import io
+import json
+import os
+import re
+import tempfile
+import unittest
+import unittest.mock
+import urllib.parse
+import responses
+import haiker
+import haiker.__main__
+import haiker.export
+import haiker.types
+from . import samples
+
+
+URL = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+
+
+class Timeline(object):
+    """Serve n statuses newest first, failing on the pages in fail"""
+    def __init__(self, n):
+        self.statuses = [dict(samples.STATUS, id=str(i))
+                         for i in reversed(range(n))]
+        self.fail = set()
+        self.requests = []
+
+    def __call__(self, request):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(request.url).query)
+        page, count = int(query['page'][0]), int(query['count'][0])
+        self.requests.append((urllib.parse.urlsplit(request.url).path, page))
+        if page in self.fail:
+            return 500, {}, ''
+        body = self.statuses[(page - 1) * count:page * count]
+        return 200, {}, json.dumps(body)
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.timeline = Timeline(23)
+        responses.add_callback(responses.GET, URL, callback=self.timeline,
+                               content_type='application/json')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, 'BOT.jsonl.gz')
+        self.api = haiker.Haiker()
+
+    def read(self):
+        with gzip.open(self.filename, 'rt', encoding='utf-8') as f:
+            return [json.loads(line)['id'] for line in f]
+
+    @responses.activate
+    def test_export(self):
+        pages = []
+        n = haiker.export.export(self.api, 'keyword', 'BOT', self.filename,
+                                 count=5, workers=3,
+                                 progress=lambda *args: pages.append(args))
+        self.assertEqual(n, 23)
+        self.assertEqual(self.read(), [str(i) for i in reversed(range(23))])
+        self.assertEqual(pages[-1], (5, 23))
+        self.assertFalse(os.path.exists(self.filename + '.checkpoint'))
+        path, page = self.timeline.requests[0]
+        self.assertEqual(path, '/api/statuses/keyword_timeline.json')
+        with gzip.open(self.filename, 'rt', encoding='utf-8') as f:
+            status = haiker.types.Status.from_dict(json.loads(next(f)))
+        self.assertEqual(status.text, samples.STATUS['text'])
+
+    @responses.activate
+    def test_resume(self):
+        self.timeline.fail = {4}
+        with self.assertRaises(haiker.HaikerError):
+            haiker.export.export(self.api, 'user', 'me', self.filename,
+                                 count=5, workers=2, checkpoint_every=2)
+        with open(self.filename + '.checkpoint') as f:
+            self.assertEqual(json.load(f)['page'], 3)
+        self.assertRaises(haiker.HaikerError, haiker.export.export,
+                          self.api, 'user', 'other', self.filename, count=5)
+        self.timeline.fail = set()
+        self.timeline.requests = []
+        n = haiker.export.export(self.api, 'user', 'me', self.filename,
+                                 count=5, workers=2, checkpoint_every=2)
+        self.assertEqual(n, 23)
+        self.assertEqual(self.read(), [str(i) for i in reversed(range(23))])
+        self.assertEqual(min(p for _, p in self.timeline.requests), 3)
+
+    @responses.activate
+    def test_shifted_pages(self):
+        def post(page, written):
+            if page == 1:  # a new post shifts the pages by one
+                self.timeline.statuses.insert(0, dict(samples.STATUS,
+                                                      id='new'))
+        haiker.export.export(self.api, 'friends', 'me', self.filename,
+                             count=5, workers=1, progress=post)
+        self.assertEqual(self.read(), [str(i) for i in reversed(range(23))])
+
+    @responses.activate
+    def test_command(self):
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            status = haiker.__main__.main([
+                'export', 'keyword', 'BOT', '-o', self.filename,
+                '--count', '10', '--rate', '100', '--since',
+                '2010-01-02T03:04:05Z'])
+        self.assertEqual(status, 0)
+        self.assertEqual(len(self.read()), 23)
+        self.assertIn('23 statuses written', stderr.getvalue())
+        self.timeline.fail = {1}
+        with contextlib.redirect_stderr(stderr), \
+                unittest.mock.patch('time.sleep') as sleep:
+            status = haiker.__main__.main([
+                'export', 'keyword', 'BOT', '-o', self.filename, '-q'])
+        self.assertEqual(status, 1)
+        self.assertTrue(sleep.called)  # retried with backoff
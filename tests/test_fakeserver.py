@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import datetime
+import time
+import unittest
+import requests
+import haiker
+import haiker.cache
+import haiker.endpoints
+import haiker.fakeserver
+import haiker.retry
+
+
+class TestFakeServer(unittest.TestCase):
+    def setUp(self):
+        dataset = haiker.fakeserver.Dataset(users=10, keywords=20,
+                                            statuses=500, replies=1)
+        self.server = haiker.fakeserver.FakeServer(dataset=dataset).start()
+        self.api = haiker.Haiker(root=self.server.url)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.close()
+
+    def test_all_methods(self):
+        eid = self.api.public_timeline(count=1)[0].id
+        kwargs = {
+            'update_status': {'keyword': 'BOT', 'status': 'hello',
+                              'files': [b'A']},
+            'delete_status': {'author_url_name': 'user0'},
+        }
+        defaults = {'eid': eid, 'url_name': 'user1', 'word': 'keyword1',
+                    'word1': 'keyword1', 'word2': 'keyword2'}
+        for e in haiker.endpoints.ENDPOINTS:
+            args = dict(defaults, **kwargs.get(e.name, {}))
+            if e.name == 'delete_status':
+                args['eid'] = self.api.update_status('BOT', 'bye').id
+            result = getattr(self.api, e.name)(
+                *[args[a] for a in e.args],
+                **{k: args[k] for k in e.options if k in args})
+            self.assertTrue(result, e.name)
+        self.assertEqual(set(self.server.counts),
+                         {e.name for e in haiker.endpoints.ENDPOINTS})
+
+    def test_timeline(self):
+        statuses = self.api.keyword_timeline('keyword3', count=5,
+                                             body_formats=['haiku', 'html'])
+        self.assertEqual(len(statuses), 5)
+        for s in statuses:
+            self.assertEqual(s.keyword, 'keyword3')
+            self.assertIsNotNone(s.haiku_text)
+            self.assertIsNotNone(s.html)
+            self.assertIsNone(s.html_touch)
+            self.assertEqual(len(s.replies), 1)
+        dates = [s.created_at for s in statuses]
+        self.assertEqual(dates, sorted(dates, reverse=True))
+        pages = list(self.api.iter_user_timeline('user2', count=10))
+        self.assertEqual(len(pages), len({s.id for s in pages}))
+        self.assertTrue(all(s.user.id == 'user2' for s in pages))
+        self.assertGreater(len(pages), 10)
+
+    def test_since(self):
+        newest = self.api.public_timeline(count=1)[0].created_at
+        since = newest - datetime.timedelta(minutes=5)
+        statuses = self.api.public_timeline(count=200, since=since)
+        self.assertEqual(len(statuses), 9)  # 37 seconds apart
+        self.assertTrue(all(s.created_at >= since for s in statuses))
+
+    def test_update(self):
+        status = self.api.update_status('BOT', 'hello', files=[b'JPEG'])
+        self.assertEqual((status.keyword, status.text), ('BOT', 'hello'))
+        self.assertEqual(self.api.public_timeline(count=1)[0].id, status.id)
+        self.assertEqual(self.api.album(count=1)[0].id, status.id)
+        self.assertEqual(self.api.add_star(status.id).favorited, 1)
+        self.assertEqual(self.api.remove_star(status.id).favorited, 0)
+        reply = self.api.update_status('BOT', 'reply',
+                                       in_reply_to_status_id=status.id)
+        self.assertEqual(reply.in_reply_to_status_id, status.id)
+        self.api.delete_status(status.id, 'user0')
+        with self.assertRaises(haiker.HaikerError) as cm:
+            self.api.show_status(status.id)
+        self.assertEqual(cm.exception.causal_error.response.status_code, 404)
+
+    def test_errors(self):
+        url = self.server.url
+        self.assertEqual(requests.get(url + '/unknown.json').status_code, 404)
+        self.assertEqual(requests.get(url + '/statuses/update.json')
+                         .status_code, 405)
+        self.assertEqual(requests.get(url + '/keywords/show.json')
+                         .status_code, 400)
+        self.assertEqual(requests.get(url + '/statuses/public_timeline.json',
+                                      params={'count': 'x'}).status_code,
+                         400)
+
+    def test_faults(self):
+        self.server.latency = 0.05
+        start = time.perf_counter()
+        self.api.hot_keywords()
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.server.latency = 0
+        self.server.error_rate = 1
+        with self.assertRaises(haiker.HaikerError) as cm:
+            self.api.hot_keywords()
+        self.assertEqual(cm.exception.causal_error.response.status_code, 503)
+        self.server.error_rate = 0.5
+        self.api._handler.retry = haiker.retry.RetryPolicy(max_retries=20,
+                                                           backoff=0)
+        for _ in range(5):
+            self.api.hot_keywords()
+
+    def test_etag(self):
+        self.api._handler.cache = haiker.cache.ResponseCache(ttl=0)
+        first = self.api.show_keyword('keyword1')
+        second = self.api.show_keyword('keyword1')
+        self.assertIs(first, second)  # revalidated with 304
+        self.assertEqual(self.server.counts['show_keyword'], 2)
+
+    def test_body_size(self):
+        dataset = haiker.fakeserver.Dataset(statuses=10, replies=3,
+                                            body_size=1000)
+        status = dataset.public_timeline(count=1)[0]
+        self.assertGreaterEqual(len(status['text']), 1000)
+        self.assertNotIn('html', status)
+        self.assertEqual(len(status['replies']), 3)
+        self.assertEqual(len(dataset.public_timeline(count=1000)), 10)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import datetime
+import unittest
+import unittest.mock
+import haiker
+from . import samples
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def make_dicts():
+    """Return 6 decoded statuses by 3 users with 2 keywords."""
+    dicts = []
+    for i in range(6):
+        d = dict(samples.STATUS, id=str(i), favorited=str(i),
+                 created_at='2010-01-0{0}T00:00:00Z'.format(i + 1),
+                 keyword=None if i == 5 else 'Word{0}'.format(i % 2),
+                 user=dict(samples.USER, id='user{0}'.format(i % 3)))
+        dicts.append(d)
+    return dicts
+
+
+class TestStatusFrame(unittest.TestCase):
+    def setUp(self):
+        self.frame = haiker.frame.StatusFrame.from_dicts(make_dicts())
+
+    def test_from_dicts(self):
+        f = self.frame
+        self.assertEqual(len(f), 6)
+        self.assertEqual(f.users, ['user0', 'user1', 'user2'])
+        self.assertEqual(f.keywords, ['Word0', 'Word1'])
+        self.assertEqual(list(f.keyword_codes), [0, 1, 0, 1, 0, -1])
+        row = f[1]
+        self.assertEqual(row.id, '1')
+        self.assertEqual(row.created_at,
+                         datetime.datetime(2010, 1, 2,
+                                           tzinfo=datetime.timezone.utc))
+        self.assertEqual(row.user_id, 'user1')
+        self.assertEqual(row.keyword, 'Word1')
+        self.assertIsNone(f[5].keyword)
+        repr(f)
+
+    def test_from_statuses(self):
+        statuses = [haiker.types.Status(d) for d in make_dicts()]
+        f = haiker.frame.StatusFrame.from_statuses(statuses)
+        self.assertEqual(list(f), list(self.frame))
+
+    def test_select(self):
+        f = self.frame
+        self.assertEqual(f.select(f.mask_users(['user1'])).id, ['1', '4'])
+        self.assertEqual(f.select(f.mask_keywords([None])).id, ['5'])
+        self.assertEqual(f.select(f.mask_keywords(['Word1'])).id,
+                         ['1', '3'])
+        self.assertEqual(f.select(f.mask_favorited(4)).id, ['4', '5'])
+        since = datetime.datetime(2010, 1, 2, tzinfo=datetime.timezone.utc)
+        until = datetime.datetime(2010, 1, 4, tzinfo=datetime.timezone.utc)
+        self.assertEqual(f.select(f.mask_time(since, until)).id, ['1', '2'])
+        self.assertRaises(ValueError, f.select, [True])
+
+    def test_aggregation(self):
+        f = self.frame
+        self.assertEqual(f.count_by_user(),
+                         {'user0': 2, 'user1': 2, 'user2': 2})
+        self.assertEqual(f.count_by_keyword(),
+                         {'Word0': 3, 'Word1': 2, None: 1})
+        self.assertEqual(f.favorited_by_user(),
+                         {'user0': 3, 'user1': 5, 'user2': 7})
+        self.assertEqual(f.favorited_distribution(),
+                         {i: 1 for i in range(6)})
+
+    def test_empty(self):
+        f = haiker.frame.StatusFrame()
+        self.assertEqual(len(f.select(f.mask_time())), 0)
+        self.assertEqual(f.count_by_user(), {})
+        self.assertEqual(f.count_by_keyword(), {})
+        self.assertEqual(f.favorited_by_user(), {})
+        self.assertEqual(f.favorited_distribution(), {})
+
+    def test_combined_masks(self):
+        f = self.frame
+        mask = [a and b for a, b in zip(f.mask_users(['user0', 'user1']),
+                                        f.mask_favorited(2))]
+        self.assertEqual(f.select(mask).id, ['3', '4'])
+
+    def test_concat(self):
+        f = self.frame
+        g = f.select(f.mask_users(['user2']))
+        h = haiker.frame.StatusFrame.concat([g, f])
+        self.assertEqual(len(h), 8)
+        self.assertEqual(list(h)[2:], list(f))
+        self.assertEqual(h.users[0], 'user2')
+
+    @unittest.skipIf(numpy is None, 'numpy is not installed')
+    def test_to_numpy(self):
+        columns = self.frame.to_numpy()
+        self.assertEqual(columns['favorited'].sum(), 15)
+        self.assertEqual(list(columns['keyword_codes']),
+                         [0, 1, 0, 1, 0, -1])
+        self.assertEqual(columns['users'][columns['user_codes'][2]],
+                         'user2')
+
+    @unittest.skipIf(pyarrow is None, 'pyarrow is not installed')
+    def test_to_arrow(self):
+        table = self.frame.to_arrow()
+        self.assertEqual(table.num_rows, 6)
+        self.assertEqual(table.column('keyword').to_pylist(),
+                         ['Word0', 'Word1', 'Word0', 'Word1', 'Word0', None])
+        self.assertEqual(table.column('user_id').to_pylist()[2], 'user2')
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TestNumpyMasks(unittest.TestCase):
+    def test_masks(self):
+        f = haiker.frame.StatusFrame.from_dicts(make_dicts())
+        mask = f.mask_users(['user0', 'user1']) & f.mask_favorited(2)
+        self.assertIsInstance(mask, numpy.ndarray)
+        self.assertEqual(f.select(mask).id, ['3', '4'])
+
+
+class TestStatusFrameWithoutNumpy(TestStatusFrame):
+    """The same results by the loops in Python"""
+    def setUp(self):
+        super().setUp()
+        patcher = unittest.mock.patch('haiker.frame.numpy', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
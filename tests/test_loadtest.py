@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import asyncio
+import contextlib
+import io
+import json
+import unittest
+import haiker
+import haiker.__main__
+import haiker.cache
+import haiker.fakeserver
+import haiker.loadtest
+import haiker.utils
+
+try:
+    import aiohttp
+    import haiker.aio
+except ImportError:
+    aiohttp = None
+
+
+class TestLoadTest(unittest.TestCase):
+    def setUp(self):
+        dataset = haiker.fakeserver.Dataset(users=10, keywords=20,
+                                            statuses=300, replies=0)
+        self.server = haiker.fakeserver.FakeServer(dataset=dataset).start()
+        self.api = haiker.Haiker(root=self.server.url,
+                                 session=haiker.utils.make_session(
+                                     pool_maxsize=4),
+                                 single_flight=False)
+
+    def tearDown(self):
+        self.api.close()
+        self.server.close()
+
+    def test_run(self):
+        report = haiker.loadtest.run(self.api, concurrency=4, requests=40,
+                                     duration=None)
+        self.assertEqual(report.count, 40)
+        self.assertEqual(report.errors, {})
+        self.assertGreater(report.throughput, 0)
+        self.assertGreater(report.cpu_time, 0)
+        # every call reaches the server (after 2 to find the targets)
+        self.assertEqual(sum(self.server.counts.values()), 40 + 2)
+        summary = report.summary()
+        self.assertEqual(summary['count'], 40)
+        self.assertLessEqual(summary['p50'], summary['p95'])
+        self.assertLessEqual(summary['p95'], summary['p99'])
+        self.assertLessEqual(summary['p99'], summary['max'])
+        self.assertEqual(sum(d['count'] for d in
+                             report.to_dict()['apis'].values()), 40)
+        self.assertIn('all', report.format())
+
+    def test_rate(self):
+        report = haiker.loadtest.run(self.api, {'hot_keywords': 1},
+                                     concurrency=2, rate=50, duration=0.4)
+        self.assertEqual(report.count, 20)
+        dues = sorted(s[1] for s in report.samples)
+        self.assertAlmostEqual(dues[-1], 19 / 50)
+
+    def test_errors(self):
+        targets = haiker.loadtest.find_targets(self.api, count=5)
+        self.server.error_rate = 1
+        report = haiker.loadtest.run(self.api, {'show_status': 1},
+                                     concurrency=2, requests=10,
+                                     targets=targets)
+        self.assertEqual(report.errors, {'503': 10})
+        self.assertEqual(report.error_rate, 1)
+        with self.assertRaises(ValueError):
+            haiker.loadtest.run(self.api, {'show_status': 1},
+                                targets=haiker.loadtest.Targets([], [], []))
+
+    def test_counts(self):
+        report = haiker.loadtest.run(
+            self.api, {'public_timeline': 1, 'hot_keywords': 1},
+            concurrency=4, duration=0.3)
+        self.assertEqual(report.count, sum(self.server.counts.values()) - 2)
+        for kwargs in [{}, {'cache': haiker.cache.ResponseCache(),
+                            'single_flight': False}]:
+            with haiker.Haiker(root=self.server.url, **kwargs) as api:
+                with self.assertRaises(ValueError):
+                    haiker.loadtest.run(api, requests=1)
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_run_async(self):
+        async def main():
+            async with haiker.aio.AsyncHaiker(root=self.server.url,
+                                              single_flight=False) as api:
+                return await haiker.loadtest.run_async(
+                    api, concurrency=20, requests=60)
+        report = asyncio.run(main())
+        self.assertEqual(report.count, 60)
+        self.assertEqual(report.errors, {})
+        self.assertEqual(report.count, sum(self.server.counts.values()) - 2)
+
+    def test_command(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            status = haiker.__main__.main([
+                '--root', self.server.url, 'loadtest', '--mix',
+                'show_user=2,keyword_timeline', '-c', '2', '-n', '10',
+                '--count', '5', '--json'])
+        self.assertEqual(status, 0)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['latency']['count'], 10)
+        self.assertLessEqual(set(report['apis']),
+                             {'show_user', 'keyword_timeline'})
+
+    def test_parse_mix(self):
+        self.assertEqual(haiker.loadtest.parse_mix('show_user=2,album'),
+                         {'show_user': 2, 'album': 1})
+        for text in ['show_user=x', 'unknown']:
+            with self.assertRaises(ValueError):
+                haiker.loadtest.parse_mix(text)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(haiker.loadtest.percentile(values, 50), 50)
+        self.assertEqual(haiker.loadtest.percentile(values, 99), 99)
+        self.assertEqual(haiker.loadtest.percentile(values, 100), 100)
+        self.assertEqual(haiker.loadtest.percentile([7], 95), 7)
+        self.assertIsNone(haiker.loadtest.percentile([], 50))
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+import json
+import re
+import unittest
+import responses
+import haiker
+import haiker.cache
+import haiker.metrics
+import haiker.retry
+from . import samples
+
+
+URL = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+
+
+class TestCallRecord(unittest.TestCase):
+    def setUp(self):
+        self.records = []
+        self.api = haiker.Haiker(observers=[self.records.append])
+
+    @responses.activate
+    def test_get(self):
+        body = json.dumps([samples.STATUS] * 3)
+        responses.add(responses.GET, URL, body=body)
+        self.api.keyword_timeline('BOT')
+        record, = self.records
+        self.assertEqual(record.method, 'GET')
+        self.assertEqual(record.path, '/statuses/keyword_timeline.json')
+        self.assertEqual(record.endpoint, 'keyword_timeline')
+        self.assertEqual(record.status, 200)
+        self.assertFalse(record.cached)
+        self.assertEqual(record.bytes_sent, 0)
+        self.assertEqual(record.bytes_received, len(body))
+        self.assertEqual(record.retries, 0)
+        self.assertIsNone(record.error)
+        for t in [record.network_time, record.decode_time,
+                  record.parse_time]:
+            self.assertGreater(t, 0)
+        self.assertGreaterEqual(record.duration,
+                                record.network_time + record.decode_time +
+                                record.parse_time)
+
+    @responses.activate
+    def test_incremental(self):
+        body = json.dumps([samples.STATUS] * 3)
+        responses.add(responses.GET, URL, body=body)
+        statuses = list(self.api.public_timeline(incremental=True))
+        self.assertEqual(len(statuses), 3)
+        record, = self.records
+        self.assertEqual(record.bytes_received, len(body))
+        self.assertGreater(record.decode_time, 0)
+        self.assertGreater(record.parse_time, 0)
+
+    @responses.activate
+    def test_post(self):
+        responses.add(responses.POST, URL, json=samples.STATUS)
+        self.api.update_status('BOT', 'hello', files=[b'ABC'])
+        record, = self.records
+        self.assertEqual(record.method, 'POST')
+        self.assertEqual(record.endpoint, 'update_status')
+        self.assertGreater(record.bytes_sent, len('BOT hello ABC'))
+
+    @responses.activate
+    def test_error(self):
+        responses.add(responses.GET, URL, status=503)
+        self.api._handler.retry = haiker.retry.RetryPolicy(max_retries=2,
+                                                           backoff=0)
+        with self.assertRaises(haiker.HaikerError):
+            self.api.show_status('123')
+        record, = self.records
+        self.assertEqual(record.endpoint, 'show_status')
+        self.assertEqual(record.status, 503)
+        self.assertEqual(record.retries, 2)
+        self.assertIsNotNone(record.error)
+
+    @responses.activate
+    def test_cache(self):
+        responses.add(responses.GET, URL, json=samples.USER)
+        self.api._handler.cache = haiker.cache.ResponseCache(ttl=60)
+        self.api.show_user('me')
+        self.api.show_user('me')
+        first, second = self.records
+        self.assertEqual((first.status, first.cached), (200, False))
+        self.assertEqual((second.status, second.cached), (None, True))
+
+    @responses.activate
+    def test_no_observers(self):
+        responses.add(responses.GET, URL, json=samples.USER)
+        self.api.observers.clear()
+        self.api.show_user('me')
+        self.assertEqual(self.records, [])
+        with haiker.metrics.recording([], 'GET', '/') as record:
+            self.assertIsNone(record)
+
+
+class TestAggregator(unittest.TestCase):
+    def record(self, path, status=200, duration=0.02, **kwargs):
+        record = haiker.metrics.CallRecord('GET', path)
+        record.status = status
+        record.duration = duration
+        for name, value in kwargs.items():
+            setattr(record, name, value)
+        return record
+
+    def test_values(self):
+        metrics = haiker.metrics.Aggregator(buckets=[0.01, 0.1])
+        metrics(self.record('/statuses/show/1.json', bytes_received=10))
+        metrics(self.record('/statuses/show/2.json', duration=0.5,
+                            retries=2, bytes_received=20))
+        metrics(self.record('/statuses/show/3.json', status=None,
+                            cached=True))
+        metrics(self.record('/unknown.json', status=None))
+        self.assertEqual(metrics.value('haiker_calls_total', 'show_status',
+                                       'GET', '200'), 2)
+        self.assertEqual(metrics.value('haiker_calls_total', 'show_status',
+                                       'GET', 'cache'), 1)
+        self.assertEqual(metrics.value('haiker_calls_total', 'other',
+                                       'GET', 'error'), 1)
+        self.assertEqual(metrics.value('haiker_retries_total',
+                                       'show_status'), 2)
+        self.assertEqual(metrics.value('haiker_received_bytes_total',
+                                       'show_status'), 30)
+        histogram = metrics.value('haiker_call_duration_seconds',
+                                  'show_status')
+        self.assertEqual(histogram.cumulative(),
+                         [(0.01, 0), (0.1, 2), (float('inf'), 3)])
+        metrics.reset()
+        self.assertIsNone(metrics.value('haiker_retries_total',
+                                        'show_status'))
+
+    def test_prometheus(self):
+        metrics = haiker.metrics.Aggregator(buckets=[0.01, 0.1])
+        metrics(self.record('/keywords/hot.json', duration=0.05))
+        metrics(self.record('/keywords/hot.json', duration=0.25))
+        text = metrics.prometheus()
+        lines = text.splitlines()
+        self.assertIn('# TYPE haiker_calls_total counter', lines)
+        self.assertIn('haiker_calls_total{endpoint="hot_keywords",'
+                      'method="GET",code="200"} 2', lines)
+        self.assertIn('# TYPE haiker_call_duration_seconds histogram',
+                      lines)
+        self.assertIn('haiker_call_duration_seconds_bucket{'
+                      'endpoint="hot_keywords",le="0.1"} 1', lines)
+        self.assertIn('haiker_call_duration_seconds_bucket{'
+                      'endpoint="hot_keywords",le="+Inf"} 2', lines)
+        self.assertIn('haiker_call_duration_seconds_count{'
+                      'endpoint="hot_keywords"} 2', lines)
+        self.assertIn('haiker_call_duration_seconds_sum{'
+                      'endpoint="hot_keywords"} 0.3', lines)
+        self.assertTrue(text.endswith('\n'))
+        sample = re.compile('[a-z_]+(\\{([a-z]+="[^"]*",?)+\\})? \\S+\\Z')
+        for line in lines:
+            if not line.startswith('#'):
+                self.assertRegex(line, sample)
+
+    def test_escape(self):
+        self.assertEqual(haiker.metrics._labels(['a'], ['x"y\\z\n']),
+                         '{a="x\\"y\\\\z\\n"}')
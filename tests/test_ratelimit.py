@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+import re
+import threading
+import unittest
+import unittest.mock
+import responses
+import haiker
+import haiker.ratelimit
+from . import samples
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestTokenBucket(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = unittest.mock.patch.multiple(
+            'time', monotonic=self.clock.monotonic, sleep=self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst(self):
+        bucket = haiker.ratelimit.TokenBucket(2, capacity=3)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertEqual(bucket.reserve(), 0.5)
+        self.assertEqual(bucket.reserve(), 1.0)
+
+    def test_refill(self):
+        bucket = haiker.ratelimit.TokenBucket(1)
+        self.assertEqual(bucket.acquire(), 0)
+        self.assertEqual(bucket.acquire(), 1)
+        self.clock.now += 10  # refilled up to the capacity only
+        self.assertEqual(bucket.acquire(), 0)
+        self.assertEqual(bucket.acquire(), 1)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, haiker.ratelimit.TokenBucket, 0)
+
+    def test_limiter(self):
+        limiter = haiker.ratelimit.RateLimiter(
+            read=haiker.ratelimit.TokenBucket(1))
+        self.assertEqual(limiter.acquire('POST'), 0)
+        self.assertEqual(limiter.acquire('POST'), 0)
+        self.assertEqual(limiter.acquire('GET'), 0)
+        self.assertEqual(limiter.reserve('GET'), 1)
+
+
+class TestThreads(unittest.TestCase):
+    def test_shared(self):
+        bucket = haiker.ratelimit.TokenBucket(10, capacity=5)
+        delays = []
+        lock = threading.Lock()
+
+        def work():
+            for _ in range(5):
+                delay = bucket.reserve()
+                with lock:
+                    delays.append(delay)
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 5 tokens of burst and then one per 0.1 seconds in order
+        delays.sort()
+        self.assertEqual(delays[:5], [0] * 5)
+        self.assertAlmostEqual(delays[-1], 1.5, delta=0.1)
+
+
+class TestHaiker(unittest.TestCase):
+    @responses.activate
+    def test_rate_limiter(self):
+        url = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+        responses.add(responses.GET, url, json=samples.STATUS)
+        responses.add(responses.POST, url, json=samples.STATUS)
+        limiter = unittest.mock.Mock(wraps=haiker.ratelimit.RateLimiter())
+        api = haiker.Haiker(rate_limiter=limiter)
+        api.show_status('123')
+        api.add_star('123')
+        self.assertEqual(limiter.acquire.call_args_list,
+                         [unittest.mock.call('GET'),
+                          unittest.mock.call('POST')])
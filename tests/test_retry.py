@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+
+import re
+import unittest
+import unittest.mock
+import requests
+import responses
+import haiker
+import haiker.retry
+from . import samples
+from .test_ratelimit import FakeClock
+
+
+URL = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_retryable(self):
+        policy = haiker.retry.RetryPolicy(max_retries=2)
+        self.assertTrue(policy.retryable('GET', None, 0))
+        self.assertTrue(policy.retryable('GET', 503, 1))
+        self.assertFalse(policy.retryable('GET', 503, 2))
+        self.assertFalse(policy.retryable('GET', 404, 0))
+        self.assertFalse(policy.retryable('POST', 503, 0))
+
+    def test_delay(self):
+        policy = haiker.retry.RetryPolicy(backoff=1, max_backoff=5)
+        for attempt, limit in [(0, 1), (1, 2), (2, 4), (3, 5), (10, 5)]:
+            for _ in range(20):
+                self.assertTrue(0 <= policy.delay(attempt) <= limit)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = unittest.mock.patch('time.monotonic', self.clock.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_states(self):
+        breaker = haiker.retry.CircuitBreaker(failure_threshold=2,
+                                              reset_timeout=10)
+        breaker.record_failure()
+        breaker.before()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertRaises(haiker.retry.CircuitOpenError, breaker.before)
+        self.clock.now += 10
+        self.assertEqual(breaker.state, 'half-open')
+        breaker.before()  # the trial call
+        self.assertRaises(haiker.retry.CircuitOpenError, breaker.before)
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.clock.now += 10
+        breaker.before()
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        breaker.before()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.clock.now += 10
+        breaker.before()
+        breaker.release()  # the trial call was abandoned
+        self.assertEqual(breaker.state, 'half-open')
+        breaker.before()
+
+
+class TestDeadline(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = unittest.mock.patch('time.monotonic', self.clock.monotonic)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_timeout_for(self):
+        self.assertIsNone(haiker.retry.remaining())
+        self.assertEqual(haiker.retry.timeout_for((3, 30)), (3, 30))
+        with haiker.retry.deadline(10):
+            self.assertEqual(haiker.retry.timeout_for((3, 30)), (3, 10))
+            self.assertEqual(haiker.retry.timeout_for(None), (10, 10))
+            with haiker.retry.deadline(60):  # cannot extend
+                self.assertEqual(haiker.retry.timeout_for(30), 10)
+            self.clock.now += 10
+            self.assertRaises(haiker.retry.DeadlineExceeded,
+                              haiker.retry.timeout_for, None)
+        self.assertIsNone(haiker.retry.remaining())
+
+
+class TestHaiker(unittest.TestCase):
+    def setUp(self):
+        patcher = unittest.mock.patch('time.sleep')
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @responses.activate
+    def test_retry(self):
+        responses.add(responses.GET, URL, status=503)
+        responses.add(responses.GET, URL,
+                      body=requests.ConnectionError('reset'))
+        responses.add(responses.GET, URL, json=samples.STATUS)
+        api = haiker.Haiker(retry=haiker.retry.RetryPolicy(max_retries=2))
+        status = api.show_status('123')
+        self.assertEqual(status.id, samples.STATUS['id'])
+        self.assertEqual(len(responses.calls), 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    @responses.activate
+    def test_give_up(self):
+        responses.add(responses.GET, URL, status=503)
+        responses.add(responses.POST, URL, status=503)
+        api = haiker.Haiker(retry=haiker.retry.RetryPolicy(max_retries=2))
+        with self.assertRaises(haiker.HaikerError) as cm:
+            api.show_status('123')
+        self.assertIsInstance(cm.exception.causal_error, requests.HTTPError)
+        self.assertEqual(len(responses.calls), 3)
+        self.assertRaises(haiker.HaikerError, api.add_star, '123')
+        self.assertEqual(len(responses.calls), 4)  # POST is not retried
+
+    @responses.activate
+    def test_circuit_breaker(self):
+        responses.add(responses.GET, URL, status=500)
+        breaker = haiker.retry.CircuitBreaker(failure_threshold=2)
+        api = haiker.Haiker(circuit_breaker=breaker)
+        for _ in range(2):
+            self.assertRaises(haiker.HaikerError, api.show_status, '123')
+        with self.assertRaises(haiker.HaikerError) as cm:
+            api.show_status('123')
+        self.assertIsInstance(cm.exception.causal_error,
+                              haiker.retry.CircuitOpenError)
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_client_errors(self):
+        responses.add(responses.GET, URL, status=404)
+        breaker = haiker.retry.CircuitBreaker(failure_threshold=1)
+        api = haiker.Haiker(retry=haiker.retry.RetryPolicy(),
+                            circuit_breaker=breaker)
+        self.assertRaises(haiker.HaikerError, api.show_status, '123')
+        self.assertEqual(len(responses.calls), 1)
+        self.assertEqual(breaker.state, 'closed')
+
+    @responses.activate
+    def test_half_open_error(self):
+        responses.add(responses.GET, URL,
+                      body=requests.ConnectionError('reset'))
+        responses.add(responses.GET, URL,
+                      body=requests.exceptions.ChunkedEncodingError('eof'))
+        responses.add(responses.GET, URL, json=samples.STATUS)
+        breaker = haiker.retry.CircuitBreaker(failure_threshold=1,
+                                              reset_timeout=0)
+        api = haiker.Haiker(circuit_breaker=breaker)
+        self.assertRaises(haiker.HaikerError, api.show_status, '123')
+        self.assertEqual(breaker.state, 'half-open')
+        with self.assertRaises(haiker.HaikerError) as cm:
+            api.show_status('123')  # the trial call
+        self.assertIsInstance(cm.exception.causal_error,
+                              requests.exceptions.ChunkedEncodingError)
+        self.assertEqual(breaker.state, 'half-open')
+        api.show_status('123')
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(len(responses.calls), 3)
+
+    @responses.activate
+    def test_timeout(self):
+        responses.add(responses.GET, URL, json=[samples.STATUS])
+        api = haiker.Haiker(timeout=(3, 30))
+        with unittest.mock.patch.object(api.session, 'send',
+                                        wraps=api.session.send) as send:
+            api.public_timeline()
+            self.assertEqual(send.call_args[1]['timeout'], (3, 30))
+            with haiker.retry.deadline(5):
+                api.public_timeline()
+            connect, read = send.call_args[1]['timeout']
+            self.assertEqual(connect, 3)
+            self.assertTrue(0 < read <= 5)
+
+    @responses.activate
+    def test_deadline(self):
+        responses.add(responses.GET, URL, status=503)
+        api = haiker.Haiker(retry=haiker.retry.RetryPolicy(backoff=1e6))
+        with haiker.retry.deadline(1):
+            # backoff longer than the deadline is not waited for
+            self.assertRaises(haiker.HaikerError, api.show_status, '123')
+        with haiker.retry.deadline(0):
+            with self.assertRaises(haiker.HaikerError) as cm:
+                api.show_status('123')
+        self.assertIsInstance(cm.exception.causal_error,
+                              haiker.retry.DeadlineExceeded)
+
+    @responses.activate
+    def test_deadline_in_threads(self):
+        responses.add(responses.GET, URL, json=[samples.STATUS] * 2)
+        responses.add(responses.GET, URL, json=[])
+        api = haiker.Haiker(timeout=(3, 30))
+        with unittest.mock.patch.object(api.session, 'send',
+                                        wraps=api.session.send) as send:
+            with haiker.retry.deadline(5):
+                list(api.iter_keyword_timeline('BOT', count=2))
+        # the second page is prefetched in another thread
+        self.assertEqual(send.call_count, 2)
+        for call in send.call_args_list:
+            self.assertTrue(call[1]['timeout'][1] <= 5)
+        with haiker.retry.deadline(0):
+            results = api.show_statuses(['1', '2'])
+        self.assertEqual(len(responses.calls), 2)
+        self.assertIsInstance(results[0].causal_error,
+                              haiker.retry.DeadlineExceeded)
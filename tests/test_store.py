@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import threading
+import unittest
+import haiker
+import haiker.store
+from . import samples
+
+
+class TestEntityStore(unittest.TestCase):
+    def test_intern(self):
+        store = haiker.store.EntityStore()
+        user = store.user(dict(samples.USER))
+        self.assertIs(store.user(dict(samples.USER)), user)
+        self.assertIs(store.target(samples.TARGET),
+                      store.target(samples.TARGET))
+        self.assertIs(store.keyword(samples.KEYWORD),
+                      store.keyword(samples.KEYWORD))
+        self.assertIsNot(store.target(samples.TARGET),
+                         store.keyword(samples.KEYWORD))
+        self.assertEqual(len(store), 3)
+        store.clear()
+        self.assertIsNot(store.user(samples.USER), user)
+
+    def test_changed(self):
+        store = haiker.store.EntityStore()
+        user = store.user(samples.USER)
+        changed = dict(samples.USER, followers_count='124')
+        self.assertEqual(store.user(changed).followers_count, 124)
+        self.assertEqual(user.followers_count, 123)
+        self.assertEqual(len(store), 1)
+
+    def test_eviction(self):
+        store = haiker.store.EntityStore(maxsize=2)
+        users = [dict(samples.USER, id=str(i)) for i in range(3)]
+        first = store.user(users[0])
+        store.user(users[1])
+        self.assertIs(store.user(users[0]), first)  # most recently used
+        store.user(users[2])
+        self.assertEqual(len(store), 2)
+        self.assertIs(store.user(users[0]), first)
+        self.assertNotIn((haiker.types.User, '1'), store._entries)
+
+    def test_status(self):
+        store = haiker.store.EntityStore()
+        for lazy in [False, True]:
+            statuses = [haiker.types.Status(samples.STATUS, lazy=lazy,
+                                            store=store)
+                        for _ in range(3)]
+            self.assertIs(statuses[0].user, statuses[2].user)
+            self.assertIs(statuses[0].target, statuses[1].target)
+            self.assertIs(statuses[0].replies[0].user,
+                          statuses[1].replies[0].user)
+
+    def test_threads(self):
+        store = haiker.store.EntityStore(maxsize=8)
+        users = [dict(samples.USER, id=str(i % 16)) for i in range(2000)]
+
+        def work():
+            for d in users:
+                self.assertEqual(store.user(d).id, d['id'])
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertLessEqual(len(store), 8)
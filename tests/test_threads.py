@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import http.server
+import json
+import re
+import threading
+import time
+import unittest
+import urllib.parse
+import haiker
+from . import samples
+
+
+LATENCY = 0.02
+THREADS = 8
+CALLS = 5
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+        try:
+            if server.barrier is None:
+                time.sleep(LATENCY)
+            else:  # until the other threads send theirs
+                server.barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+        eid = urllib.parse.urlsplit(self.path).path.rsplit('/', 1)[1]
+        eid = eid.split('.')[0]
+        self.server.authorizations.append(
+            (eid, self.headers.get('Authorization')))
+        body = json.dumps(dict(samples.STATUS, id=eid)).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestSharedClient(unittest.TestCase):
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0),
+                                                      Handler)
+        self.server.daemon_threads = True
+        self.server.authorizations = []
+        self.server.lock = threading.Lock()
+        self.server.in_flight = self.server.peak = 0
+        self.server.barrier = None
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        auth = haiker.OAuth('MyConsumerKey', 'MyConsumerSecret',
+                            'MyAccessToken', 'MyAccessTokenSecret')
+        session = haiker.utils.make_session(pool_maxsize=THREADS)
+        root = 'http://127.0.0.1:{0}/api'.format(self.server.server_port)
+        self.api = haiker.Haiker(auth, root=root, session=session)
+        self.addCleanup(session.close)
+
+    def work(self, n):
+        eids = ['{0}x{1}'.format(n, i) for i in range(CALLS)]
+        return eids, [self.api.show_status(eid).id for eid in eids]
+
+    def run_threads(self, n):
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(n) as executor:
+            results = list(executor.map(self.work, range(n)))
+        return time.perf_counter() - start, results
+
+    def test_no_cross_talk(self):
+        elapsed, results = self.run_threads(THREADS)
+        for eids, ids in results:
+            self.assertEqual(ids, eids)
+        nonces = set()
+        for eid, authorization in self.server.authorizations:
+            self.assertIn('oauth_consumer_key="MyConsumerKey"', authorization)
+            self.assertIn('oauth_token="MyAccessToken"', authorization)
+            nonces.add(re.search('oauth_nonce="([^"]+)"',
+                                 authorization).group(1))
+        self.assertEqual(len(nonces), THREADS * CALLS)
+
+    def test_scaling(self):
+        self.run_threads(1)
+        self.assertEqual(self.server.peak, 1)
+        # each request waits for those of all the threads
+        self.server.barrier = threading.Barrier(THREADS, timeout=5)
+        self.run_threads(THREADS)
+        self.assertEqual(self.server.peak, THREADS)
+
+    def test_switch_auth(self):
+        other = haiker.OAuth('OtherConsumerKey', 'OtherConsumerSecret',
+                             'OtherAccessToken', 'OtherAccessTokenSecret')
+        with concurrent.futures.ThreadPoolExecutor(THREADS) as executor:
+            futures = [executor.submit(self.work, n) for n in range(THREADS)]
+            self.api.auth = other
+            for future in futures:
+                eids, ids = future.result()
+                self.assertEqual(ids, eids)
+        for eid, authorization in self.server.authorizations:
+            # each request is signed with either set of keys, never mixed
+            keys = re.findall('oauth_(?:consumer_key|token)="([^"]+)"',
+                              authorization)
+            self.assertIn(keys, [['MyConsumerKey', 'MyAccessToken'],
+                                 ['OtherConsumerKey', 'OtherAccessToken']])
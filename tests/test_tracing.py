@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+import re
+import unittest
+import responses
+import haiker
+import haiker.retry
+import haiker.tracing
+from . import samples
+from .test_api import paged
+
+
+URL = re.compile('http://h\\.hatena\\.ne\\.jp/api/.+\\.json')
+
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.tracer = haiker.tracing.RecordingTracer()
+        auth = haiker.OAuth('MyConsumerKey', 'MyConsumerSecret',
+                            'MyAccessToken', 'MyAccessTokenSecret')
+        self.api = haiker.Haiker(auth, tracer=self.tracer)
+
+    def children(self, span):
+        return [s for s in self.tracer.spans() if s.parent_id == span.id]
+
+    @responses.activate
+    def test_call(self):
+        responses.add(responses.GET, URL, json=[samples.STATUS])
+        self.api.keyword_timeline('BOT', page=2)
+        call, = self.tracer.spans('haiker.call')
+        self.assertIsNone(call.parent_id)
+        self.assertEqual(call.attributes, {
+            'endpoint': 'keyword_timeline', 'method': 'GET',
+            'path': '/statuses/keyword_timeline.json', 'page': 2})
+        self.assertEqual([s.name for s in self.children(call)],
+                         ['haiker.sign', 'haiker.network', 'haiker.decode',
+                          'haiker.parse'])
+        network, = self.tracer.spans('haiker.network')
+        self.assertEqual(network.attributes, {'attempt': 0, 'status': 200})
+        for s in self.tracer.spans():
+            self.assertGreaterEqual(s.duration, 0)
+            self.assertLessEqual(s.duration, call.duration)
+        self.assertIsNone(haiker.tracing.current())
+        lines = self.tracer.format().splitlines()
+        self.assertTrue(lines[0].startswith('haiker.call '))
+        self.assertTrue(lines[1].startswith('  haiker.sign '))
+
+    @responses.activate
+    def test_error(self):
+        responses.add(responses.GET, URL, status=503)
+        self.api._handler.retry = haiker.retry.RetryPolicy(max_retries=1,
+                                                           backoff=0)
+        with self.assertRaises(haiker.HaikerError):
+            self.api.show_status('123')
+        call, = self.tracer.spans('haiker.call')
+        self.assertIsNotNone(call.error)
+        self.assertEqual([s.attributes for s in
+                          self.tracer.spans('haiker.network')],
+                         [{'attempt': 0, 'status': 503},
+                          {'attempt': 1, 'status': 503}])
+        self.assertIn('error=', self.tracer.format())
+
+    @responses.activate
+    def test_incremental(self):
+        responses.add(responses.GET, URL, json=[samples.STATUS] * 3)
+        for status in self.api.public_timeline(incremental=True):
+            # not leaked to the consumer
+            self.assertIsNone(haiker.tracing.current())
+        call, = self.tracer.spans('haiker.call')
+        self.assertEqual([s.name for s in self.children(call)],
+                         ['haiker.sign', 'haiker.network'])
+
+    @responses.activate
+    def test_paginate(self):
+        for prefetch in [True, False]:
+            self.tracer.clear()
+            responses.reset()
+            paged(3, 2)
+            it = self.api.iter_public_timeline(count=2, prefetch=prefetch)
+            for status in it:
+                self.assertIsNone(haiker.tracing.current())
+            paginate, = self.tracer.spans('haiker.paginate')
+            calls = self.tracer.spans('haiker.call')
+            self.assertEqual([s.attributes['page'] for s in calls],
+                             [1, 2, 3, 4])
+            for call in calls:
+                self.assertEqual(call.parent_id, paginate.id)
+
+    @responses.activate
+    def test_bulk(self):
+        responses.add(responses.GET, URL, json=samples.STATUS)
+        self.api.show_statuses(['1', '2', '3'], max_workers=3)
+        bulk, = self.tracer.spans('haiker.bulk')
+        self.assertEqual(bulk.attributes, {'size': 3})
+        calls = self.tracer.spans('haiker.call')
+        self.assertEqual(len(calls), 3)
+        for call in calls:
+            self.assertEqual(call.parent_id, bulk.id)
+
+    @responses.activate
+    def test_disabled(self):
+        responses.add(responses.GET, URL, json=samples.STATUS)
+        api = haiker.Haiker()
+        self.assertIs(haiker.tracing.start('haiker.call'),
+                      haiker.tracing.NOOP)
+        api.show_statuses(['1', '2'])
+        self.assertEqual(self.tracer.spans(), [])
+        # a call in a span of another tracer is traced by it
+        with haiker.tracing.start('app', self.tracer) as span:
+            api.show_status('1')
+        call, = self.tracer.spans('haiker.call')
+        self.assertEqual(call.parent_id, span.id)
+
+    def test_recording_tracer(self):
+        tracer = haiker.tracing.RecordingTracer(maxlen=2)
+        for name in 'abc':
+            with haiker.tracing.start(name, tracer):
+                pass
+        self.assertEqual([s.name for s in tracer.spans()], ['b', 'c'])
+        d = tracer.spans()[0].to_dict()
+        self.assertEqual(d['name'], 'b')
+        self.assertIsNone(d['error'])
@@ -1,6 +1,8 @@
 #!/usr/bin/env python3
 
 import datetime
+import json
+import pickle
 import unittest
 import haiker
 from . import samples
@@ -27,6 +29,24 @@ class TestTypes(unittest.TestCase):
         dt = dt.replace(tzinfo=datetime.timezone(datetime.timedelta(hours=9)))
         self.assertEqual(f('2010-01-02T03:04:05+09:00'), dt)
         self.assertEqual(f('2010-01-02T03:04:05.000+09:00'), dt)
+        self.assertEqual(f('2010-01-02T03:04:05.25+0900'),
+                         dt.replace(microsecond=250000))
+        dt = dt.replace(tzinfo=datetime.timezone(-datetime.timedelta(
+            hours=3, minutes=30)))
+        self.assertEqual(f('2010-01-02T03:04:05-03:30'), dt)
+        self.assertRaises(ValueError, f, '2010-01-02 03:04:05')
+        self.assertRaises(ValueError, f, '2010-13-02T03:04:05Z')
+
+    def test_to_datetime_fast_path(self):
+        f = haiker.types.to_datetime
+        g = haiker.types._strptime
+        samples = [
+            '2010-01-02T03:04:05Z', '1999-12-31T23:59:59+09:00',
+            '2000-02-29T00:00:00.123456-05:00', '2010-01-02T03:04:05.1Z',
+        ]
+        for x in samples:
+            self.assertEqual(f(x), g(x))
+            self.assertEqual(f(x).utcoffset(), g(x).utcoffset())
 
     def test_status(self):
         status = haiker.types.Status(samples.STATUS)
@@ -82,3 +102,77 @@ class TestTypes(unittest.TestCase):
         eq(target.word, 'Word')
         eq(target.url_name, 'URLName')
         repr(target)
+
+    def test_lazy(self):
+        classes = [
+            (haiker.types.Status, samples.STATUS),
+            (haiker.types.User, samples.USER),
+            (haiker.types.Keyword, samples.KEYWORD),
+            (haiker.types.Target, samples.TARGET),
+        ]
+        for cls, d in classes:
+            eager, lazy = cls(d), cls(d, lazy=True)
+            for name in cls.__slots__:
+                if name.startswith('_'):
+                    continue
+                a, b = getattr(eager, name), getattr(lazy, name)
+                if isinstance(a, (list, haiker.types.Target,
+                                  haiker.types.User)):
+                    self.assertEqual(repr(a), repr(b))
+                else:
+                    self.assertEqual(a, b)
+            with self.assertRaises(AttributeError):
+                lazy.nonexistent
+            with self.assertRaises(AttributeError):
+                eager._raw
+
+    def test_lazy_on_access(self):
+        d = dict(samples.STATUS, created_at='invalid', user={})
+        status = haiker.types.Status(d, lazy=True)
+        self.assertEqual(status.id, 'XXXX')
+        self.assertEqual(status.replies[0].user.id, 'zzzz')
+        self.assertRaises(ValueError, getattr, status, 'created_at')
+        self.assertRaises(AttributeError, getattr, status.user, 'id')
+        self.assertIsNone(getattr(status.user, 'name', None))
+        keyword = haiker.types.Keyword(
+            {k: v for k, v in samples.KEYWORD.items() if k != 'title'},
+            lazy=True)
+        self.assertFalse(hasattr(keyword, 'title'))
+        self.assertEqual(keyword.word, samples.KEYWORD['word'])
+        status.id = 'YYYY'
+        self.assertEqual(status.id, 'YYYY')
+
+    def test_parser(self):
+        for lazy in [False, True]:
+            parser = haiker.types.Parser(lazy=lazy)
+            statuses = parser.statuses([samples.STATUS])
+            self.assertEqual(statuses[0].id, 'XXXX')
+            self.assertEqual(parser.status(samples.STATUS).id, 'XXXX')
+            self.assertEqual(parser.users([samples.USER])[0].id, 'ID')
+            self.assertEqual(parser.user(samples.USER).id, 'ID')
+            self.assertEqual(parser.keywords([samples.KEYWORD])[0].word,
+                             'Word')
+            self.assertEqual(parser.keyword(samples.KEYWORD).word, 'Word')
+
+    def test_to_dict(self):
+        classes = [
+            (haiker.types.Status, samples.STATUS),
+            (haiker.types.User, samples.USER),
+            (haiker.types.Keyword, samples.KEYWORD),
+            (haiker.types.Target, samples.TARGET),
+        ]
+        for cls, d in classes:
+            for lazy in [False, True]:
+                obj = cls(d, lazy=lazy)
+                dumped = obj.to_dict()
+                self.assertEqual(json.loads(json.dumps(dumped)), dumped)
+                self.assertEqual(cls.from_dict(dumped).to_dict(), dumped)
+                restored = pickle.loads(pickle.dumps(obj))
+                self.assertIsInstance(restored, cls)
+                self.assertEqual(restored.to_dict(), dumped)
+        status = haiker.types.Status(samples.STATUS).to_dict()
+        self.assertEqual(status['created_at'], '2010-01-02T03:04:05Z')
+        self.assertEqual(status['favorited'], 12)
+        f = haiker.types.from_datetime
+        for s in ['2010-01-02T03:04:05.123456+09:00', '2010-01-02T03:04:05Z']:
+            self.assertEqual(f(haiker.types.to_datetime(s)), s)
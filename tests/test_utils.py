@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 
+import concurrent.futures
 import datetime
 import sys
+import threading
 import time
 import unittest
 import haiker
@@ -11,6 +13,14 @@ class TestUtils(unittest.TestCase):
     def test_user_agent(self):
         haiker.utils.user_agent()
 
+    def test_make_session(self):
+        f = haiker.utils.make_session
+        session = f(pool_connections=2, pool_maxsize=4)
+        adapter = session.get_adapter('https://h.hatena.ne.jp/')
+        self.assertEqual(adapter._pool_maxsize, 4)
+        self.assertEqual(f().headers['Connection'], 'keep-alive')
+        self.assertEqual(f(keep_alive=False).headers['Connection'], 'close')
+
     def test_removed_dict(self):
         f = haiker.utils.removed_dict
         d = {'a': 123, 'b': 456}
@@ -44,6 +54,9 @@ class TestUtils(unittest.TestCase):
         eq(f(datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)),
            b'Sat, 01 January 2000 00:00:00 GMT')
         eq(f([123, 'abc', None, True]), b'123,abc,,1')
+        eq(f((x for x in ['a', 'b'])), b'a,b')
+        eq(f(type('MyStr', (str,), {})('abc')), b'abc')
+        eq(f('\u3042', charset='euc-jp'), b'\xa4\xa2')
         self.assertRaises(TypeError, f, 1 + 2j)
 
     def test_build_params(self):
@@ -51,3 +64,53 @@ class TestUtils(unittest.TestCase):
         self.assertIsNone(f(None))
         self.assertEqual(dict(f({'a': 9, 'b': True})), {'a': b'9', 'b': b'1'})
         self.assertEqual(f([('a', 'xyz')]), [('a', b'xyz')])
+        self.assertEqual(f({'a': None, 'b': 0}), [('b', b'0')])
+
+    def test_json_array_parser(self):
+        data = '[{"a": [1, {"b": "}]"}]}, 23, "c\\"]", null, true , []]'
+        expected = [{'a': [1, {'b': '}]'}]}, 23, 'c"]', None, True, []]
+        for n in range(1, len(data) + 1):
+            parser = haiker.utils.JSONArrayParser()
+            elements = []
+            for i in range(0, len(data), n):
+                elements.extend(parser.feed(data[i:i + n]))
+            parser.close()
+            self.assertEqual(elements, expected)
+        for s in ['', '[1,', '[1, ]', '{}', '[1 2]', '[1] 2']:
+            parser = haiker.utils.JSONArrayParser()
+            with self.assertRaises(ValueError):
+                parser.feed(s)
+                parser.close()
+
+    def test_iter_json_array(self):
+        f = haiker.utils.iter_json_array
+        data = '["\u3042\u3044", 1]'.encode('utf-8')
+        chunks = [data[i:i + 1] for i in range(len(data))]
+        self.assertEqual(list(f(chunks)), ['\u3042\u3044', 1])
+        self.assertEqual(list(f([b' [ ] '])), [])
+
+    def test_single_flight(self):
+        flight = haiker.utils.SingleFlight()
+        started, finish = threading.Event(), threading.Event()
+        calls = []
+
+        def func():
+            calls.append(True)
+            started.set()
+            finish.wait()
+            return object()
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            leader = executor.submit(flight.do, 'key', func)
+            started.wait()
+            waiters = [executor.submit(flight.do, 'key', func)
+                       for _ in range(3)]
+            time.sleep(0.1)
+            self.assertRaises(concurrent.futures.TimeoutError,
+                              flight.do, 'key', func, 0.01)
+            finish.set()
+            results = [f.result() for f in [leader] + waiters]
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(len(flight), 0)
+        self.assertRaises(ZeroDivisionError, flight.do, 'key', lambda: 1 / 0)
+        self.assertEqual(len(flight), 0)